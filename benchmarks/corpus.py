@@ -0,0 +1,231 @@
+"""
+Синтетический корпус тендерной документации для бенчмарков.
+
+Каждый пакет - три документа (DOCX, PDF, TXT) с полями TenderData, записанными строками
+«<описание поля>: <значение>» среди шаблонного текста. Корпус детерминирован (seed), поэтому
+результаты бенчмарка сравнимы между коммитами. Ожидаемые значения полей сохраняются в manifest.json.
+
+Запуск отдельно:
+    python benchmarks/corpus.py --output benchmarks/corpus --sizes small,medium
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import zipfile
+from typing import Optional
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from queries import ContactPerson, FIELD_GROUPS, LotInfo, TenderData
+
+# Key: размер пакета, Value: страниц шаблонного текста в каждом документе
+PACK_SIZES: dict[str, int] = {
+    "small": 2,
+    "medium": 10,
+    "large": 40,
+}
+PARAGRAPHS_PER_PAGE = 6
+
+FILLER_SENTENCES = [
+    "Участник закупки должен соответствовать требованиям, установленным законодательством Российской Федерации.",
+    "Заявка на участие в закупке подается в форме электронного документа в соответствии с регламентом площадки.",
+    "Все документы, входящие в состав заявки, должны быть составлены на русском языке.",
+    "Заказчик вправе отменить закупку до наступления даты и времени окончания срока подачи заявок.",
+    "Оценка заявок осуществляется комиссией по осуществлению закупок в соответствии с критериями документации.",
+    "Поставщик обязуется обеспечить сохранность товара до момента его приемки заказчиком.",
+    "Приемка товара по количеству и качеству осуществляется в присутствии представителя поставщика.",
+    "Споры и разногласия разрешаются путем переговоров, а при недостижении согласия - в арбитражном суде.",
+    "Стороны освобождаются от ответственности за неисполнение обязательств вследствие обстоятельств непреодолимой силы.",
+    "Разъяснения положений документации предоставляются по запросу участника не позднее трех рабочих дней.",
+    "Цена договора включает стоимость товара, тары, упаковки, погрузочно-разгрузочных работ и доставки.",
+    "Участник несет все расходы, связанные с подготовкой и подачей заявки на участие в закупке.",
+]
+
+PRODUCTS = ["Поставка насосного оборудования", "Поставка кабельной продукции", "Поставка запорной арматуры",
+            "Поставка компьютерной техники", "Поставка спецодежды", "Поставка трансформаторов"]
+CUSTOMERS = ["АО «Энергосеть»", "ООО «ТрансНефтеСервис»", "ПАО «Северсталь-Ресурс»", "АО «Водоканал-Юг»"]
+PLATFORMS = ["ЭТП ГПБ", "РТС-тендер", "Сбербанк-АСТ", "B2B-Center"]
+NAMES = ["Иванов Иван Иванович", "Петрова Анна Сергеевна", "Сидоров Павел Андреевич", "Кузнецова Мария Олеговна"]
+CITIES = ["г. Москва", "г. Екатеринбург", "г. Казань", "г. Новосибирск"]
+
+def _price(rng: random.Random) -> str:
+    return f"{rng.randint(100, 9000) * 1000:,} руб.".replace(",", " ")
+
+def generate_tender(rng: random.Random) -> TenderData:
+    """Случайные (по seed) значения полей одного тендера"""
+    product = rng.choice(PRODUCTS)
+    day = rng.randint(1, 20)
+    lots = [
+        LotInfo(name=f"{product}, лот {i + 1}", initial_max_price=_price(rng), currency="RUB", quantity=f"{rng.randint(1, 50)} шт.")
+        for i in range(rng.randint(1, 3))
+    ]
+    contacts = [
+        ContactPerson(full_name=name, phone_number=f"+7 (495) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+                      email=f"tender{rng.randint(1, 99)}@example.ru", position="Специалист отдела закупок")
+        for name in rng.sample(NAMES, rng.randint(1, 2))
+    ]
+    return TenderData(
+        procurement_name=product,
+        customer_info_company_name=rng.choice(CUSTOMERS),
+        notice_number=str(rng.randint(10 ** 10, 10 ** 11 - 1)),
+        publication_and_submission_deadline=f"{day:02d}.03.2025 10:00 (МСК)",
+        lots=lots,
+        delivery_department=f"Филиал «{rng.choice(CITIES)[3:]}ский»",
+        initial_max_price_with_vat=_price(rng),
+        contact_persons=contacts,
+        application_security=f"{rng.choice([1, 2, 5])}% от НМЦ",
+        re_bidding_date=f"{day + 5:02d}.03.2025",
+        etp_platform=rng.choice(PLATFORMS),
+        application_review_deadline=f"{day + 3:02d}.03.2025 17:00 (МСК)",
+        results_summary_date=f"{day + 7:02d}.03.2025",
+        contract_security=f"{rng.choice([5, 10, 30])}% от цены договора",
+        participation_price="Не взимается",
+        warranty_requirements=f"Не менее {rng.choice([12, 24, 36])} месяцев",
+        required_delivery_period=f"{rng.choice([30, 45, 60])} календарных дней",
+        payment_terms=f"В течение {rng.choice([7, 15, 30])} рабочих дней после приемки",
+        delivery_documents_names="Товарная накладная, счет-фактура, сертификат соответствия",
+        delivery_method="Силами и за счет поставщика",
+        product_dimensions=f"{rng.randint(300, 2000)}x{rng.randint(300, 2000)}x{rng.randint(300, 2000)} мм",
+        product_purpose="Для нужд эксплуатации производственных объектов",
+        contract_term="До 31.12.2025",
+        delivery_address=f"{rng.choice(CITIES)}, ул. Промышленная, д. {rng.randint(1, 99)}",
+    )
+
+def field_lines(tender: TenderData, field_names: list[str]) -> list[str]:
+    """Строки «описание: значение»; для списков - по строке на каждое поле каждого элемента"""
+    lines = []
+    for field_name in field_names:
+        value = getattr(tender, field_name)
+        if isinstance(value, list):
+            for item in value:
+                lines.extend(f"{info.description}: {getattr(item, name)}" for name, info in type(item).model_fields.items())
+        else:
+            lines.append(f"{TenderData.model_fields[field_name].description}: {value}")
+    return lines
+
+def document_pages(rng: random.Random, lines: list[str], pages: int) -> list[list[str]]:
+    """Страницы шаблонного текста, между которыми случайно разложены строки полей"""
+    result = [[" ".join(rng.sample(FILLER_SENTENCES, 3)) for _ in range(PARAGRAPHS_PER_PAGE)] for _ in range(pages)]
+    for line in lines:
+        page = rng.randrange(pages)
+        result[page].insert(rng.randint(0, len(result[page])), line)
+    return result
+
+def write_txt(path: str, pages: list[list[str]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join("\n".join(page) for page in pages))
+
+def write_docx(path: str, pages: list[list[str]]) -> None:
+    """Минимальный DOCX (WordprocessingML), записанный через zipfile"""
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph)}</w:t></w:r></w:p>'
+        for page in pages for paragraph in page
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+
+def write_pdf(path: str, pages: list[list[str]]) -> None:
+    """
+    Минимальный PDF: на странице печатается только ее номер (стандартный шрифт без кириллицы),
+    текст страницы хранится в комментарии «% PAGE-TEXT <base64>» потока страницы - его читает заглушка OCR.
+    """
+    objects: list[bytes] = []
+    page_count = len(pages)
+    page_ids = [4 + 2 * i for i in range(page_count)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {page_count} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for number, page in enumerate(pages):
+        page_text = base64.b64encode("\n".join(page).encode("utf-8"))
+        stream = b"% PAGE-TEXT " + page_text + f"\nBT /F1 12 Tf 72 770 Td (Page {number + 1}) Tj ET\n".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_ids[number] + 1} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"endstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+# Key: имя документа пакета, Value: (группы полей в документе, функция записи)
+PACK_DOCUMENTS = {
+    "Извещение о закупке.docx": (["parties", "dates"], write_docx),
+    "Техническое задание.pdf": (["delivery"], write_pdf),
+    "Проект договора.txt": (["prices"], write_txt),
+}
+
+def generate_corpus(output_dir: str, sizes: Optional[list[str]] = None, packs_per_size: int = 1, seed: int = 42) -> dict:
+    """
+    Генерация корпуса в output_dir/<размер>-<номер>/.
+
+    Returns:
+        Манифест: Key - имя пакета, Value - пути документов и ожидаемые значения полей
+    """
+    rng = random.Random(seed)
+    manifest = {}
+    for size in sizes or list(PACK_SIZES):
+        for pack_number in range(packs_per_size):
+            pack_name = f"{size}-{pack_number + 1}"
+            pack_dir = os.path.join(output_dir, pack_name)
+            os.makedirs(pack_dir, exist_ok=True)
+            tender = generate_tender(rng)
+            files = []
+            for file_name, (groups, write) in PACK_DOCUMENTS.items():
+                lines = field_lines(tender, [field_name for group in groups for field_name in FIELD_GROUPS[group]])
+                file_path = os.path.join(pack_dir, file_name)
+                write(file_path, document_pages(rng, lines, PACK_SIZES[size]))
+                files.append(file_path)
+            manifest[pack_name] = {"size": size, "files": files, "expected": tender.model_dump()}
+
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic tender corpus")
+    parser.add_argument("--output", default="benchmarks/corpus")
+    parser.add_argument("--sizes", default=",".join(PACK_SIZES), help=f"Размеры пакетов через запятую: {', '.join(PACK_SIZES)}")
+    parser.add_argument("--packs", type=int, default=1, help="Пакетов каждого размера")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.output, args.sizes.split(","), args.packs, args.seed)
+    print(f"Generated {len(manifest)} packs in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Локальные заглушки Ollama и Mistral API для бенчмарков без GPU и без расхода кредитов Mistral.
+
+Ответы строятся по JSON-схеме из запроса: строковое поле заполняется значением из строки
+«<описание поля>: <значение>» текста документа (так размечен синтетический корпус из corpus.py),
+остальные поля остаются пустыми. Задержка ответа моделируется по числу токенов промпта и ответа.
+
+Запуск отдельно:
+    python benchmarks/fake_servers.py --ollama-port 11434 --mistral-port 8090
+"""
+import argparse
+import base64
+import io
+import json
+import re
+import threading
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+NANOSECONDS = 1_000_000_000
+
+@dataclass
+class LatencyModel:
+    """Модель задержки ответа заглушки"""
+    base_seconds: float = 0.05 # Фиксированная задержка запроса (сеть, очередь)
+    prompt_tokens_per_second: float = 2000.0 # Скорость обработки промпта
+    tokens_per_second: float = 40.0 # Скорость генерации ответа
+    load_seconds: float = 2.0 # Загрузка модели при первом запросе (Ollama)
+    ocr_seconds_per_page: float = 0.3 # Распознавание одной страницы (Mistral OCR)
+    upload_seconds_per_mb: float = 0.1 # Загрузка файла (Mistral files)
+
+    def generation_seconds(self, prompt_tokens: int, output_tokens: int) -> float:
+        return self.base_seconds + prompt_tokens / self.prompt_tokens_per_second + output_tokens / self.tokens_per_second
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов: ~4 символа на токен"""
+    return max(1, len(text) // 4)
+
+# --- Текст документов -------------------------------------------------------
+
+PAGE_TEXT_MARKER = re.compile(rb"% PAGE-TEXT ([A-Za-z0-9+/=]+)")
+
+def document_pages(data: bytes) -> list[str]:
+    """Текст страниц документа из синтетического корпуса (PDF, DOCX или обычный текст)"""
+    if data.startswith(b"%PDF"):
+        return [base64.b64decode(match).decode("utf-8") for match in PAGE_TEXT_MARKER.findall(data)]
+    if data.startswith(b"PK"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            document_xml = archive.read("word/document.xml").decode("utf-8")
+        paragraphs = ["".join(re.findall(r"<w:t[^>]*>([^<]*)</w:t>", paragraph)) for paragraph in document_xml.split("</w:p>")]
+        return ["\n".join(paragraph for paragraph in paragraphs if paragraph)]
+    return [data.decode("utf-8", errors="replace")]
+
+# --- Ответ по JSON-схеме ------------------------------------------------------
+
+def _resolve(schema: dict, defs: dict) -> dict:
+    if "$ref" in schema:
+        return defs[schema["$ref"].split("/")[-1]]
+    for option in schema.get("anyOf", []):
+        if option.get("type") != "null":
+            return _resolve(option, defs)
+    return schema
+
+def _find_values(label: str, text: str) -> list[str]:
+    return [value.strip() for value in re.findall(re.escape(label) + r":\s*([^\n]+)", text)]
+
+def fake_object(schema: dict, text: str, defs: Optional[dict] = None) -> dict[str, Any]:
+    """Объект по JSON-схеме: строки - из строк «описание: значение» текста, массивы объектов - по всем совпадениям"""
+    defs = {**(defs or {}), **schema.get("$defs", {})}
+    result: dict[str, Any] = {}
+    for name, prop in schema.get("properties", {}).items():
+        resolved = _resolve(prop, defs)
+        if resolved.get("type") == "array":
+            item_schema = _resolve(resolved.get("items", {}), defs)
+            columns = {
+                item_name: _find_values(item_prop.get("description", item_name), text)
+                for item_name, item_prop in item_schema.get("properties", {}).items()
+            }
+            count = max((len(values) for values in columns.values()), default=0)
+            result[name] = [
+                {item_name: values[i] if i < len(values) else "" for item_name, values in columns.items()}
+                for i in range(count)
+            ]
+        elif resolved.get("type") == "string":
+            label = prop.get("description") or resolved.get("description")
+            values = _find_values(label, text) if label else []
+            if not values and name == "value":
+                # Выбор из пронумерованных вариантов (разрешение конфликтов)
+                values = re.findall(r"^\s*\d+\.\s*(.+)$", text, flags=re.MULTILINE)
+            result[name] = values[0].strip() if values else ""
+    return result
+
+# --- Общая часть сервера -----------------------------------------------------
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler: type[BaseHTTPRequestHandler], latency: LatencyModel, model: str, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.model = model
+        self._lock = threading.Lock()
+        # Key: endpoint, Value: длительности запросов, секунд
+        self.requests: dict[str, list[float]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self.requests.setdefault(endpoint, []).append(seconds)
+
+    def stats(self) -> dict[str, list[float]]:
+        with self._lock:
+            return {endpoint: list(values) for endpoint, values in self.requests.items()}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+class JSONHandler(BaseHTTPRequestHandler):
+    server: FakeServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _read_json(self) -> dict:
+        body = self._read_body()
+        return json.loads(body) if body else {}
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str) -> None:
+        start = time.perf_counter()
+        path = urlparse(self.path).path
+        try:
+            endpoint = self.route(method, path)
+        except Exception as e:
+            self._send_json({"error": f"{type(e).__name__}: {e}"}, status=500)
+            return
+        if endpoint is None:
+            self._send_json({"error": f"{method} {path} is not supported"}, status=404)
+            return
+        self.server.record(endpoint, time.perf_counter() - start)
+
+    def route(self, method: str, path: str) -> Optional[str]:
+        """Обработка запроса; возвращает имя endpoint для статистики или None, если путь не поддерживается"""
+        raise NotImplementedError
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+# --- Ollama ------------------------------------------------------------------
+
+class FakeOllamaServer(FakeServer):
+    def __init__(self, latency: LatencyModel, model: str = "fake-llm", host: str = "127.0.0.1", port: int = 0):
+        super().__init__(FakeOllamaHandler, latency, model, host, port)
+        self.loaded = False
+        self.load_lock = threading.Lock()
+        # Префиксы (system-сообщения), уже находящиеся в KV-кэше
+        self.cached_prefixes: set[str] = set()
+
+    def ensure_loaded(self) -> float:
+        """Загрузка модели при первом запросе; возвращает время загрузки"""
+        with self.load_lock:
+            if self.loaded:
+                return 0.0
+            time.sleep(self.latency.load_seconds)
+            self.loaded = True
+            return self.latency.load_seconds
+
+class FakeOllamaHandler(JSONHandler):
+    server: FakeOllamaServer
+
+    def route(self, method: str, path: str) -> Optional[str]:
+        if method == "GET" and path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model, "model": self.server.model, "size": 0, "digest": ""}]})
+            return "tags"
+        if method == "POST" and path == "/api/generate":
+            request = self._read_json()
+            load_seconds = self.server.ensure_loaded()
+            self._send_json({
+                "model": request.get("model", self.server.model),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": "",
+                "done": True,
+                "done_reason": "load",
+                "load_duration": int(load_seconds * NANOSECONDS),
+                "total_duration": int(load_seconds * NANOSECONDS),
+            })
+            return "generate"
+        if method == "POST" and path == "/api/chat":
+            self._chat(self._read_json())
+            return "chat"
+        return None
+
+    def _chat(self, request: dict) -> None:
+        latency = self.server.latency
+        load_seconds = self.server.ensure_loaded()
+        messages = request.get("messages", [])
+        system = "".join(message.get("content", "") for message in messages if message.get("role") == "system")
+        text = "\n".join(message.get("content", "") for message in messages)
+
+        prompt_tokens = estimate_tokens(text)
+        if system and system in self.server.cached_prefixes:
+            # Префикс уже вычислен - модель обрабатывает только сообщение с чанком
+            prompt_tokens -= estimate_tokens(system)
+        elif system:
+            self.server.cached_prefixes.add(system)
+
+        schema = request.get("format")
+        content = json.dumps(fake_object(schema, text) if isinstance(schema, dict) else {}, ensure_ascii=False)
+        eval_tokens = estimate_tokens(content)
+        seconds = latency.generation_seconds(prompt_tokens, eval_tokens)
+        time.sleep(seconds)
+
+        self._send_json({
+            "model": request.get("model", self.server.model),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((seconds + load_seconds) * NANOSECONDS),
+            "load_duration": int(load_seconds * NANOSECONDS),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_tokens / latency.prompt_tokens_per_second * NANOSECONDS),
+            "eval_count": eval_tokens,
+            "eval_duration": int(eval_tokens / latency.tokens_per_second * NANOSECONDS),
+        })
+
+# --- Mistral -----------------------------------------------------------------
+
+class FakeMistralServer(FakeServer):
+    def __init__(self, latency: LatencyModel, model: str = "fake-mistral", host: str = "127.0.0.1", port: int = 0):
+        super().__init__(FakeMistralHandler, latency, model, host, port)
+        # Key: file id, Value: (имя файла, содержимое)
+        self.files: dict[str, tuple[str, bytes]] = {}
+
+    def file_pages(self, document: dict) -> list[str]:
+        """Страницы документа из chunk-а document_url / file запроса"""
+        file_id = document.get("file_id")
+        if not file_id:
+            # Подписанная ссылка имеет вид <url>/v1/files/<id>/content
+            file_id = urlparse(document.get("document_url", "")).path.split("/")[-2]
+        _, content = self.files[file_id]
+        return document_pages(content)
+
+class FakeMistralHandler(JSONHandler):
+    server: FakeMistralServer
+
+    def route(self, method: str, path: str) -> Optional[str]:
+        parts = [part for part in path.split("/") if part]
+        if method == "POST" and parts == ["v1", "files"]:
+            self._upload()
+            return "files.upload"
+        if method == "GET" and len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "url":
+            self._send_json({"url": f"{self.server.url}/v1/files/{parts[2]}/content"})
+            return "files.signed_url"
+        if method == "GET" and len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content":
+            _, content = self.server.files[parts[2]]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return "files.content"
+        if method == "DELETE" and len(parts) == 3 and parts[:2] == ["v1", "files"]:
+            self.server.files.pop(parts[2], None)
+            self._send_json({"id": parts[2], "object": "file", "deleted": True})
+            return "files.delete"
+        if method == "POST" and parts == ["v1", "ocr"]:
+            self._ocr(self._read_json())
+            return "ocr"
+        if method == "POST" and parts == ["v1", "chat", "completions"]:
+            self._chat(self._read_json())
+            return "chat"
+        return None
+
+    def _upload(self) -> None:
+        body = self._read_body()
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + body
+        )
+        file_name, content = "document", b""
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                file_name = part.get_filename() or file_name
+                content = part.get_payload(decode=True)
+        time.sleep(self.server.latency.base_seconds + len(content) / 1024 / 1024 * self.server.latency.upload_seconds_per_mb)
+
+        file_id = str(uuid.uuid4())
+        self.server.files[file_id] = (file_name, content)
+        self._send_json({
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file_name,
+            "purpose": "ocr",
+            "sample_type": "ocr_input",
+            "source": "upload",
+        })
+
+    def _ocr(self, request: dict) -> None:
+        latency = self.server.latency
+        all_pages = self.server.file_pages(request.get("document", {}))
+        page_indexes = request.get("pages") or list(range(len(all_pages)))
+        page_indexes = [index for index in page_indexes if index < len(all_pages)]
+        time.sleep(latency.base_seconds + latency.ocr_seconds_per_page * len(page_indexes))
+
+        document_annotation = None
+        annotation_format = request.get("document_annotation_format")
+        if annotation_format:
+            schema = annotation_format.get("json_schema", {}).get("schema", {})
+            document_annotation = json.dumps(fake_object(schema, "\n".join(all_pages[i] for i in page_indexes)), ensure_ascii=False)
+
+        self._send_json({
+            "pages": [
+                {
+                    "index": index,
+                    "markdown": all_pages[index],
+                    "images": [],
+                    "dimensions": {"dpi": 200, "height": 2339, "width": 1654},
+                }
+                for index in page_indexes
+            ],
+            "model": request.get("model", "mistral-ocr-latest"),
+            "usage_info": {"pages_processed": len(page_indexes), "doc_size_bytes": None},
+            "document_annotation": document_annotation,
+        })
+
+    def _chat(self, request: dict) -> None:
+        texts = []
+        for message in request.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, str):
+                texts.append(content)
+                continue
+            for chunk in content or []:
+                if chunk.get("type") == "text":
+                    texts.append(chunk.get("text", ""))
+                elif chunk.get("type") in ("document_url", "file"):
+                    texts.extend(self.server.file_pages(chunk))
+        text = "\n".join(texts)
+
+        response_format = request.get("response_format") or {}
+        schema = (response_format.get("json_schema") or {}).get("schema", {})
+        content = json.dumps(fake_object(schema, text), ensure_ascii=False)
+        prompt_tokens, completion_tokens = estimate_tokens(text), estimate_tokens(content)
+        time.sleep(self.server.latency.generation_seconds(prompt_tokens, completion_tokens))
+
+        self._send_json({
+            "id": str(uuid.uuid4()),
+            "object": "chat.completion",
+            "model": request.get("model", self.server.model),
+            "created": int(time.time()),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": None},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Ollama and Mistral API servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--mistral-port", type=int, default=8090)
+    parser.add_argument("--base-latency", type=float, default=LatencyModel.base_seconds)
+    parser.add_argument("--prompt-tps", type=float, default=LatencyModel.prompt_tokens_per_second)
+    parser.add_argument("--tps", type=float, default=LatencyModel.tokens_per_second)
+    parser.add_argument("--load-seconds", type=float, default=LatencyModel.load_seconds)
+    parser.add_argument("--ocr-page-seconds", type=float, default=LatencyModel.ocr_seconds_per_page)
+    args = parser.parse_args()
+
+    latency = LatencyModel(
+        base_seconds=args.base_latency,
+        prompt_tokens_per_second=args.prompt_tps,
+        tokens_per_second=args.tps,
+        load_seconds=args.load_seconds,
+        ocr_seconds_per_page=args.ocr_page_seconds,
+    )
+    ollama_server = FakeOllamaServer(latency, host=args.host, port=args.ollama_port).start()
+    mistral_server = FakeMistralServer(latency, host=args.host, port=args.mistral_port).start()
+    print(f"Fake Ollama: {ollama_server.url} (LLM_HOST)")
+    print(f"Fake Mistral: {mistral_server.url} (MISTRAL_SERVER_URL)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        ollama_server.stop()
+        mistral_server.stop()
+
+if __name__ == "__main__":
+    main()
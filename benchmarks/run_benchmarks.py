@@ -0,0 +1,206 @@
+"""
+Сквозной бенчмарк анализа документов на заглушках Ollama и Mistral API.
+
+Генерирует синтетический корпус (corpus.py), поднимает заглушки (fake_servers.py) и прогоняет
+пакеты документов через MistralAnalyzer, LocalLLMAnalyzer или TelegramBot.summarize_files.
+Отчет: p50/p95 по этапам (время пакета, метрики из metrics, запросы к заглушкам), число запросов
+на документ, пиковый RSS и доля найденных полей. Отчет сохраняется в JSON с хэшем коммита.
+
+Пример:
+    python benchmarks/run_benchmarks.py --target ollama --sizes small,medium --runs 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from corpus import PACK_SIZES, generate_corpus
+from fake_servers import FakeMistralServer, FakeOllamaServer, LatencyModel
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "total": sum(values)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss - килобайты в Linux, байты в macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def field_recall(summary: Optional[str], expected: dict[str, Any]) -> float:
+    """Доля ожидаемых строковых значений полей, попавших в итоговую сводку"""
+    values = [value for value in expected.values() if isinstance(value, str) and value]
+    if not values:
+        return 0.0
+    summary = summary or ""
+    return sum(value in summary for value in values) / len(values)
+
+class LocalFile:
+    """Файл корпуса в роли telegram.File: «скачивание» - копирование с диска"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def download_to_drive(self, custom_path: Any) -> None:
+        await asyncio.to_thread(shutil.copyfile, self.path, custom_path)
+
+    async def download_as_bytearray(self) -> bytearray:
+        with open(self.path, "rb") as file:
+            return bytearray(await asyncio.to_thread(file.read))
+
+class LocalBot:
+    """Минимальный telegram.Bot для summarize_files: file_id - путь к файлу корпуса"""
+
+    async def get_file(self, file_id: str) -> LocalFile:
+        return LocalFile(file_id)
+
+def configure_environment(args: argparse.Namespace, ollama_url: str, mistral_url: str) -> None:
+    """Настройки анализаторов указывают на заглушки; кэш результатов выключен, чтобы мерить полный путь"""
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": os.environ.get("TELEGRAM_BOT_TOKEN", "benchmark"),
+        "ANALYZER_TYPE": args.bot_analyzer if args.target == "bot" else args.target,
+        "JOBS_MODE": "inprocess",
+        "LLM_MODEL": "fake-llm",
+        "LLM_HOST": ollama_url,
+        "MISTRAL_API_KEY": "benchmark",
+        "MISTRAL_MODEL": "fake-mistral",
+        "MISTRAL_SERVER_URL": mistral_url,
+        "CACHE_ENABLED": "true" if args.with_cache else "false",
+    })
+
+async def run_pack(target: Any, args: argparse.Namespace, files: list[str]) -> Optional[str]:
+    if args.target == "bot":
+        from telegram_bot import DocumentInfo
+        documents = [DocumentInfo(file_id=path, file_name=os.path.basename(path), chat_id=0) for path in files]
+        summary, _ = await target.summarize_files(documents, SimpleNamespace(bot=LocalBot()))
+        return summary
+    return (await target.analyze_async(files)).summary
+
+async def run(args: argparse.Namespace) -> dict:
+    latency = LatencyModel(
+        base_seconds=args.base_latency,
+        prompt_tokens_per_second=args.prompt_tps,
+        tokens_per_second=args.tps,
+        load_seconds=args.load_seconds,
+        ocr_seconds_per_page=args.ocr_page_seconds,
+    )
+    ollama_server = FakeOllamaServer(latency).start()
+    mistral_server = FakeMistralServer(latency).start()
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="tender-corpus-")
+    try:
+        manifest = generate_corpus(corpus_dir, args.sizes.split(","), args.packs, args.seed)
+        configure_environment(args, ollama_server.url, mistral_server.url)
+
+        from metrics import metrics
+        if args.target == "bot":
+            from telegram_bot import TelegramBot
+            target = TelegramBot()
+        else:
+            from documents_analyzer import create_analyzer
+            target = create_analyzer(args.target)
+
+        metrics.reset()
+        ollama_server.reset_stats()
+        mistral_server.reset_stats()
+        stages: dict[str, list[float]] = {}
+        recalls: list[float] = []
+        documents = 0
+        for _ in range(args.runs):
+            for pack_name, pack in manifest.items():
+                start = time.perf_counter()
+                summary = await run_pack(target, args, pack["files"])
+                stages.setdefault(f"pack_{pack['size']}", []).append(time.perf_counter() - start)
+                recalls.append(field_recall(summary, pack["expected"]))
+                documents += len(pack["files"])
+
+        for name, values in metrics.snapshot()["timings"].items():
+            stages[name] = values
+        calls: dict[str, int] = {}
+        for server_name, server in (("ollama", ollama_server), ("mistral", mistral_server)):
+            for endpoint, values in server.stats().items():
+                stages[f"{server_name}.{endpoint}"] = values
+                calls[f"{server_name}.{endpoint}"] = len(values)
+
+        return {
+            "commit": git_commit(),
+            "target": args.target if args.target != "bot" else f"bot:{args.bot_analyzer}",
+            "config": {
+                "sizes": args.sizes, "packs": args.packs, "runs": args.runs, "seed": args.seed, "with_cache": args.with_cache,
+                "latency": vars(latency),
+            },
+            "documents": documents,
+            "stages": {name: summarize(values) for name, values in sorted(stages.items())},
+            "calls_per_document": {endpoint: count / documents for endpoint, count in sorted(calls.items())},
+            "counters": metrics.snapshot()["counters"],
+            "peak_rss_mb": peak_rss_mb(),
+            "field_recall": sum(recalls) / len(recalls) if recalls else 0.0,
+        }
+    finally:
+        ollama_server.stop()
+        mistral_server.stop()
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+def print_report(report: dict) -> None:
+    print(f"Target: {report['target']}  commit: {report['commit']}  documents: {report['documents']}")
+    print(f"{'stage':40s} {'count':>7s} {'p50, s':>9s} {'p95, s':>9s}")
+    for name, stats in report["stages"].items():
+        print(f"{name:40s} {stats['count']:7d} {stats['p50']:9.3f} {stats['p95']:9.3f}")
+    print("Calls per document:")
+    for endpoint, value in report["calls_per_document"].items():
+        print(f"  {endpoint:38s} {value:7.2f}")
+    print(f"Peak RSS: {report['peak_rss_mb']:.1f} MB  field recall: {report['field_recall']:.2%}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on fake Ollama/Mistral servers")
+    parser.add_argument("--target", choices=["mistral", "ollama", "bot"], default="mistral")
+    parser.add_argument("--bot-analyzer", choices=["mistral", "ollama"], default="mistral", help="Анализатор бота для --target bot")
+    parser.add_argument("--sizes", default=",".join(PACK_SIZES), help=f"Размеры пакетов через запятую: {', '.join(PACK_SIZES)}")
+    parser.add_argument("--packs", type=int, default=1, help="Пакетов каждого размера")
+    parser.add_argument("--runs", type=int, default=1, help="Прогонов корпуса")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus-dir", help="Сохранить корпус в директорию (по умолчанию - временная)")
+    parser.add_argument("--with-cache", action="store_true", help="Не выключать кэш результатов")
+    parser.add_argument("--base-latency", type=float, default=LatencyModel.base_seconds)
+    parser.add_argument("--prompt-tps", type=float, default=LatencyModel.prompt_tokens_per_second)
+    parser.add_argument("--tps", type=float, default=LatencyModel.tokens_per_second)
+    parser.add_argument("--load-seconds", type=float, default=LatencyModel.load_seconds)
+    parser.add_argument("--ocr-page-seconds", type=float, default=LatencyModel.ocr_seconds_per_page)
+    parser.add_argument("--output", help="JSON-отчет (по умолчанию benchmarks/results/<target>-<commit>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"{report['target'].replace(':', '-')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report saved to {output}")
+
+if __name__ == "__main__":
+    main()
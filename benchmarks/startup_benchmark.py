@@ -0,0 +1,91 @@
+"""
+Замер времени старта бота.
+
+Каждый замер выполняется в отдельном процессе интерпретатора, чтобы кэш импортов не искажал результат:
+- import telegram_bot - должен оставаться быстрым и не тянуть docling/ollama/mistralai/tokenizers;
+- create_analyzer(<type>) - создание анализатора (тяжелые компоненты создаются при первом использовании);
+  в отчете - загруженные тяжелые модули: для ollama ожидается только клиент ollama.
+
+Пример:
+    python benchmarks/startup_benchmark.py --runs 5 --analyzer ollama --max-import-seconds 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+# Модули, которые не должны загружаться при импорте бота
+HEAVY_MODULES = ["docling", "ollama", "mistralai", "pypdfium2", "tokenizers", "semantic_text_splitter", "torch"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import telegram_bot
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(HEAVY_MODULES))
+print(json.dumps({"seconds": elapsed, "heavy_modules": heavy}))
+"""
+
+ANALYZER_SNIPPET = """
+import json, sys, time
+from documents_analyzer import create_analyzer
+start = time.perf_counter()
+create_analyzer(ANALYZER_TYPE)
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(HEAVY_MODULES))
+print(json.dumps({"seconds": elapsed, "heavy_modules": heavy}))
+"""
+
+def run_snippet(snippet: str) -> dict:
+    """Запуск фрагмента в чистом интерпретаторе; результат - последняя строка stdout в JSON"""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    completed = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, env=env, cwd=ROOT_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def measure(name: str, snippet: str, runs: int) -> dict:
+    results = [run_snippet(snippet) for _ in range(runs)]
+    seconds = [result["seconds"] for result in results]
+    report = {
+        "name": name,
+        "runs": runs,
+        "median_seconds": statistics.median(seconds),
+        "max_seconds": max(seconds),
+        "heavy_modules": results[-1]["heavy_modules"],
+    }
+    print(f"{name}: median {report['median_seconds']:.3f}s, max {report['max_seconds']:.3f}s"
+          + (f", heavy modules loaded: {', '.join(report['heavy_modules'])}" if report["heavy_modules"] else ""))
+    return report
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Startup time benchmark for LLMTenderBot")
+    parser.add_argument("--runs", type=int, default=5, help="Количество замеров")
+    parser.add_argument("--analyzer", choices=["mistral", "ollama"], help="Дополнительно замерить создание анализатора (нужна конфигурация в .env)")
+    parser.add_argument("--max-import-seconds", type=float, help="Завершиться с ошибкой, если медиана импорта бота больше")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    reports = [measure("import telegram_bot", IMPORT_SNIPPET.replace("HEAVY_MODULES", repr(HEAVY_MODULES)), args.runs)]
+    if args.analyzer:
+        reports.append(measure(f"create_analyzer({args.analyzer})", ANALYZER_SNIPPET.replace("ANALYZER_TYPE", repr(args.analyzer)).replace("HEAVY_MODULES", repr(HEAVY_MODULES)), args.runs))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    failed = bool(reports[0]["heavy_modules"])
+    if args.max_import_seconds is not None and reports[0]["median_seconds"] > args.max_import_seconds:
+        print(f"❌ Import time {reports[0]['median_seconds']:.3f}s exceeds {args.max_import_seconds:.3f}s")
+        failed = True
+    if reports[0]["heavy_modules"]:
+        print("❌ Heavy modules must be imported lazily")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,7 @@ setup(
         
         # Document processing
         'docling>=2.8.1',
+        'pypdfium2>=4.30.0',
         
         # Text processing and splitting
         'semantic-text-splitter>=0.15.0',
@@ -33,6 +34,9 @@ setup(
             'pytest>=8.0.0',
             'black>=24.0.0',
             'flake8>=7.0.0',
+        ],
+        'rar': [
+            'rarfile>=4.2',
         ]
     },
     entry_points={
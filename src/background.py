@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Coroutine
+from loguru import logger
+
+class BackgroundTasks:
+    """Фоновые задачи, результат которых не нужен пользователю (например, удаление загруженных файлов)"""
+
+    def __init__(self):
+        # Ссылки на задачи держим сами: event loop хранит только слабые ссылки
+        self._tasks: set[asyncio.Task] = set()
+
+    def spawn(self, coroutine: Coroutine[Any, Any, Any], name: str) -> asyncio.Task:
+        """Запуск задачи в текущем event loop; ошибка задачи только пишется в лог"""
+        task = asyncio.create_task(self._run(coroutine, name), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @staticmethod
+    async def _run(coroutine: Coroutine[Any, Any, Any], name: str) -> None:
+        try:
+            await coroutine
+        except Exception as e:
+            logger.error(f"❌ Ошибка фоновой задачи {name}: {e}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """Ожидание фоновых задач текущего event loop перед его закрытием"""
+        loop = asyncio.get_running_loop()
+        tasks = [task for task in self._tasks if task.get_loop() is loop]
+        if not tasks:
+            return
+        done, not_done = await asyncio.wait(tasks, timeout=timeout)
+        if not_done:
+            logger.warning(f"{len(not_done)} background tasks did not finish in {timeout}s")
+
+background_tasks = BackgroundTasks()
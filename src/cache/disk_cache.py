@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+from pydantic import BaseModel
+from loguru import logger
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 содержимого файла (читается блоками, без загрузки целиком в память)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def normalized_text_sha256(text: str) -> str:
+    """SHA-256 текста без учета различий в пробельных символах (переносы строк, отступы, повторные пробелы)"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def schema_version(model: type[BaseModel]) -> str:
+    """Версия схемы pydantic-модели: меняется при любом изменении полей или описаний"""
+    schema_json = json.dumps(model.model_json_schema(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(schema_json.encode("utf-8")).hexdigest()[:16]
+
+class DiskCache:
+    """Персистентный кэш ключ-значение на SQLite с вытеснением по TTL и размеру"""
+
+    def __init__(self, path: str, namespace: str, ttl_seconds: int, max_size_bytes: int):
+        """
+        Args:
+            path: Путь к файлу базы SQLite (может быть общим для нескольких пространств имен)
+            namespace: Пространство имен записей (results, ocr, ...)
+            ttl_seconds: Время жизни записи, секунд
+            max_size_bytes: Максимальный суммарный размер значений в пространстве имен
+        """
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Отдельное соединение на вызов: кэш используется из разных потоков и процессов
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[str]:
+        """Значение по ключу или None, если записи нет или она устарела"""
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                connection.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                return None
+            connection.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Сохранение значения с последующим вытеснением устаревших и давно неиспользуемых записей"""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_size_bytes:
+            logger.warning(f"⚠️ Значение для кэша {self.namespace} больше лимита ({size} байт), не сохраняем")
+            return
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, value, size, now, now)
+            )
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+            (self.namespace, now - self.ttl_seconds)
+        )
+        total_size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        rows = connection.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at",
+            (self.namespace,)
+        ).fetchall()
+        evicted = 0
+        for key, size in rows:
+            if total_size <= self.max_size_bytes:
+                break
+            connection.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            total_size -= size
+            evicted += 1
+        logger.info(f"Cache {self.namespace}: evicted {evicted} entries")
@@ -1,20 +1,94 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Literal
+from typing import Literal, Optional
 
 class BotConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='TELEGRAM_', extra='ignore')
     bot_token: str
+    progress_edit_interval: float = 3.0 # Минимальный интервал между редактированиями статусного сообщения, секунд
+    download_concurrency: int = 4 # Сколько файлов задания скачивается из Telegram параллельно
 
 class AnalyzerConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='ANALYZER_', extra='ignore')
     type: Literal["mistral", "ollama"] = "mistral" # ollama
+    file_concurrency: int = 4 # Сколько файлов одного задания обрабатывается параллельно
+    archive_max_depth: int = 2 # Глубина вложенности архивов (1 - вложенные архивы не разворачиваются)
+    archive_max_size_mb: int = 200 # Максимальный объем файлов, распаковываемых в память из одного архива
+    archive_max_members: int = 500 # Максимальное число файлов, извлекаемых из одного архива
+
+class DoclingConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='DOCLING_', extra='ignore')
+    workers: int = 2 # Процессов конвертации docling; 0 - конвертировать в потоке процесса бота
+    timeout: float = 300.0 # Таймаут конвертации одного документа, секунд
 
 class LLMConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='LLM_', extra='ignore')
     model: str
     host: str
+    chunk_concurrency: int = 2 # Одновременных запросов к Ollama по чанкам (согласовать с OLLAMA_NUM_PARALLEL)
+    chunk_timeout: float = 120.0 # Таймаут обработки одного чанка, секунд
+    chunk_retries: int = 2 # Повторов при ошибке обработки чанка
+    chunk_routing: bool = True # Отправлять в LLM только чанки, найденные по ключевым словам полей
+    routing_top_k: int = 3 # Сколько лучших чанков отправлять на каждую группу полей
+    extraction_mode: Literal["full", "partitioned"] = "full" # partitioned - запрашивать по чанку только схемы нужных групп полей
+    early_stop: bool = True # Пропускать чанки, когда нужные из них поля уже уверенно заполнены
+    early_stop_confidence: float = 0.6 # Доля согласных ответов, при которой поле считается заполненным
+    early_stop_min_votes: int = 1 # Минимум ответов за значение поля
+    chunk_sizing: Literal["fixed", "budget"] = "fixed" # budget - размер чанка из контекста модели за вычетом промпта и схемы
+    chunk_size: int = 750 # Размер чанка в токенах для режима fixed
+    chunk_overlap: int = 0 # Перекрытие соседних чанков, токенов
+    num_ctx: int = 8192 # Контекст модели в токенах, передается в каждом запросе к Ollama
+    keep_alive: str = "30m" # Сколько Ollama держит модель в памяти после последнего запроса
+    warmup: bool = True # Загружать модель в фоне при старте, чтобы первый запрос не ждал загрузки
+    response_reserve_tokens: int = 1024 # Токенов контекста, оставляемых под ответ модели в режиме budget
+    tokenizer_name: str = "ai-forever/sbert_large_nlu_ru" # Токенизатор для разбиения на чанки (HuggingFace Hub)
+    tokenizer_path: Optional[str] = None # Локальный tokenizer.json; если файл есть, Hub не используется
 
 class MistralConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='MISTRAL_', extra='ignore')
     api_key: str    
     model: str
+    server_url: Optional[str] = None # Другой адрес API (прокси, локальная заглушка для бенчмарков); None - api.mistral.ai
+    document_reference: Literal["file_id", "signed_url"] = "file_id" # Как документ передается в чат; file_id не требует запроса подписанной ссылки
+    rate_limit_rps: float = 5.0 # Запросов в секунду на ключ API (0 - без ограничения)
+    rate_limit_tpm: int = 0 # Токенов в минуту на ключ API (0 - без ограничения)
+    max_concurrency: int = 8 # Максимум одновременных запросов; после 429 снижается вдвое и восстанавливается постепенно
+    max_retries: int = 5 # Повторов запроса после 429, 5xx, таймаута или ошибки соединения
+    retry_base_delay: float = 1.0 # Базовая задержка повтора, секунд (растет экспоненциально, со случайным разбросом)
+    retry_max_delay: float = 60.0 # Максимальная задержка повтора, секунд
+    ocr_model: str = "mistral-ocr-latest"
+    ocr_window_pages: int = 8 # Страниц в одном запросе к OCR
+    ocr_concurrency: int = 4 # Одновременных запросов к OCR на документ
+    ocr_output_mode: Literal["text", "annotations", "images"] = "text" # Что из изображений попадает в markdown страниц
+
+class CacheConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='CACHE_', extra='ignore')
+    enabled: bool = True
+    path: str = "data/cache.sqlite3"
+    result_ttl_seconds: int = 30 * 24 * 3600 # Время жизни результатов анализа файлов
+    result_max_size_mb: int = 200 # Максимальный размер кэша результатов
+    ocr_ttl_seconds: int = 90 * 24 * 3600 # Время жизни страниц OCR
+    ocr_max_size_mb: int = 500 # Максимальный размер кэша OCR
+    chunk_ttl_seconds: int = 90 * 24 * 3600 # Время жизни результатов извлечения по чанкам (локальная LLM)
+    chunk_max_size_mb: int = 300 # Максимальный размер кэша чанков
+
+class SchedulerConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='SCHEDULER_', extra='ignore')
+    workers: int = 2 # Сколько заданий анализа выполняется одновременно
+    max_queue: int = 100 # Максимум ожидающих заданий всех пользователей
+    max_per_user: int = 3 # Максимум ожидающих заданий одного пользователя
+
+class JobsConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='JOBS_', extra='ignore')
+    mode: Literal["inprocess", "queue"] = "inprocess" # queue - анализ выполняют отдельные процессы worker.py
+    queue_path: str = "data/jobs.sqlite3" # База очереди (на общем томе бота и исполнителей)
+    files_dir: str = "data/jobs" # Каталог для файлов заданий (на общем томе)
+    worker_processes: int = 2 # Процессов-исполнителей, запускаемых worker.py
+    lease_seconds: float = 120.0 # Аренда задания исполнителем (продлевается, пока задание выполняется)
+    max_attempts: int = 3 # Сколько раз задание берется в работу
+    poll_interval: float = 2.0 # Период опроса очереди, секунд
+
+class MetricsConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', env_prefix='METRICS_', extra='ignore')
+    enabled: bool = False # Поднимать HTTP-эндпоинт /metrics в формате Prometheus
+    host: str = "127.0.0.1"
+    port: int = 9100 # Процессы-исполнители используют port + 1 + номер процесса
@@ -0,0 +1,94 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from loguru import logger
+from sources.document_source import DocumentSource
+
+# DocumentConverter процесса пула; создается один раз в инициализаторе процесса
+_converter = None
+
+def _init_worker() -> None:
+    global _converter
+    from docling.document_converter import DocumentConverter
+    _converter = DocumentConverter()
+
+def convert_to_markdown(converter, source: DocumentSource) -> str:
+    """Конвертация документа в markdown; документ из памяти передается в docling как DocumentStream"""
+    from docling.document_converter import ConversionStatus
+    if source.path is not None:
+        document = source.path
+    else:
+        from docling.datamodel.base_models import DocumentStream
+        document = DocumentStream(name=source.file_name, stream=io.BytesIO(source.data))
+    result = converter.convert(document)
+    if result.status != ConversionStatus.SUCCESS:
+        raise ValueError(f"❌ Ошибка при обработке с docling: {result.status}")
+    return result.document.export_to_markdown()
+
+def _convert_in_worker(source: DocumentSource) -> str:
+    # Возвращается markdown, а не DoclingDocument, чтобы не передавать между процессами весь документ
+    return convert_to_markdown(_converter, source)
+
+class DoclingPool:
+    """
+    Пул процессов для docling: конвертация не занимает GIL процесса бота, документы конвертируются параллельно.
+
+    Процессы создаются при первой конвертации и живут до shutdown(). Зависшую конвертацию нельзя
+    отменить внутри процесса, поэтому по таймауту пул пересоздается - конвертации, выполнявшиеся
+    в нем одновременно, тоже завершаются ошибкой.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 300.0):
+        """
+        Args:
+            workers: Количество процессов пула
+            timeout: Таймаут конвертации одного документа, секунд
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork процесса с потоками event loop и torch небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            logger.info(f"Docling process pool started: {self.workers} workers")
+        return self._executor
+
+    async def convert(self, source: DocumentSource) -> str:
+        """Конвертация документа в markdown в процессе пула"""
+        executor = self._get_executor()
+        future = asyncio.get_running_loop().run_in_executor(executor, _convert_in_worker, source)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Docling conversion timed out after {self.timeout}s: {source.name}")
+            self._restart(executor)
+            raise TimeoutError(f"Конвертация docling не завершилась за {self.timeout} с")
+        except BrokenProcessPool:
+            logger.error(f"❌ Docling process pool is broken, restarting: {source.name}")
+            self._restart(executor)
+            raise
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        if self._executor is not executor:
+            # Пул уже пересоздан другой конвертацией
+            return
+        self._executor = None
+        # Процессы с зависшей конвертацией не завершатся сами - останавливаем их принудительно
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -1,16 +1,279 @@
+import asyncio
+import inspect
 from abc import ABC, abstractmethod
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from loguru import logger
+from background import background_tasks
+from cache.disk_cache import DiskCache, schema_version
+from config import AnalyzerConfig, CacheConfig
+from jobs.job_queue import current_checkpoint
+from metrics import metrics
+from progress import current_progress
+from queries import TenderData
+from sources.archive_reader import ArchiveReader
+from sources.document_source import DocumentInput, DocumentSource
+
+T = TypeVar("T")
 
 class AnalyzeResult(BaseModel):
     summary: Optional[str] = None # Сводка по всем файлам
     file_errors: Optional[list[str]] = None # Список файлов, которые не удалось обработать
+    duplicate_files: Optional[list[str]] = None # Файлы, совпавшие по содержимому с другими файлами задания
+
+def create_analyzer(analyzer_type: str) -> "DocumentsAnalyzer":
+    """Создание анализатора по типу; модули анализаторов импортируются только при необходимости"""
+    if analyzer_type == "mistral":
+        from mistral_analyzer import MistralAnalyzer
+        return MistralAnalyzer()
+    elif analyzer_type == "ollama":
+        from local_LLM_analyzer import LocalLLMAnalyzer
+        return LocalLLMAnalyzer()
+    else:
+        raise ValueError(f"Неизвестный тип анализатора: {analyzer_type}")
 
 class DocumentsAnalyzer(ABC):
+    analyzer_type: str = ""
+    supported_extensions: set[str] = set()
+
     def __init__(self):
+        self.analyzer_config = AnalyzerConfig()
+        self.cache_config = CacheConfig()
+        self.result_cache: Optional[DiskCache] = None
+        if self.cache_config.enabled:
+            self.result_cache = DiskCache(
+                path=self.cache_config.path,
+                namespace="results",
+                ttl_seconds=self.cache_config.result_ttl_seconds,
+                max_size_bytes=self.cache_config.result_max_size_mb * 1024 * 1024
+            )
+        self.archive_reader = ArchiveReader(
+            supported_extensions=self.supported_extensions,
+            max_depth=self.analyzer_config.archive_max_depth,
+            max_total_bytes=self.analyzer_config.archive_max_size_mb * 1024 * 1024,
+            max_members=self.analyzer_config.archive_max_members
+        )
+
+    @abstractmethod
+    async def analyze_async(self, file_paths: list[DocumentInput]) -> AnalyzeResult:
         pass
 
     @abstractmethod
-    def analyze(self, file_paths: list[str]) -> AnalyzeResult:
+    async def _analyze_file(self, source: DocumentSource) -> TenderData:
         pass
 
+    def close(self) -> None:
+        """Освобождение ресурсов анализатора (процессы, соединения) при остановке приложения"""
+
+    def analyze(self, file_paths: list[DocumentInput]) -> AnalyzeResult:
+        """Синхронная обертка над analyze_async для вызова вне event loop"""
+        async def run() -> AnalyzeResult:
+            try:
+                return await self.analyze_async(file_paths)
+            finally:
+                # Фоновые задачи (удаление файлов из API) не должны прерываться закрытием event loop
+                await background_tasks.drain()
+
+        return asyncio.run(run())
+
+    async def _run_blocking(self, func: Callable[..., T], *args: Any) -> T:
+        """Выполнение синхронного шага (docling, токенизация) в пуле потоков"""
+        return await asyncio.to_thread(func, *args)
+
+    @staticmethod
+    async def _resolve_source(file_path: DocumentInput) -> Optional[DocumentSource]:
+        """Получение документа; None - документ получить не удалось"""
+        if not inspect.isawaitable(file_path):
+            return DocumentSource.coerce(file_path)
+        try:
+            return await file_path
+        except Exception as e:
+            logger.error(f"❌ Не удалось получить документ: {e}")
+            return None
+
+    async def _expand_source(self, source: DocumentSource) -> tuple[list[DocumentSource], list[str]]:
+        """
+        Архив заменяется его документами (в памяти), остальные документы - как есть.
+
+        Returns:
+            Документы для анализа и имя архива, если в нем не нашлось ни одного документа
+        """
+        if not self.archive_reader.is_archive(source):
+            return [source], []
+        return await self._run_blocking(self.archive_reader.expand, [source])
+
+    async def _map_files(self, file_paths: list[DocumentInput], func: Callable[[DocumentSource], Awaitable[T]]
+                         ) -> tuple[list[tuple[DocumentSource, T | BaseException]], list[str], list[DocumentSource]]:
+        """
+        Параллельная обработка документов задания с ограничением file_concurrency.
+
+        Документ начинает обрабатываться, как только он получен (скачан, извлечен из архива),
+        не дожидаясь остальных документов задания.
+
+        Returns:
+            Пары (документ, результат) в порядке file_paths, исключение документа - на месте результата;
+            имена архивов, в которых не нашлось ни одного документа;
+            документы, совпавшие по содержимому с уже полученными (их результат в парах не повторяется,
+            чтобы при объединении одна и та же выдержка не получала несколько голосов)
+        """
+        semaphore = asyncio.Semaphore(max(1, self.analyzer_config.file_concurrency))
+        progress = current_progress.get()
+        if progress is not None:
+            progress.add_files(len(file_paths))
+
+        # Key: SHA-256 содержимого, Value: анализ первого документа с таким содержимым
+        analyses: dict[str, asyncio.Task] = {}
+        duplicates: list[DocumentSource] = []
+
+        async def analyze(source: DocumentSource) -> T:
+            async with semaphore:
+                return await func(source)
+
+        async def run(source: DocumentSource) -> T:
+            result = None
+            try:
+                # Одинаковые файлы задания (повторно отправленные, в разных архивах) анализируются один раз
+                digest = await self._run_blocking(source.sha256)
+                analysis = analyses.get(digest)
+                if analysis is None:
+                    analysis = analyses[digest] = asyncio.ensure_future(analyze(source))
+                else:
+                    logger.info(f"Документ {source.name} совпадает с уже полученным, повторно не анализируется")
+                    metrics.inc("file_dedup_hits_total")
+                    duplicates.append(source)
+                result = await analysis
+            finally:
+                if progress is not None:
+                    progress.file_done(result)
+            return result
+
+        async def run_input(file_path: DocumentInput) -> tuple[list[tuple[DocumentSource, T | BaseException]], list[str]]:
+            source = await self._resolve_source(file_path)
+            sources, failed_archives = await self._expand_source(source) if source is not None else ([], [])
+            if progress is not None and len(sources) != 1:
+                # Файл задания оказался архивом из нескольких документов или не был получен
+                progress.add_files(len(sources) - 1)
+            results = await asyncio.gather(*(run(source) for source in sources), return_exceptions=True)
+            return list(zip(sources, results)), failed_archives
+
+        results: list[tuple[DocumentSource, T | BaseException]] = []
+        failed_archives: list[str] = []
+        for input_results, input_failed in await asyncio.gather(*(run_input(file_path) for file_path in file_paths)):
+            results.extend(input_results)
+            failed_archives.extend(input_failed)
+        duplicate_ids = {id(source) for source in duplicates}
+        results = [(source, result) for source, result in results if id(source) not in duplicate_ids]
+        return results, failed_archives, duplicates
+
+    def _result_cache_key(self, source: DocumentSource) -> str:
+        """Ключ кэша: содержимое файла + тип анализатора + модель + версия схемы TenderData"""
+        return ":".join([source.sha256(), self.analyzer_type, self.model, schema_version(TenderData)])
+
+    async def _analyze_file_cached(self, source: DocumentSource) -> TenderData:
+        """Анализ файла с использованием кэша результатов и контрольных точек задания"""
+        checkpoint = current_checkpoint.get()
+        stores = [store for store in (checkpoint, self.result_cache) if store is not None]
+        if not stores:
+            with metrics.span("file", analyzer=self.analyzer_type):
+                return await self._analyze_file(source)
+
+        key = await self._run_blocking(self._result_cache_key, source)
+        for store in stores:
+            cached = await self._run_blocking(store.get, key)
+            if cached is not None:
+                logger.info(f"✅ Результат для {source.name} взят из кэша")
+                metrics.inc("result_cache_hits_total")
+                return TenderData.model_validate_json(cached)
+
+        metrics.inc("result_cache_misses_total")
+        with metrics.span("file", analyzer=self.analyzer_type):
+            result = await self._analyze_file(source)
+        # Пустой результат скорее говорит о сбое LLM, чем о пустом документе - не кэшируем
+        if result != TenderData():
+            for store in stores:
+                await self._run_blocking(store.set, key, result.model_dump_json())
+        return result
+
+    def _create_telegram_message(self, global_summary_content: TenderData) -> str:
+        """Создание Telegram сообщения"""
+        message_parts = []
+
+        if global_summary_content.procurement_name:
+            message_parts.append(f"📦 *Наименование закупки*: {global_summary_content.procurement_name}")
+        if global_summary_content.customer_info_company_name:
+            message_parts.append(f"🏢 *Заказчик*: {global_summary_content.customer_info_company_name}")
+        if global_summary_content.notice_number:
+            message_parts.append(f"📄 *Номер извещения*: {global_summary_content.notice_number}")
+        if global_summary_content.publication_and_submission_deadline:
+            message_parts.append(f"🗓️ *Срок подачи заявок*: {global_summary_content.publication_and_submission_deadline}")
+        if global_summary_content.lots:
+            lots_info = []
+            for i, lot in enumerate(global_summary_content.lots):
+                lot_details = []
+                if lot.name:
+                    lot_details.append(f"Наименование: {lot.name}")
+                if lot.initial_max_price:
+                    lot_details.append(f"Начальная максимальная цена: {lot.initial_max_price}")
+                if lot.currency:
+                    lot_details.append(f"Валюта: {lot.currency}")
+                if lot.quantity:
+                    lot_details.append(f"Количество: {lot.quantity}")
+                if lot_details:
+                    lots_info.append(f"Лот {i+1}: - " + "\n  - ".join(lot_details))
+            if lots_info:
+                message_parts.append(f"🏷️ *Информация о лотах*:\n" + "\n".join(lots_info))
+        if global_summary_content.delivery_department:
+            message_parts.append(f"🚚 *Подразделение поставки*: {global_summary_content.delivery_department}")
+        if global_summary_content.initial_max_price_with_vat:
+            message_parts.append(f"💰 *Начальная максимальная цена (с НДС)*: {global_summary_content.initial_max_price_with_vat}")
+        if global_summary_content.contact_persons:
+            contact_persons_info = []
+            for person in global_summary_content.contact_persons:
+                person_details = []
+                if person.full_name:
+                    person_details.append(f"ФИО: {person.full_name}")
+                if person.phone_number:
+                    person_details.append(f"📞 Телефон: {person.phone_number}")
+                if person.email:
+                    person_details.append(f"📧 Email: {person.email}")
+                if person.position:
+                    person_details.append(f"💼 Должность: {person.position}")
+                if person_details:
+                    contact_persons_info.append("  - " + "\n    - ".join(person_details))
+            if contact_persons_info:
+                message_parts.append(f"👤 *Контактные лица*:\n" + "\n".join(contact_persons_info))
+        if global_summary_content.application_security:
+            message_parts.append(f"🔐 *Обеспечение заявки*: {global_summary_content.application_security}")
+        if global_summary_content.re_bidding_date:
+            message_parts.append(f"🔄 *Дата переторжки*: {global_summary_content.re_bidding_date}")
+        if global_summary_content.etp_platform:
+            message_parts.append(f"🌐 *ЭТП*: {global_summary_content.etp_platform}")
+        if global_summary_content.application_review_deadline:
+            message_parts.append(f"📅 *Срок рассмотрения заявок*: {global_summary_content.application_review_deadline}")
+        if global_summary_content.results_summary_date:
+            message_parts.append(f"📊 *Дата подведения итогов*: {global_summary_content.results_summary_date}")
+        if global_summary_content.contract_security:
+            message_parts.append(f"📜 *Обеспечение договора*: {global_summary_content.contract_security}")
+        if global_summary_content.participation_price:
+            message_parts.append(f"💲 *Цена участия*: {global_summary_content.participation_price}")
+        if global_summary_content.warranty_requirements:
+            message_parts.append(f"🛠️ *Гарантийные требования*: {global_summary_content.warranty_requirements}")
+        if global_summary_content.required_delivery_period:
+            message_parts.append(f"⏱️ *Срок поставки*: {global_summary_content.required_delivery_period}")
+        if global_summary_content.payment_terms:
+            message_parts.append(f"💳 *Условия оплаты*: {global_summary_content.payment_terms}")
+        if global_summary_content.delivery_documents_names:
+            message_parts.append(f"📄 *Документы для поставки*: {global_summary_content.delivery_documents_names}")
+        if global_summary_content.delivery_method:
+            message_parts.append(f"📦 *Метод доставки*: {global_summary_content.delivery_method}")
+        if global_summary_content.product_dimensions:
+            message_parts.append(f"📏 *Размеры товара*: {global_summary_content.product_dimensions}")
+        if global_summary_content.product_purpose:
+            message_parts.append(f"🎯 *Назначение товара*: {global_summary_content.product_purpose}")
+        if global_summary_content.contract_term:
+            message_parts.append(f"🗓️ *Срок действия договора*: {global_summary_content.contract_term}")
+        if global_summary_content.delivery_address:
+            message_parts.append(f"📍 *Адрес доставки*: {global_summary_content.delivery_address}")
+        
+        telegram_markdown_content = "\n\n".join(message_parts)
+        return telegram_markdown_content
@@ -0,0 +1,121 @@
+import asyncio
+import random
+import weakref
+from typing import AsyncIterable, Awaitable, Callable, Optional, Sequence, TypeVar
+from loguru import logger
+from metrics import metrics
+from progress import current_progress
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Проверка перед запуском элемента: True - элемент можно пропустить (например, все его поля уже заполнены)
+SkipPredicate = Callable[[int, T], bool]
+
+class ChunkExecutor:
+    """Параллельная обработка чанков/страниц документа с ограничением конкурентности, таймаутом и повторами"""
+
+    def __init__(self, concurrency: int = 2, timeout: float = 120.0, retries: int = 2, retry_delay: float = 1.0):
+        """
+        Args:
+            concurrency: Максимальное число одновременных запросов (общее для всех документов)
+            timeout: Таймаут одной попытки обработки чанка, секунд
+            retries: Количество повторов после неудачной попытки
+            retry_delay: Базовая задержка между повторами, секунд (растет экспоненциально)
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        # asyncio.Semaphore привязан к event loop, поэтому держим по одному на loop
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _run_one(self, index: int, item: T, func: Callable[[int, T], Awaitable[R]], name: str,
+                       skip: Optional[SkipPredicate], skipped: list[int]) -> Optional[R]:
+        result = await self._attempt(index, item, func, name, skip, skipped)
+        progress = current_progress.get()
+        if progress is not None:
+            progress.chunk_done(result)
+        return result
+
+    async def _attempt(self, index: int, item: T, func: Callable[[int, T], Awaitable[R]], name: str,
+                       skip: Optional[SkipPredicate], skipped: list[int]) -> Optional[R]:
+        semaphore = self._semaphore()
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    # Решение о пропуске принимается в последний момент, когда известны результаты предыдущих чанков
+                    if skip is not None and skip(index, item):
+                        skipped.append(index)
+                        return None
+                    return await asyncio.wait_for(func(index, item), timeout=self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = "таймаут" if isinstance(e, asyncio.TimeoutError) else e
+                if attempt < self.retries:
+                    delay = self.retry_delay * (2 ** attempt) * (1 + random.random() / 2)
+                    logger.warning(f"⚠️ Ошибка обработки {name}={index} (попытка {attempt + 1}/{self.retries + 1}): {error}. Повтор через {delay:.1f} с")
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(f"❌ Не удалось обработать {name}={index} после {self.retries + 1} попыток: {error}")
+        return None
+
+    def _report_skipped(self, skipped: list[int], total: int, name: str) -> None:
+        metrics.inc(f"{name}s_total", total)
+        if skipped:
+            metrics.inc(f"{name}s_skipped", len(skipped))
+            logger.info(f"Early stop: skipped {len(skipped)} of {total} {name}s")
+
+    async def map(self, items: Sequence[T], func: Callable[[int, T], Awaitable[R]], name: str = "chunk",
+                  skip: Optional[SkipPredicate] = None) -> list[Optional[R]]:
+        """
+        Обработка всех элементов с сохранением порядка.
+
+        Args:
+            items: Чанки или страницы документа
+            func: Корутина обработки, получает индекс и элемент
+            name: Название элемента для логов
+            skip: Проверка перед запуском элемента, позволяющая пропустить ненужную работу
+
+        Returns:
+            Результаты в порядке items; None на месте элементов, которые не удалось обработать или пропущены
+        """
+        skipped: list[int] = []
+        progress = current_progress.get()
+        if progress is not None:
+            progress.add_chunks(len(items))
+        results = await asyncio.gather(*(self._run_one(i, item, func, name, skip, skipped) for i, item in enumerate(items)))
+        self._report_skipped(skipped, len(items), name)
+        return results
+
+    async def map_stream(self, items: AsyncIterable[T], func: Callable[[int, T], Awaitable[R]], name: str = "chunk",
+                         skip: Optional[SkipPredicate] = None) -> list[Optional[R]]:
+        """
+        То же, что map, но элементы поступают из асинхронного источника (например, страницы OCR),
+        и обработка каждого начинается сразу после его получения.
+        """
+        tasks: list[asyncio.Task] = []
+        skipped: list[int] = []
+        progress = current_progress.get()
+        try:
+            async for item in items:
+                if progress is not None:
+                    progress.add_chunks(1)
+                tasks.append(asyncio.create_task(self._run_one(len(tasks), item, func, name, skip, skipped)))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        results = await asyncio.gather(*tasks)
+        self._report_skipped(skipped, len(tasks), name)
+        return results
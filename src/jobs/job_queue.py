@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from loguru import logger
+
+JobStatus = Literal["queued", "running", "done", "failed", "delivered"]
+
+class QueuedFile(BaseModel):
+    file_name: str
+    path: str
+
+class QueuedJob(BaseModel):
+    id: int
+    user_id: int
+    chat_id: int
+    files: list[QueuedFile] = Field(default_factory=list)
+    status: JobStatus = "queued"
+    summary: Optional[str] = None
+    file_errors: list[str] = Field(default_factory=list)
+    duplicate_files: list[str] = Field(default_factory=list) # Файлы, совпавшие по содержимому с другими файлами задания
+    error: Optional[str] = None
+    attempts: int = 0
+    duration: Optional[float] = None # Время анализа, секунд
+
+class JobQueue:
+    """Долговременная очередь заданий анализа на SQLite, общая для бота и процессов-исполнителей"""
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Args:
+            path: Путь к файлу базы SQLite (на общем томе для нескольких хостов)
+            max_attempts: Сколько раз задание берется в работу, прежде чем считается неуспешным
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    files TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    summary TEXT,
+                    file_errors TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_until REAL,
+                    duration REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if "progress" not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+            if "duplicate_files" not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN duplicate_files TEXT")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    job_id INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (job_id, key)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> QueuedJob:
+        return QueuedJob(
+            id=row["id"],
+            user_id=row["user_id"],
+            chat_id=row["chat_id"],
+            files=[QueuedFile(**item) for item in json.loads(row["files"])],
+            status=row["status"],
+            summary=row["summary"],
+            file_errors=json.loads(row["file_errors"]) if row["file_errors"] else [],
+            duplicate_files=json.loads(row["duplicate_files"]) if row["duplicate_files"] else [],
+            error=row["error"],
+            attempts=row["attempts"],
+            duration=row["duration"],
+        )
+
+    def enqueue(self, user_id: int, chat_id: int, files: list[QueuedFile]) -> int:
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (user_id, chat_id, files, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (user_id, chat_id, json.dumps([file.model_dump() for file in files], ensure_ascii=False), now, now)
+            )
+            return cursor.lastrowid
+
+    def count_queued(self, user_id: Optional[int] = None) -> int:
+        """Количество ожидающих заданий (без заданий в работе), всех или одного пользователя"""
+        with self._connect() as connection:
+            if user_id is None:
+                return connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            return connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def position(self, job_id: int) -> int:
+        """
+        Позиция задания в порядке, в котором его возьмут исполнители (1 - будет взято следующим, 0 - уже в работе или завершено).
+
+        Повторяет порядок claim: следующим берется задание пользователя с наименьшим числом заданий в работе,
+        при равенстве - самое раннее; считается, что задания в работе за это время не завершатся.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != "queued":
+                return 0
+            running = dict(connection.execute(
+                "SELECT user_id, COUNT(*) FROM jobs WHERE status = 'running' AND lease_until >= ? GROUP BY user_id", (now,)
+            ).fetchall())
+            pending = connection.execute(
+                "SELECT id, user_id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ? AND attempts < ?) "
+                "ORDER BY created_at, id",
+                (now, self.max_attempts)
+            ).fetchall()
+
+        # Key: user_id, Value: порядковые номера ожидающих заданий пользователя по времени постановки
+        user_jobs: dict[int, list[int]] = {}
+        for index, (_, user_id) in enumerate(pending):
+            user_jobs.setdefault(user_id, []).append(index)
+        position = 0
+        while user_jobs:
+            user_id = min(user_jobs, key=lambda user: (running.get(user, 0), user_jobs[user][0]))
+            position += 1
+            if pending[user_jobs[user_id].pop(0)]["id"] == job_id:
+                return position
+            running[user_id] = running.get(user_id, 0) + 1
+            if not user_jobs[user_id]:
+                del user_jobs[user_id]
+        return 0
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[QueuedJob]:
+        """
+        Взять следующее задание в работу.
+
+        Задания с истекшей арендой (исполнитель упал) возвращаются в работу.
+        Первым берется задание пользователя, у которого сейчас меньше всего заданий в работе.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Задания упавших исполнителей, исчерпавшие попытки, считаются неуспешными
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Превышено число попыток', updated_at = ? "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                row = connection.execute(
+                    """
+                    SELECT j.* FROM jobs j
+                    WHERE j.status = 'queued' OR (j.status = 'running' AND j.lease_until < :now)
+                    ORDER BY (
+                        SELECT COUNT(*) FROM jobs r
+                        WHERE r.user_id = j.user_id AND r.status = 'running' AND r.lease_until >= :now
+                    ), j.created_at, j.id
+                    LIMIT 1
+                    """,
+                    {"now": now}
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row["id"])
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        job = self._to_job(row)
+        job.status = "running"
+        job.attempts += 1
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> None:
+        """Продление аренды задания исполнителем"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + lease_seconds, now, job_id, worker_id)
+            )
+
+    def complete(self, job_id: int, worker_id: str, summary: Optional[str], file_errors: list[str], duration: float,
+                 duplicate_files: Optional[list[str]] = None) -> bool:
+        """
+        Успешное завершение задания исполнителем.
+
+        Returns:
+            False, если задание уже не принадлежит исполнителю (аренда истекла и его взял другой)
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'done', summary = ?, file_errors = ?, duplicate_files = ?, duration = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (summary, json.dumps(file_errors, ensure_ascii=False), json.dumps(duplicate_files or [], ensure_ascii=False),
+                 duration, time.time(), job_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            connection.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            return True
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """
+        Ошибка выполнения: задание возвращается в очередь, пока не исчерпаны попытки.
+
+        Returns:
+            False, если задание уже не принадлежит исполнителю
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_until = NULL, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, error, time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def fetch_finished(self) -> list[QueuedJob]:
+        """Завершенные задания, результат которых еще не доставлен пользователю"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs WHERE status IN ('done', 'failed') ORDER BY updated_at").fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def mark_delivered(self, job_id: int) -> None:
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET status = 'delivered', updated_at = ? WHERE id = ?", (time.time(), job_id))
+            connection.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    def set_progress(self, job_id: int, progress: str) -> None:
+        """Сохранение прогресса выполнения задания (JSON AnalyzeProgress) для отображения ботом"""
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+
+    def fetch_progress(self, job_ids: list[int]) -> dict[int, str]:
+        """Прогресс выполняющихся заданий. Key: id задания, Value: JSON AnalyzeProgress"""
+        if not job_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT id, progress FROM jobs WHERE status = 'running' AND progress IS NOT NULL AND id IN ({placeholders})",
+                job_ids
+            ).fetchall()
+        return {row["id"]: row["progress"] for row in rows}
+
+    def get_checkpoint(self, job_id: int, key: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM checkpoints WHERE job_id = ? AND key = ?", (job_id, key)).fetchone()
+        return row["value"] if row else None
+
+    def save_checkpoint(self, job_id: int, key: str, value: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, key, value) VALUES (?, ?, ?)", (job_id, key, value)
+            )
+
+class JobCheckpoint:
+    """Промежуточные результаты (чанки, файлы) одного задания: после падения исполнителя задание продолжается с них"""
+
+    def __init__(self, queue: JobQueue, job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+
+    def get(self, key: str) -> Optional[str]:
+        return self.queue.get_checkpoint(self.job_id, key)
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            self.queue.save_checkpoint(self.job_id, key, value)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Не удалось сохранить контрольную точку задания {self.job_id}: {e}")
+
+# Контрольные точки текущего задания; устанавливается исполнителем, None при анализе внутри бота
+current_checkpoint: ContextVar[Optional[JobCheckpoint]] = ContextVar("current_checkpoint", default=None)
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Optional
+import ollama
+from loguru import logger
+from metrics import metrics
+
+NANOSECONDS = 1e9
+
+class OllamaClient:
+    """
+    Клиент Ollama с управляемой загрузкой модели.
+
+    - модель прогревается в фоне при создании клиента, чтобы первый запрос не ждал загрузки;
+    - keep_alive и num_ctx передаются явно в каждом запросе: смена num_ctx между запросами
+      заставляет Ollama перезагрузить модель, а keep_alive не дает выгрузить ее между заданиями;
+    - неизменная часть промпта (инструкция и схема) передается system-сообщением перед чанком,
+      поэтому префикс совпадает у всех запросов и Ollama переиспользует его KV-кэш.
+
+    Статистика ответов Ollama (загрузка модели, токены промпта и ответа) пишется в metrics.
+    """
+
+    def __init__(self, host: str, model: str, num_ctx: int, keep_alive: str, timeout: float = 60.0):
+        self.host = host
+        self.model = model
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.client = ollama.Client(host=host, timeout=timeout)
+        # Соединения асинхронного клиента привязаны к event loop, поэтому держим по клиенту на loop
+        self._async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient] = weakref.WeakKeyDictionary()
+
+    @property
+    def async_client(self) -> ollama.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = ollama.AsyncClient(host=self.host, timeout=self.timeout)
+        return client
+
+    def check_connection(self) -> bool:
+        """Проверка подключения к Ollama."""
+        try:
+            self.client.list()
+            logger.info(f"✅ Успешное подключение к Ollama на {self.host}")
+            return True
+        except ollama.ResponseError as e:
+            error_message = f"❌ Ошибка подключения к Ollama на {self.host}: {e}"
+            logger.error(error_message)
+            raise Exception(error_message)
+
+    def warmup(self) -> None:
+        """Загрузка модели с рабочим num_ctx: запрос без промпта только загружает модель в память"""
+        try:
+            response = self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive, options={"num_ctx": self.num_ctx})
+            self._record(response, "warmup")
+            logger.info(f"✅ Модель {self.model} загружена (num_ctx={self.num_ctx}, keep_alive={self.keep_alive})")
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть модель {self.model}: {e}")
+
+    def start_warmup(self) -> threading.Thread:
+        """Прогрев модели в фоновом потоке, не задерживая старт приложения"""
+        thread = threading.Thread(target=self.warmup, name="ollama-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    async def chat(self, user: str, format: dict[str, Any], system: Optional[str] = None,
+                   options: Optional[dict[str, Any]] = None, name: str = "chat") -> ollama.ChatResponse:
+        """
+        Запрос к модели.
+
+        Args:
+            user: Переменная часть запроса (чанк документа)
+            format: JSON-схема ответа
+            system: Неизменная часть промпта, общая для серии запросов
+            options: Параметры генерации; num_ctx подставляется из настроек клиента
+            name: Префикс метрик запроса
+        """
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": user})
+        response = await self.async_client.chat(
+            model=self.model,
+            messages=messages,
+            options={**(options or {}), "num_ctx": self.num_ctx},
+            format=format,
+            keep_alive=self.keep_alive
+        )
+        self._record(response, name)
+        return response
+
+    @staticmethod
+    def _record(response: Any, name: str) -> None:
+        """
+        Запись статистики ответа. prompt_eval_count - токены промпта, которые модель вычислила заново;
+        токены префикса, найденного в KV-кэше, в него не входят, поэтому выигрыш от кэша виден
+        как снижение ollama_{name}_prompt_eval_tokens на запрос.
+        """
+        metrics.record_tokens("ollama", name, response.prompt_eval_count, response.eval_count)
+        metrics.inc(f"ollama_{name}_requests")
+        if response.load_duration:
+            metrics.observe(f"ollama_{name}_load_seconds", response.load_duration / NANOSECONDS)
+        if response.prompt_eval_count:
+            metrics.inc(f"ollama_{name}_prompt_eval_tokens", response.prompt_eval_count)
+        if response.prompt_eval_duration:
+            metrics.observe(f"ollama_{name}_prompt_eval_seconds", response.prompt_eval_duration / NANOSECONDS)
+        if response.eval_count:
+            metrics.inc(f"ollama_{name}_eval_tokens", response.eval_count)
+        if response.total_duration:
+            metrics.observe(f"ollama_{name}_total_seconds", response.total_duration / NANOSECONDS)
@@ -0,0 +1,217 @@
+import asyncio
+import random
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from loguru import logger
+from config import MistralConfig
+from metrics import metrics
+
+T = TypeVar("T")
+
+# Коды ответа, после которых запрос стоит повторить
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Грубые оценки токенов запросов, стоимость которых до ответа неизвестна (фактический расход списывается по usage)
+TOKENS_PER_PAGE = 1000
+BYTES_PER_DOCUMENT_TOKEN = 16
+
+class TokenBucket:
+    """Корзина токенов: rate единиц в секунду, не больше capacity впрок; расход может уводить баланс в минус"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Сколько секунд ждать, пока в корзине наберется amount (не больше capacity)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+class AdaptiveRateLimiter:
+    """
+    Ограничение запросов к API с одним ключом: общее для всех клиентов процесса.
+
+    - корзины токенов ограничивают запросы в секунду и токены в минуту;
+    - число одновременных запросов подстраивается по AIMD: растет на 1/limit после успешного запроса
+      и уменьшается вдвое после ответа 429, при этом новые запросы ждут Retry-After;
+    - 429, 5xx, таймауты и ошибки соединения повторяются с экспоненциальной задержкой и случайным разбросом.
+    """
+
+    def __init__(self, name: str, requests_per_second: float = 0.0, tokens_per_minute: int = 0,
+                 max_concurrency: int = 8, min_concurrency: int = 1, max_retries: int = 5,
+                 retry_base_delay: float = 1.0, retry_max_delay: float = 60.0):
+        """
+        Args:
+            name: Имя API для логов и метрик
+            requests_per_second: Лимит запросов в секунду (0 - без ограничения)
+            tokens_per_minute: Лимит токенов в минуту (0 - без ограничения)
+            max_concurrency: Верхняя граница одновременных запросов
+            min_concurrency: Нижняя граница, до которой limit снижается после 429
+            max_retries: Количество повторов после неудачной попытки
+            retry_base_delay: Базовая задержка между повторами, секунд (растет экспоненциально)
+            retry_max_delay: Максимальная задержка между повторами, секунд
+        """
+        self.name = name
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second)) if requests_per_second > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max(0, max_retries)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._paused_until = 0.0
+        # asyncio.Condition привязан к event loop, поэтому держим по одному на loop
+        self._conditions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Condition] = weakref.WeakKeyDictionary()
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            condition = self._conditions[loop] = asyncio.Condition()
+        return condition
+
+    async def call(self, func: Callable[[], Awaitable[T]], name: str = "call", tokens: int = 0,
+                   usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """
+        Выполнение запроса с ограничением и повторами.
+
+        Args:
+            func: Создает корутину запроса; вызывается заново на каждую попытку
+            name: Название запроса для логов и метрик
+            tokens: Оценка токенов запроса до отправки (0 - только дождаться неотрицательного баланса)
+            usage: Фактическое число токенов по ответу; разница с оценкой списывается из корзины
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(tokens)
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                await self._release()
+                raise
+            except Exception as e:
+                throttled, retry_after = self._classify(e)
+                await self._release(throttled=throttled, retry_after=retry_after)
+                if not self._retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = max(retry_after or 0.0, self._backoff(attempt))
+                metrics.inc("api_retries_total", labels={"api": self.name, "call": name})
+                logger.warning(f"⚠️ {self.name} {name}: {e} (попытка {attempt + 1}/{self.max_retries + 1}). Повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+                continue
+            await self._release(success=True)
+            if usage is not None and self.tokens is not None:
+                used = usage(result)
+                if used:
+                    self.tokens.consume(used - tokens)
+            return result
+        raise AssertionError("unreachable")
+
+    async def _acquire(self, tokens: int) -> None:
+        condition = self._condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            while True:
+                delay = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.delay(1) if self.requests else 0.0,
+                    # Даже без оценки запрос ждет, пока баланс после списания фактического расхода не станет неотрицательным
+                    self.tokens.delay(tokens) if self.tokens else 0.0
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens and tokens:
+                self.tokens.consume(tokens)
+        except BaseException:
+            await self._release()
+            raise
+        metrics.set_gauge("api_in_flight", self.in_flight, {"api": self.name})
+
+    async def _release(self, success: bool = False, throttled: bool = False, retry_after: Optional[float] = None) -> None:
+        if throttled:
+            # Multiplicative decrease и общая пауза до Retry-After
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            metrics.inc("api_throttled_total", labels={"api": self.name})
+            logger.warning(f"{self.name}: rate limited, concurrency limit lowered to {int(self.limit)}")
+        elif success:
+            # Additive increase: +1 к лимиту примерно за limit успешных запросов
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        metrics.set_gauge("api_concurrency_limit", int(self.limit), {"api": self.name})
+        condition = self._condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: одновременно получившие 429 клиенты повторяют запросы в разное время
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+            return True
+        return getattr(error, "status_code", None) in RETRY_STATUS_CODES
+
+    @staticmethod
+    def _classify(error: Exception) -> tuple[bool, Optional[float]]:
+        """Признак ответа 429 и значение Retry-After, секунд"""
+        if getattr(error, "status_code", None) != 429:
+            return False, None
+        response = getattr(error, "raw_response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        return True, _parse_retry_after(header)
+
+# Key: (ключ API, адрес API), Value: ограничитель, общий для анализатора и OCR
+_mistral_limiters: dict[tuple[str, Optional[str]], AdaptiveRateLimiter] = {}
+
+def mistral_rate_limiter(config: MistralConfig) -> AdaptiveRateLimiter:
+    """Ограничитель запросов к Mistral API: лимиты действуют на ключ API, поэтому он один на ключ в процессе"""
+    key = (config.api_key, config.server_url)
+    limiter = _mistral_limiters.get(key)
+    if limiter is None:
+        limiter = _mistral_limiters[key] = AdaptiveRateLimiter(
+            name="mistral",
+            requests_per_second=config.rate_limit_rps,
+            tokens_per_minute=config.rate_limit_tpm,
+            max_concurrency=config.max_concurrency,
+            max_retries=config.max_retries,
+            retry_base_delay=config.retry_base_delay,
+            retry_max_delay=config.retry_max_delay
+        )
+    return limiter
+
+def _parse_retry_after(header: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах или в виде HTTP-даты"""
+    if not header:
+        return None
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
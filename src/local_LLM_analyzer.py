@@ -1,259 +1,409 @@
-import ollama
-import os
-from docling.document_converter import DocumentConverter, ConversionStatus
+import asyncio
+import hashlib
+import json
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional
+from pydantic import BaseModel
 from documents_analyzer import DocumentsAnalyzer, AnalyzeResult
-from config import LLMConfig
-from ocr.mistral_ocr import MistralOCR
+from cache.disk_cache import DiskCache, normalized_text_sha256
+from config import DoclingConfig, LLMConfig
+from converters.docling_pool import DoclingPool, convert_to_markdown
+from sources.document_source import DocumentInput, DocumentSource
 from prompts import Prompts  
-from queries import TenderData
-from splitters.semantic_splitter import SemanticSplitter
+from queries import FIELD_GROUPS, TenderData, get_group_model
+from retrieval.bm25_index import BM25Index
+from executors.chunk_executor import ChunkExecutor
+from llm.ollama_client import OllamaClient
+from metrics import metrics
+from merging.tender_merger import FieldChoice, TenderDataMerger
+from merging.completeness import CompletenessTracker
+from jobs.job_queue import current_checkpoint
 from loguru import logger
-import json
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
+    from ocr.mistral_ocr import MistralOCR
+    from splitters.semantic_splitter import SemanticSplitter
+
+class _ChunkExtraction:
+    """Запрос к LLM по чанку, которого ждут все одинаковые чанки"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
 
 class LocalLLMAnalyzer(DocumentsAnalyzer):
+    analyzer_type = "ollama"
+    supported_extensions = {".docx", ".txt", ".pdf"}
+
     def __init__(self):
         super().__init__()
         self.llm_config = LLMConfig()
-        self.converter = DocumentConverter()
+        self.docling_config = DoclingConfig()
 
         self.model = self.llm_config.model
         self.host = self.llm_config.host
-        self.client = ollama.Client(host=self.host, timeout=60.0)
-        self._check_connection()
+        self.ollama = OllamaClient(
+            host=self.host,
+            model=self.model,
+            num_ctx=self.llm_config.num_ctx,
+            keep_alive=self.llm_config.keep_alive,
+            # Время обработки чанка ограничивает ChunkExecutor - HTTP-таймаут не должен обрывать запрос раньше
+            timeout=self.llm_config.chunk_timeout
+        )
+        self.ollama.check_connection()
+        if self.llm_config.warmup:
+            self.ollama.start_warmup()
+
+        # docling, Mistral OCR и токенизатор создаются при первом использовании (см. свойства ниже)
+        self.chunk_executor = ChunkExecutor(
+            concurrency=self.llm_config.chunk_concurrency,
+            timeout=self.llm_config.chunk_timeout,
+            retries=self.llm_config.chunk_retries
+        )
+        self.merger = TenderDataMerger()
+        # Повторяющиеся фрагменты (шаблонные разделы извещения, документации и проекта договора) не отправляются в LLM повторно
+        self.chunk_cache: Optional[DiskCache] = None
+        if self.cache_config.enabled:
+            self.chunk_cache = DiskCache(
+                path=self.cache_config.path,
+                namespace="chunks",
+                ttl_seconds=self.cache_config.chunk_ttl_seconds,
+                max_size_bytes=self.cache_config.chunk_max_size_mb * 1024 * 1024
+            )
+        # Key: ключ чанка, Value: извлечение, которое выполняется сейчас (одинаковые чанки ждут одного запроса к LLM)
+        self._chunk_extractions: dict[str, _ChunkExtraction] = {}
 
-        self.ocr = MistralOCR()
-        self.splitter = SemanticSplitter(750, 0)
+    @cached_property
+    def converter(self) -> "DocumentConverter":
+        # docling импортирует torch и модели разметки - загружаем только при первом DOCX/TXT
+        from docling.document_converter import DocumentConverter
+        return DocumentConverter()
 
-    def _check_connection(self) -> bool:
-        """Проверка подключения к Ollama."""
-        try:
-            self.client.list()
-            logger.info(f"✅ Успешное подключение к Ollama на {self.host}")
-            return True
-        except ollama.ResponseError as e:
-            error_message = f"❌ Ошибка подключения к Ollama на {self.host}: {e}"
-            logger.error(error_message)
-            raise Exception(error_message)
-
-    def analyze(self, file_paths: list[str]) -> AnalyzeResult:
+    @cached_property
+    def docling_pool(self) -> DoclingPool:
+        return DoclingPool(workers=self.docling_config.workers, timeout=self.docling_config.timeout)
+
+    def close(self) -> None:
+        # Пул создается при первой конвертации - останавливаем, только если он запущен
+        if "docling_pool" in self.__dict__:
+            self.docling_pool.shutdown()
+
+    async def _convert_to_markdown(self, source: DocumentSource) -> str:
+        """Конвертация документа docling: в пуле процессов или, если пул выключен, в пуле потоков"""
+        if self.docling_config.workers > 0:
+            return await self.docling_pool.convert(source)
+        return await asyncio.wait_for(self._run_blocking(convert_to_markdown, self.converter, source), self.docling_config.timeout)
+
+    @cached_property
+    def ocr(self) -> "MistralOCR":
+        # mistralai и pypdfium2 нужны только для PDF
+        from ocr.mistral_ocr import MistralOCR
+        return MistralOCR()
+
+    @cached_property
+    def splitter(self) -> "SemanticSplitter":
+        # semantic_text_splitter и tokenizers загружаются при первом разбиении на чанки
+        from splitters.semantic_splitter import SemanticSplitter
+        if self.llm_config.chunk_sizing == "budget":
+            # Промпт и схема отправляются с каждым чанком - чанк занимает остаток контекста
+            return SemanticSplitter.from_token_budget(
+                context_tokens=self.llm_config.num_ctx,
+                overhead=[self._system_prompt(TenderData), self._chunk_prompt("")],
+                reserve_tokens=self.llm_config.response_reserve_tokens,
+                chunk_overlap=self.llm_config.chunk_overlap,
+                model_name=self.llm_config.tokenizer_name,
+                tokenizer_path=self.llm_config.tokenizer_path
+            )
+        return SemanticSplitter(
+            self.llm_config.chunk_size,
+            self.llm_config.chunk_overlap,
+            model_name=self.llm_config.tokenizer_name,
+            tokenizer_path=self.llm_config.tokenizer_path
+        )
+
+    # num_ctx и keep_alive добавляет OllamaClient
+    CHAT_OPTIONS = {
+        "temperature": 0.0,
+        "top_p": 0.9
+    }
+
+    async def analyze_async(self, file_paths: list[DocumentInput]) -> AnalyzeResult:
         file_errors = []
-        summaries: list[dict[str, str]] = []
+        summaries: list[TenderData] = []
         
-        for file_path in file_paths:
-            try:
-                summary: TenderData = self._analyze_file(file_path)
-                summaries.append({"file_path": file_path, "summary": summary.model_dump_json()})
-            except Exception as e:
-                file_errors.append(file_path)
+        results, failed_archives, duplicates = await self._map_files(file_paths, self._analyze_file_cached)
+        file_errors.extend(failed_archives)
+        for source, summary in results:
+            if isinstance(summary, BaseException):
+                file_errors.append(source.name)
+            else:
+                summaries.append(summary)
         
         if file_errors:
             logger.error(f"❌ Ошибки при обработке файлов: {file_errors}")
 
         if summaries:
-            global_summary = self._summarize_global(summaries)
+            global_summary = await self._summarize_global(summaries)
         else:
             global_summary = None
 
-        return AnalyzeResult(summary=global_summary, file_errors=file_errors)
+        return AnalyzeResult(summary=global_summary, file_errors=file_errors, duplicate_files=[source.name for source in duplicates])
 
-    def _analyze_file(self, file_path: str) -> TenderData:
+    async def _analyze_file(self, source: DocumentSource) -> TenderData:
         """Обработка документа в зависимости от типа файла"""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        file_name = os.path.basename(file_path)
+        file_extension = source.extension
 
         try:
             if file_extension in ['.docx', '.txt']:
-                return self._process_with_docling(file_path)
+                return await self._process_with_docling(source)
             elif file_extension == '.pdf':
-                return self._process_with_mistral(file_path)
+                return await self._process_with_mistral(source)
             else:
                 raise ValueError(f"Неподдерживаемый тип файла: {file_extension}")
         except Exception as e:
-            logger.error(f"❌ Ошибка при обработке файла {file_path}: {e}")
+            logger.error(f"❌ Ошибка при обработке файла {source.name}: {e}")
             raise e
 
-    def _process_with_docling(self, file_path: str) -> TenderData:
+    async def _process_with_docling(self, source: DocumentSource) -> TenderData:
         """Обработка документа с помощью docling"""
-        logger.info(f"Processing with docling: {file_path}")
+        logger.info(f"Processing with docling: {source.name}")
         try:
-            result = self.converter.convert(file_path)
-            
-            if result.status != ConversionStatus.SUCCESS:
-                logger.error(f"❌ Ошибка при обработке с docling: {result.status}")
-                return ValueError(f"❌ Ошибка при обработке с docling: {result.status}")
+            with metrics.span("docling_convert"):
+                markdown_content = await self._convert_to_markdown(source)
             
-            markdown_content = result.document.export_to_markdown()
-            split_markdown_content = self.splitter.split_text(markdown_content)
+            # Токенизатор синхронный - выносим его в пул потоков
+            with metrics.span("split"):
+                split_markdown_content, index = await self._run_blocking(self.splitter.split_text_indexed, markdown_content)
             logger.info(f"chunks count: {len(split_markdown_content)}")
 
-            tender_data_schema = TenderData.model_json_schema()
-            answers: list[TenderData] = []
-            
-            for i, content in enumerate(split_markdown_content):
-                logger.info(f"Analyzing chunk={i} with LLM. Content length: {len(content)}")
-                prompt = Prompts.get_prompt_for_page_analysis_and_format_to_json()
-                messages = [
-                    {"role": "user", "content": f"{prompt}\n\n'Content': {content}"}
-                ]
-                try:
-                    response = self.client.chat(
-                        model=self.model,
-                        messages=messages,
-                        options={
-                            "temperature": 0.0, 
-                            "top_p": 0.9
-                        },
-                        format=tender_data_schema
-                    )
-                    parsed_data = TenderData.model_validate_json(response.message.content)
-                    answers.append(parsed_data)
-                    logger.debug(f"RESULT {i}: {response.message.content}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка при обращении к Ollama в _process_with_docling (chunk={i}): {e}")
-
-            # Merge answers recursively
-            while len(answers) > 1:
-                new_answers = []
-                for i in range(0, len(answers), 5):
-                    batch = answers[i:i+5]
-                    
-                    # Prepare input for LLM summarization
-                    batch_dump_json = [tender_data.model_dump_json() for tender_data in batch]
-                    summary_input_json = json.dumps(batch_dump_json)
-
-                    logger.info(f"Merging batch with LLM. Batch size: {len(batch)}")
-                    prompt = Prompts.get_prompt_for_summarization(summary_input_json, "JSON")
-                    messages = [
-                        {"role": "user", "content": prompt}
-                    ]
-                    try:
-                        response = self.client.chat(
-                            model=self.model,
-                            messages=messages,
-                            options={
-                                "temperature": 0.0,
-                                "top_p": 0.9
-                            },
-                            format=tender_data_schema
-                        )
-                        parsed_data = TenderData.model_validate_json(response.message.content)
-                        new_answers.append(parsed_data)
-                        logger.debug(f"Merged batch result: {response.message.content}")
-                    except Exception as e:
-                        logger.error(f"❌ Ошибка при обращении к Ollama в _process_with_docling (batch merge): {e}")
-                answers = new_answers
-
-            final_tender_data = answers[0] if answers else TenderData()
+            answers = await self._extract_routed(split_markdown_content, index, name="chunk")
+
+            # Merge chunk answers field by field, LLM is used only for conflicting fields
+            with metrics.span("merge"):
+                final_tender_data = await self.merger.merge_async(answers, self._resolve_conflict)
             
-            logger.info(f"Successfully processed with Docling: {file_path}")
+            logger.info(f"Successfully processed with Docling: {source.name}")
             return final_tender_data
 
         except Exception as e:
             logger.error(f"❌ Ошибка при обработке с Docling: {e}")
             raise e
         
-    def _process_with_mistral(self, file_path: str) -> TenderData:
+    async def _process_with_mistral(self, source: DocumentSource) -> TenderData:
         """Обработка документа с помощью mistral OCR"""
-        logger.info(f"Processing with mistral OCR: {file_path}")
-        out_model = self.ocr.ocr(file_path)
-        pages = out_model.pages
-        
-        tender_data_schema = TenderData.model_json_schema()
-        all_page_data: list[TenderData] = []
-        
-        for page in pages:
-            logger.info(f"Analyzing page with mistral OCR.")
-            prompt = Prompts.get_prompt_for_page_analysis_and_format_to_xml(json.dumps(tender_data_schema))
-            messages = [
-                {"role": "user", "content": f"{prompt}\n\n'Content': {page.markdown}"}
-            ]
-            try:
-                response = self.client.chat(
-                    model=self.model,
-                    messages=messages,
-                    options={
-                        "temperature": 0.0, 
-                        "top_p": 0.9
-                    },
-                    format=tender_data_schema,
-                    response_format={"type": "json"}
+        logger.info(f"Processing with mistral OCR: {source.name}")
+        if self.llm_config.chunk_routing:
+            # Для маршрутизации нужен индекс по всем страницам документа
+            with metrics.span("ocr"):
+                page_contents = [page.markdown async for page in self.ocr.iter_pages_async(source)]
+            all_page_data = await self._extract_routed(page_contents, BM25Index(page_contents), name="page")
+        else:
+            # Страницы анализируются по мере готовности окон OCR
+            page_items = (
+                item
+                async for page in self.ocr.iter_pages_async(source)
+                for item in self._work_items(page.markdown, FIELD_GROUPS)
+            )
+            tracker = self._new_tracker()
+            # OCR и извлечение идут одновременно - этап один
+            with metrics.span("ocr_and_chunk_extraction"):
+                all_page_data = await self.chunk_executor.map_stream(
+                    page_items,
+                    self._tracked(tracker),
+                    name="page",
+                    skip=(lambda position, item: not (self._item_fields(item) & tracker.remaining_fields())) if tracker else None
                 )
-                tender_data = TenderData.model_validate_json(response.message.content)
-                all_page_data.append(tender_data)
-            except Exception as e:
-                logger.error(f"❌ Ошибка при обращении к Ollama в _process_with_mistral (page analysis): {e}")
+            all_page_data = [page_data for page_data in all_page_data if page_data is not None]
         
         # Merge all page data into a single TenderData object
-        final_tender_data = TenderData()
-        for tender_data_chunk in all_page_data:
-            for field_name, value in tender_data_chunk.model_dump().items():
-                if value and getattr(final_tender_data, field_name) == "":
-                    setattr(final_tender_data, field_name, value)
+        with metrics.span("merge"):
+            final_tender_data = await self.merger.merge_async(all_page_data, self._resolve_conflict)
             
-        logger.info(f"Successfully processed with mistral OCR: {file_path}")
+        logger.info(f"Successfully processed with mistral OCR: {source.name}")
         return final_tender_data
 
-    def _summarize_global(self, summaries: list[dict[str, str]]) -> str:
-        logger.info("Starting global summarization.")
+    async def _extract_routed(self, contents: list[str], index: BM25Index, name: str) -> list[TenderData]:
+        """Извлечение TenderData только из чанков, релевантных хотя бы одной группе полей"""
+        if self.llm_config.chunk_routing:
+            routes = index.route(self.llm_config.routing_top_k)
+            logger.info(f"Routing: {len(routes)} of {len(contents)} {name}s selected for LLM")
+        else:
+            routes = {i: set(FIELD_GROUPS) for i in range(len(contents))}
 
-        # Parse and merge all TenderData objects
-        final_tender_data = TenderData()
-        for item in summaries:
-            try:
-                current_tender_data = TenderData.model_validate_json(item["summary"])
-                for field_name, value in current_tender_data.model_dump().items():
-                    if value and getattr(final_tender_data, field_name) == "":
-                        setattr(final_tender_data, field_name, value)
-            except Exception as e:
-                logger.error(f"❌ Ошибка при парсинге TenderData из {item.get('file_path', 'unknown file')}: {e}")
-                # Optionally, you might want to skip this item or handle it differently
-                continue
-        
-        summary_input_json = final_tender_data.model_dump_json()
-
-        logger.debug(f"Summary input JSON: {summary_input_json}")
-        # First LLM call for global summary
-        logger.info("Calling LLM for global summary.")
-        summary_result_prompt = Prompts.get_prompt_for_summarization(summary_input_json, "JSON")
-        messages_global_summary = [
-            {"role": "user", "content": summary_result_prompt}
-        ]
-        try:
-            response_global_summary = self.client.chat(
-                model=self.model,
-                messages=messages_global_summary,
-                options={
-                    "temperature": 0.0,
-                    "top_p": 0.9
-                }
+        # Key: позиция запроса, Value: (индекс чанка, запрос)
+        positioned = [(i, item) for i in sorted(routes) for item in self._work_items(contents[i], sorted(routes[i]))]
+        items = [item for _, item in positioned]
+
+        tracker = self._new_tracker()
+        skip = self._routed_skip(tracker, [chunk_index for chunk_index, _ in positioned], index) if tracker else None
+        with metrics.span("chunk_extraction"):
+            answers = await self.chunk_executor.map(items, self._tracked(tracker), name=name, skip=skip)
+        if tracker:
+            logger.debug(f"Field confidence: { {field_name: round(tracker.confidence(field_name), 2) for field_name in TenderData.model_fields} }")
+        return [answer for answer in answers if answer is not None]
+
+    def _routed_skip(self, tracker: CompletenessTracker, chunk_indices: list[int],
+                     index: BM25Index) -> Callable[[int, tuple[str, Optional[str]]], bool]:
+        """
+        Условие пропуска запроса при ранней остановке.
+
+        Args:
+            tracker: Трекер заполненности полей
+            chunk_indices: Индекс чанка для каждой позиции запроса
+            index: BM25-индекс чанков
+        """
+        field_scores = {field_name: index.field_scores(field_name) for field_name in TenderData.model_fields}
+
+        def skip(position: int, item: tuple[str, Optional[str]]) -> bool:
+            chunk_index = chunk_indices[position]
+            if chunk_index == 0:
+                return False
+            # Пропускаем чанк, если незаполненных полей в нем нет или по ним нет ни одного ключевого слова
+            remaining = self._item_fields(item) & tracker.remaining_fields()
+            return not any(field_scores[field_name][chunk_index] > 0 for field_name in remaining)
+
+        return skip
+
+    def _new_tracker(self) -> Optional[CompletenessTracker]:
+        if not self.llm_config.early_stop:
+            return None
+        return CompletenessTracker(self.llm_config.early_stop_confidence, self.llm_config.early_stop_min_votes)
+
+    def _tracked(self, tracker: Optional[CompletenessTracker]) -> Callable[[int, tuple[str, Optional[str]]], Awaitable[TenderData]]:
+        """Обработчик чанка, обновляющий трекер заполненности полей"""
+        if tracker is None:
+            return self._extract_chunk
+
+        async def extract(index: int, item: tuple[str, Optional[str]]) -> TenderData:
+            result = await self._extract_chunk(index, item)
+            tracker.update(result)
+            return result
+
+        return extract
+
+    @staticmethod
+    def _item_fields(item: tuple[str, Optional[str]]) -> set[str]:
+        """Поля TenderData, которые запрашиваются у LLM для данного чанка"""
+        _, group_name = item
+        return set(FIELD_GROUPS[group_name]) if group_name else set(TenderData.model_fields)
+
+    def _work_items(self, content: str, groups: Iterable[str]) -> list[tuple[str, Optional[str]]]:
+        """
+        Запросы к LLM по одному чанку: в режиме partitioned - по запросу на каждую группу полей,
+        иначе один запрос по всей схеме TenderData (группа None).
+        """
+        if self.llm_config.extraction_mode == "partitioned":
+            return [(content, group_name) for group_name in groups]
+        return [(content, None)]
+
+    def _chunk_cache_key(self, content: str, group_name: Optional[str]) -> str:
+        """Ключ чанка: текст без учета пробельных символов + группа полей + модель + версия промпта и схемы"""
+        response_model = get_group_model(group_name) if group_name else TenderData
+        return ":".join(["chunk", normalized_text_sha256(content), group_name or "all", self.model, self._prompt_version(response_model)])
+
+    async def _extract_chunk(self, index: int, item: tuple[str, Optional[str]]) -> TenderData:
+        """Извлечение TenderData (или одной группы его полей) из чанка или страницы документа"""
+        content, group_name = item
+        key = self._chunk_cache_key(content, group_name)
+        extraction = self._chunk_extractions.get(key)
+        if extraction is None:
+            extraction = self._chunk_extractions[key] = _ChunkExtraction(
+                asyncio.ensure_future(self._extract_chunk_cached(key, index, item))
             )
-            global_summary_content = response_global_summary.message.content
-            logger.info("Global summary generated.")
-            logger.debug(f"Global summary content: {global_summary_content}")
-        except Exception as e:
-            logger.error(f"❌ Ошибка при обращении к Ollama при генерации глобального суммирования: {e}")
-            return ""
-
-        # Second LLM call for Telegram style summarization
-        logger.info("Calling LLM for Telegram style summarization.")
-        telegram_prompt = Prompts.get_prompt_for_telegram_message(global_summary_content, "JSON")
-        messages_telegram = [
-            {"role": "user", "content": telegram_prompt}
-        ]
+            extraction.task.add_done_callback(lambda _: self._forget_extraction(key, extraction))
+        else:
+            logger.debug(f"Chunk={index} duplicates a chunk in progress, waiting for its result")
+            metrics.inc("chunk_dedup_hits_total")
+
+        extraction.waiters += 1
         try:
-            response_telegram = self.client.chat(
-                model=self.model,
-                messages=messages_telegram,
-                options={
-                    "temperature": 0.0,
-                    "top_p": 0.9
-                }
+            # Отмена одного ожидающего не прерывает запрос, которого ждут другие
+            return await asyncio.shield(extraction.task)
+        except asyncio.CancelledError:
+            # Таймаут ChunkExecutor или отмена: повтор должен отправить новый запрос, а не ждать зависший
+            self._forget_extraction(key, extraction)
+            if extraction.waiters == 1:
+                extraction.task.cancel()
+            raise
+        finally:
+            extraction.waiters -= 1
+
+    def _forget_extraction(self, key: str, extraction: _ChunkExtraction) -> None:
+        if self._chunk_extractions.get(key) is extraction:
+            del self._chunk_extractions[key]
+
+    async def _extract_chunk_cached(self, key: str, index: int, item: tuple[str, Optional[str]]) -> TenderData:
+        """Извлечение с использованием кэша чанков и контрольных точек задания"""
+        stores = [store for store in (current_checkpoint.get(), self.chunk_cache) if store is not None]
+        for store in stores:
+            cached = await self._run_blocking(store.get, key)
+            if cached is not None:
+                metrics.inc("chunk_cache_hits_total")
+                return TenderData.model_validate_json(cached)
+
+        if self.chunk_cache is not None:
+            metrics.inc("chunk_cache_misses_total")
+        tender_data = await self._extract_chunk_llm(index, item)
+        for store in stores:
+            await self._run_blocking(store.set, key, tender_data.model_dump_json())
+        return tender_data
+
+    async def _extract_chunk_llm(self, index: int, item: tuple[str, Optional[str]]) -> TenderData:
+        content, group_name = item
+        response_model = get_group_model(group_name) if group_name else TenderData
+        logger.info(f"Analyzing chunk={index} ({group_name or 'all fields'}) with LLM. Content length: {len(content)}")
+        response = await self.ollama.chat(
+            user=self._chunk_prompt(content),
+            system=self._system_prompt(response_model),
+            options=self.CHAT_OPTIONS,
+            format=response_model.model_json_schema(),
+            name="chunk"
+        )
+        logger.debug(f"RESULT {index}: {response.message.content}")
+        parsed_data = response_model.model_validate_json(response.message.content)
+        # Ответ по группе полей собирается обратно в TenderData, остальные поля остаются пустыми
+        return TenderData.model_validate(parsed_data.model_dump())
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _system_prompt(response_model: type[BaseModel]) -> str:
+        """Инструкция и схема ответа - одинаковый префикс у всех чанков, Ollama переиспользует его KV-кэш"""
+        prompt = Prompts.get_prompt_for_page_analysis_and_format_to_json()
+        schema = json.dumps(response_model.model_json_schema(), ensure_ascii=False)
+        return f"{prompt}\n\n'Schema': {schema}"
+
+    @staticmethod
+    def _chunk_prompt(content: str) -> str:
+        return f"'Content': {content}"
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _prompt_version(cls, response_model: type[BaseModel]) -> str:
+        """Версия промпта: меняется при изменении инструкции, схемы ответа или шаблона чанка"""
+        prompt = cls._system_prompt(response_model) + cls._chunk_prompt("")
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    async def _resolve_conflict(self, field_name: str, candidates: list[str]) -> str:
+        """Выбор значения конфликтующего поля с помощью LLM"""
+        field_description = TenderData.model_fields[field_name].description
+        prompt = Prompts.get_prompt_for_conflict_resolution(field_description, candidates)
+        with metrics.span("conflict_resolution"):
+            response = await self.ollama.chat(
+                user=prompt,
+                options=self.CHAT_OPTIONS,
+                format=FieldChoice.model_json_schema(),
+                name="conflict"
             )
-            telegram_summary_content = response_telegram.message.content
-            logger.info("Telegram style summary generated.")
-        except ollama.ResponseError as e:
-            logger.error(f"❌ Ошибка при обращении к Ollama при генерации Telegram-стиля суммирования: {e}")
-            return ""
-
-        return telegram_summary_content
-        
\ No newline at end of file
+        return FieldChoice.model_validate_json(response.message.content).value
+
+    async def _summarize_global(self, summaries: list[TenderData]) -> str:
+        logger.info("Starting global summarization.")
+
+        # Merge all TenderData objects field by field, LLM is used only for conflicting fields
+        with metrics.span("global_merge"):
+            final_tender_data = await self.merger.merge_async(summaries, self._resolve_conflict)
+        logger.debug(f"Global summary content: {final_tender_data.model_dump_json()}")
+
+        with metrics.span("format"):
+            return self._create_telegram_message(final_tender_data)
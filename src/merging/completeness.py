@@ -0,0 +1,52 @@
+from collections import Counter
+from queries import TenderData
+from merging.tender_merger import TenderDataMerger, normalize_value
+
+class CompletenessTracker:
+    """Отслеживание заполненности полей TenderData с оценкой уверенности по каждому полю"""
+
+    def __init__(self, confidence_threshold: float = 0.6, min_votes: int = 1):
+        """
+        Args:
+            confidence_threshold: Доля ответов, согласных с лидирующим значением, при которой поле считается заполненным
+            min_votes: Минимальное число ответов за лидирующее значение
+        """
+        self.confidence_threshold = confidence_threshold
+        self.min_votes = min_votes
+        # Key: имя поля, Value: голоса за нормализованные значения
+        self.votes: dict[str, Counter] = {field_name: Counter() for field_name in TenderData.model_fields}
+
+    def update(self, data: TenderData) -> None:
+        """Учет ответа LLM по одному чанку"""
+        for field_name in TenderData.model_fields:
+            value = getattr(data, field_name)
+            if not value:
+                continue
+            if isinstance(value, list):
+                # Для списков (лоты, контакты) учитываем сам факт найденных записей
+                self.votes[field_name]["<list>"] += 1
+            elif value.strip():
+                self.votes[field_name][normalize_value(value)] += 1
+
+    def confidence(self, field_name: str) -> float:
+        """Уверенность в значении поля: доля ответов за лидирующее значение (0, если ответов нет)"""
+        votes = self.votes[field_name]
+        total = sum(votes.values())
+        if not total:
+            return 0.0
+        return votes.most_common(1)[0][1] / total
+
+    def is_filled(self, field_name: str) -> bool:
+        # Списки (лоты, контакты) собираются со всех чанков: одна найденная запись не значит, что других нет
+        if field_name in TenderDataMerger.LIST_FIELDS:
+            return False
+        votes = self.votes[field_name]
+        if not votes:
+            return False
+        return votes.most_common(1)[0][1] >= self.min_votes and self.confidence(field_name) >= self.confidence_threshold
+
+    def remaining_fields(self) -> set[str]:
+        return {field_name for field_name in TenderData.model_fields if not self.is_filled(field_name)}
+
+    def is_complete(self) -> bool:
+        return not self.remaining_fields()
@@ -0,0 +1,149 @@
+import asyncio
+import re
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+from pydantic import BaseModel, Field
+from loguru import logger
+from queries import ContactPerson, LotInfo, TenderData
+
+# Разрешение конфликта: (имя поля, варианты значений) -> выбранное значение
+ConflictResolver = Callable[[str, list[str]], Awaitable[str]]
+
+class FieldChoice(BaseModel):
+    """Ответ LLM при разрешении конфликта значений одного поля"""
+    value: str = Field(description="Итоговое значение поля", default="")
+
+class MergeResult(BaseModel):
+    data: TenderData = Field(default_factory=TenderData)
+    # Key: имя поля, Value: конфликтующие значения в порядке убывания голосов
+    conflicts: dict[str, list[str]] = Field(default_factory=dict)
+
+def normalize_value(value: str) -> str:
+    """Нормализация значения для сравнения: регистр, пробелы, пунктуация по краям"""
+    value = re.sub(r"\s+", " ", value.lower().replace("ё", "е"))
+    return value.strip(" .,;:-\"'«»")
+
+def _digits(value: str) -> str:
+    return re.sub(r"\D", "", value)
+
+def _is_numeric_like(value: str) -> bool:
+    """Число, сумма, процент, дата или номер: значения с цифрами сравниваются только целиком"""
+    return bool(re.search(r"\d", value))
+
+def _contains_words(long_value: str, short_value: str) -> bool:
+    """short_value входит в long_value целыми словами («ромашка» в «ооо ромашка», но не «ром»)"""
+    return re.search(rf"(?<!\w){re.escape(short_value)}(?!\w)", long_value) is not None
+
+class TenderDataMerger:
+    """Детерминированное объединение нескольких TenderData по полям с голосованием по частоте"""
+
+    LIST_FIELDS = ("lots", "contact_persons")
+
+    def _vote(self, values: list[str]) -> tuple[str, list[str]]:
+        """
+        Голосование по значениям одного поля.
+
+        Returns:
+            Победившее значение и список конкурирующих вариантов (пустой, если конфликта нет)
+        """
+        groups: dict[str, list[str]] = {}
+        for value in values:
+            if not value or not value.strip():
+                continue
+            groups.setdefault(normalize_value(value), []).append(value.strip())
+        if not groups:
+            return "", []
+
+        # Значение, целиком (по словам) содержащееся в более полном, отдает ему свои голоса.
+        # Числа и идентификаторы не объединяются: «5%» и «0,5%», «123» и «1234» - разные значения
+        keys = sorted(groups, key=len, reverse=True)
+        for short_key in reversed(keys):
+            if _is_numeric_like(short_key):
+                continue
+            for long_key in keys:
+                if long_key != short_key and short_key in groups and long_key in groups and _contains_words(long_key, short_key):
+                    groups[long_key].extend(groups.pop(short_key))
+                    break
+
+        # Порядок первых появлений сохраняется, поэтому при равенстве голосов результат детерминирован
+        ranked = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+        representatives = [
+            Counter(value for value in group if normalize_value(value) == key).most_common(1)[0][0]
+            for key, group in ranked
+        ]
+        if len(ranked) > 1 and len(ranked[0][1]) == len(ranked[1][1]):
+            return representatives[0], representatives
+        # Оставшиеся вложенные значения (части чисел, идентификаторов) решает LLM, даже если голосов больше у одного
+        remaining = [key for key, _ in ranked]
+        if any(short_key != long_key and short_key in long_key for short_key in remaining for long_key in remaining):
+            return representatives[0], representatives
+        return representatives[0], []
+
+    def _merge_models(self, items: list[BaseModel], model_type: type[BaseModel]) -> BaseModel:
+        """Объединение одинаковых сущностей (лот, контакт) по полям без обращения к LLM"""
+        merged = {}
+        for field_name in model_type.model_fields:
+            merged[field_name], _ = self._vote([getattr(item, field_name) or "" for item in items])
+        return model_type(**merged)
+
+    def _dedupe(self, items: list[BaseModel], model_type: type[BaseModel], key_func: Callable[[BaseModel], str]) -> list[BaseModel]:
+        groups: dict[str, list[BaseModel]] = {}
+        for item in items:
+            if not any(getattr(item, field_name) for field_name in model_type.model_fields):
+                continue
+            groups.setdefault(key_func(item), []).append(item)
+        return [self._merge_models(group, model_type) for group in groups.values()]
+
+    @staticmethod
+    def _lot_key(lot: LotInfo) -> str:
+        if lot.name:
+            return normalize_value(lot.name)
+        return "|".join(normalize_value(getattr(lot, field_name) or "") for field_name in LotInfo.model_fields)
+
+    @staticmethod
+    def _contact_key(person: ContactPerson) -> str:
+        if person.email:
+            return normalize_value(person.email)
+        if person.phone_number and len(_digits(person.phone_number)) >= 7:
+            # Последние 10 цифр: +7 и 8 в начале номера считаются одним номером
+            return _digits(person.phone_number)[-10:]
+        return normalize_value(person.full_name or "")
+
+    def merge(self, items: list[TenderData]) -> MergeResult:
+        """Объединение без LLM: конфликты разрешаются в пользу первого по порядку варианта"""
+        result = MergeResult()
+        if not items:
+            return result
+
+        for field_name in TenderData.model_fields:
+            if field_name in self.LIST_FIELDS:
+                continue
+            value, candidates = self._vote([getattr(item, field_name) or "" for item in items])
+            setattr(result.data, field_name, value)
+            if candidates:
+                result.conflicts[field_name] = candidates
+
+        result.data.lots = self._dedupe([lot for item in items for lot in item.lots or []], LotInfo, self._lot_key)
+        result.data.contact_persons = self._dedupe(
+            [person for item in items for person in item.contact_persons or []], ContactPerson, self._contact_key
+        )
+        return result
+
+    async def merge_async(self, items: list[TenderData], resolver: Optional[ConflictResolver] = None) -> TenderData:
+        """Объединение с обращением к LLM только для конфликтующих полей"""
+        result = self.merge(items)
+        if resolver is None or not result.conflicts:
+            return result.data
+
+        logger.info(f"Resolving {len(result.conflicts)} conflicting fields with LLM: {list(result.conflicts)}")
+
+        async def resolve(field_name: str, candidates: list[str]) -> None:
+            try:
+                value = await resolver(field_name, candidates)
+                if value:
+                    setattr(result.data, field_name, value)
+            except Exception as e:
+                logger.error(f"❌ Ошибка при разрешении конфликта для поля {field_name}: {e}")
+
+        await asyncio.gather(*(resolve(field_name, candidates) for field_name, candidates in result.conflicts.items()))
+        return result.data
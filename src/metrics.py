@@ -0,0 +1,157 @@
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ContextManager, Iterator, Optional
+from loguru import logger
+
+# Границы корзин гистограмм длительностей, секунд
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Сколько последних замеров каждой длительности хранится для snapshot (перцентили в бенчмарках)
+MAX_SAMPLES = 10000
+
+Labels = Optional[dict[str, str]]
+MetricKey = tuple[str, tuple[tuple[str, str], ...]]
+
+def _key(name: str, labels: Labels) -> MetricKey:
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name), tuple(sorted((labels or {}).items()))
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque[float] = deque(maxlen=MAX_SAMPLES)
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+class Metrics:
+    """Счетчики, уровни (gauges) и длительности этапов обработки в памяти процесса с выдачей в формате Prometheus"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counters: dict[MetricKey, float] = {}
+        self.gauges: dict[MetricKey, float] = {}
+        self.histograms: dict[MetricKey, _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, labels: Labels = None) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Labels = None) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, labels: Labels = None) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, labels: Labels = None) -> Iterator[None]:
+        """Замер длительности блока, секунд"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def span(self, stage: str, **labels: str) -> ContextManager[None]:
+        """Замер этапа обработки: гистограмма stage_duration_seconds{stage=...}"""
+        return self.timer("stage_duration_seconds", {"stage": stage, **labels})
+
+    def record_tokens(self, provider: str, call: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        """Учет токенов запроса к LLM"""
+        labels = {"provider": provider, "call": call}
+        self.inc("llm_requests_total", labels=labels)
+        if prompt_tokens:
+            self.inc("llm_prompt_tokens_total", prompt_tokens, labels)
+        if completion_tokens:
+            self.inc("llm_completion_tokens_total", completion_tokens, labels)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Текущие значения; имена метрик с метками - в виде name{label="value"}"""
+        with self._lock:
+            return {
+                "counters": {name + _format_labels(labels): value for (name, labels), value in self.counters.items()},
+                "gauges": {name + _format_labels(labels): value for (name, labels), value in self.gauges.items()},
+                "timings": {name + _format_labels(labels): list(histogram.samples) for (name, labels), histogram in self.histograms.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        lines: list[str] = []
+
+        def header(name: str, metric_type: str, seen: set[str]) -> None:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        with self._lock:
+            seen: set[str] = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter", seen)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                header(name, "gauge", seen)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                header(name, "histogram", seen)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Запуск HTTP-сервера /metrics в фоновом потоке"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint: http://{host}:{server.server_address[1]}/metrics")
+    return server
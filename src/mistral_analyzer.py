@@ -1,24 +1,52 @@
+import asyncio
 import os
+import weakref
+from functools import cached_property
+from typing import Optional
 from documents_analyzer import DocumentsAnalyzer, AnalyzeResult
 from config import MistralConfig
 from ocr.mistral_ocr import MistralOCR
 from prompts import Prompts
 from queries import TenderData
+from merging.tender_merger import FieldChoice, TenderDataMerger
+from sources.document_source import DocumentInput, DocumentSource
+from background import background_tasks
+from llm.rate_limiter import BYTES_PER_DOCUMENT_TOKEN, mistral_rate_limiter
+from metrics import metrics
 from loguru import logger
-import json
 from mistralai import Mistral
-from mistralai.models import File
+from mistralai.models import File, HTTPValidationError, SDKError
 
 class MistralAnalyzer(DocumentsAnalyzer):
+    analyzer_type = "mistral"
+    supported_extensions = {".docx", ".txt", ".pdf", ".doc"}
+
     def __init__(self):
         super().__init__()
         self.llm_config = MistralConfig()
 
         self.model = self.llm_config.model
-        self.client = Mistral(api_key=self.llm_config.api_key, timeout_ms=60000)
+        # Соединения асинхронного клиента Mistral привязаны к event loop, поэтому держим по клиенту на loop
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Mistral] = weakref.WeakKeyDictionary()
+        # Общий с MistralOCR: лимиты API действуют на ключ
+        self.limiter = mistral_rate_limiter(self.llm_config)
         self._check_api_key()
 
-        self.ocr = MistralOCR()
+        self.merger = TenderDataMerger()
+        # Сбрасывается, если API не принял ссылку на документ по file_id - дальше используется подписанная ссылка
+        self._file_id_reference = self.llm_config.document_reference == "file_id"
+
+    @property
+    def client(self) -> Mistral:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = Mistral(api_key=self.llm_config.api_key, server_url=self.llm_config.server_url, timeout_ms=60000)
+        return client
+
+    @cached_property
+    def ocr(self) -> MistralOCR:
+        return MistralOCR()
 
     def _check_api_key(self) -> bool:
         """Проверка наличия API ключа Mistral."""
@@ -29,213 +57,145 @@ class MistralAnalyzer(DocumentsAnalyzer):
         logger.info("✅ API ключ Mistral найден.")
         return True
 
-    def analyze(self, file_paths: list[str]) -> AnalyzeResult:
+    async def analyze_async(self, file_paths: list[DocumentInput]) -> AnalyzeResult:
         file_errors = []
         summaries: list[TenderData] = []
         
-        for file_path in file_paths:
-            file_name = os.path.basename(file_path)
-            try:
-                summary: TenderData = self._analyze_file(file_path)
+        results, failed_archives, duplicates = await self._map_files(file_paths, self._analyze_file_cached)
+        file_errors.extend(os.path.basename(name) for name in failed_archives)
+        for source, summary in results:
+            if isinstance(summary, BaseException):
+                file_errors.append(source.file_name)
+            else:
                 summaries.append(summary)
-            except Exception as e:
-                file_errors.append(file_name)
         
         if file_errors:
             logger.error(f"❌ Ошибки при обработке файлов: {file_errors}")
 
         if summaries:
-            global_summary = self._summarize_global(summaries)
+            global_summary = await self._summarize_global(summaries)
         else:
             global_summary = None
 
-        return AnalyzeResult(summary=global_summary, file_errors=file_errors)
+        return AnalyzeResult(summary=global_summary, file_errors=file_errors, duplicate_files=[source.file_name for source in duplicates])
 
-    def _analyze_file(self, file_path: str) -> TenderData:
+    async def _analyze_file(self, source: DocumentSource) -> TenderData:
         """Обработка документа в зависимости от типа файла"""
-        file_extension = os.path.splitext(file_path)[1].lower()
+        file_extension = source.extension
 
         try:
-            if file_extension in ['.docx', '.txt', '.pdf', '.doc']:
-                return self._process_with_upload_file_and_chat(file_path)
+            if file_extension in self.supported_extensions:
+                return await self._process_with_upload_file_and_chat(source)
             else:
                 raise ValueError(f"Неподдерживаемый тип файла: {file_extension}")
         except Exception as e:
-            logger.error(f"❌ Ошибка при обработке файла {file_path}: {e}")
+            logger.error(f"❌ Ошибка при обработке файла {source.name}: {e}")
             raise e
         
-    def _process_with_upload_file_and_chat(self, file_path: str) -> TenderData:
+    async def _process_with_upload_file_and_chat(self, source: DocumentSource) -> TenderData:
         """Загрузка файла в Mistral и получение ответа от чата"""
-        logger.info(f"Processing with upload file and chat: {file_path}")
+        logger.info(f"Processing with upload file and chat: {source.name}")
         file_id = None
         try:
-            file_name = os.path.basename(file_path)
-
-            with open(file_path, 'rb') as file:
-                file_content = file.read()
-
-            response = self.client.files.upload(
-                file=File(
-                    file_name=file_name,
-                    content=file_content
-                ),
-                purpose="ocr"
-            )
+            file_name = source.file_name
+
+            file_content = await self._run_blocking(source.read_bytes)
+            tokens = len(file_content) // BYTES_PER_DOCUMENT_TOKEN
+
+            with metrics.span("upload"):
+                response = await self.limiter.call(lambda: self.client.files.upload_async(
+                    file=File(
+                        file_name=file_name,
+                        content=file_content
+                    ),
+                    purpose="ocr"
+                ), name="upload")
             file_id = response.id
             logger.debug(response)
 
-            signed_url = self.client.files.get_signed_url(file_id=file_id)
+            if self._file_id_reference:
+                try:
+                    return await self._parse_document({"type": "file", "file_id": file_id}, tokens)
+                except (SDKError, HTTPValidationError) as e:
+                    if getattr(e, "status_code", 422) not in (400, 422):
+                        raise
+                    logger.warning(f"Mistral API did not accept a file_id document reference, falling back to signed URLs: {e}")
+                    self._file_id_reference = False
+
+            with metrics.span("signed_url"):
+                signed_url = await self.limiter.call(lambda: self.client.files.get_signed_url_async(file_id=file_id), name="signed_url")
             logger.debug(signed_url)
-
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Ответь на вопросы по документу"
-                        },
-                        {
-                            "type": "document_url",
-                            "document_url": signed_url.url
-                        }
-                    ]
-                }
-            ]
-
-            response = self.client.chat.parse(
-                model=self.model,
-                messages=messages,
-                temperature=0.0,
-                response_format=TenderData
-            )
-            logger.debug(response)
-            return response.choices[0].message.parsed
+            return await self._parse_document({"type": "document_url", "document_url": signed_url.url}, tokens)
         except Exception as e:
             logger.error(f"❌ Ошибка при обращении к Mistral API в _process_with_upload_file_and_chat: {e}")
             raise e
         finally:    
             if file_id:
-                self.client.files.delete(file_id=file_id)
+                # Удаление не задерживает ответ пользователю
+                background_tasks.spawn(self._delete_file(file_id), f"delete file {file_id}")
+
+    async def _parse_document(self, document: dict, tokens: int) -> TenderData:
+        """Извлечение TenderData из загруженного документа; tokens - оценка токенов для ограничителя"""
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Ответь на вопросы по документу"
+                    },
+                    document
+                ]
+            }
+        ]
+
+        with metrics.span("chat_parse"):
+            response = await self.limiter.call(lambda: self.client.chat.parse_async(
+                model=self.model,
+                messages=messages,
+                temperature=0.0,
+                response_format=TenderData
+            ), name="chat_parse", tokens=tokens, usage=self._total_tokens)
+        self._record_usage(response, "document")
+        logger.debug(response)
+        return response.choices[0].message.parsed
+
+    async def _delete_file(self, file_id: str) -> None:
+        with metrics.span("delete"):
+            await self.limiter.call(lambda: self.client.files.delete_async(file_id=file_id), name="delete")
+
+    @staticmethod
+    def _total_tokens(response) -> Optional[int]:
+        usage = getattr(response, "usage", None)
+        return usage and usage.total_tokens
+
+    @staticmethod
+    def _record_usage(response, call: str) -> None:
+        usage = getattr(response, "usage", None)
+        metrics.record_tokens("mistral", call, usage and usage.prompt_tokens, usage and usage.completion_tokens)
+
+    async def _resolve_conflict(self, field_name: str, candidates: list[str]) -> str:
+        """Выбор значения конфликтующего поля с помощью LLM"""
+        field_description = TenderData.model_fields[field_name].description
+        prompt = Prompts.get_prompt_for_conflict_resolution(field_description, candidates)
+        with metrics.span("conflict_resolution"):
+            response = await self.limiter.call(lambda: self.client.chat.parse_async(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                response_format=FieldChoice
+            ), name="conflict", tokens=len(prompt) // 3, usage=self._total_tokens)
+        self._record_usage(response, "conflict")
+        return response.choices[0].message.parsed.value
 
-    def _summarize_global(self, summaries: list[TenderData]) -> str:
+    async def _summarize_global(self, summaries: list[TenderData]) -> str:
         logger.info("Starting global summarization.")
 
-        # Parse and merge all TenderData objects
-        if len(summaries) > 1:
-            jsons = [tender_data.model_dump_json() for tender_data in summaries]
-            summary_input_json = json.dumps(jsons)
-        
-            logger.debug(f"Summary input JSON: {summary_input_json}")
-            # First LLM call for global summary
-            logger.info("Calling LLM for global summary.")
-            summary_result_prompt = Prompts.get_prompt_for_summarization(summary_input_json, "JSON")
-            messages_global_summary = [
-                {"role": "user", "content": summary_result_prompt}
-            ]
-            try:
-                response_global_summary = self.client.chat.parse(
-                    model=self.model,
-                    messages=messages_global_summary,
-                    temperature=0.0,
-                    response_format=TenderData
-                )
-                global_summary_content = response_global_summary.choices[0].message.parsed
-                logger.info("Global summary generated.")
-                logger.debug(f"Global summary content: {global_summary_content}")
-            except Exception as e:
-                logger.error(f"❌ Ошибка при обращении к Mistral API при генерации глобального суммирования: {e}")
-                return ""
-        else:
-            global_summary_content = summaries[0]
+        # Merge all TenderData objects field by field, LLM is used only for conflicting fields
+        with metrics.span("global_merge"):
+            global_summary_content = await self.merger.merge_async(summaries, self._resolve_conflict)
 
-        telegram_markdown_content = self._create_telegram_message(global_summary_content)
-        
-        return telegram_markdown_content
-    
-    def _create_telegram_message(self, global_summary_content: TenderData) -> str:
-        """Создание Telegram сообщения"""
-        message_parts = []
-
-        if global_summary_content.procurement_name:
-            message_parts.append(f"📦 *Наименование закупки*: {global_summary_content.procurement_name}")
-        if global_summary_content.customer_info_company_name:
-            message_parts.append(f"🏢 *Заказчик*: {global_summary_content.customer_info_company_name}")
-        if global_summary_content.notice_number:
-            message_parts.append(f"📄 *Номер извещения*: {global_summary_content.notice_number}")
-        if global_summary_content.publication_and_submission_deadline:
-            message_parts.append(f"🗓️ *Срок подачи заявок*: {global_summary_content.publication_and_submission_deadline}")
-        if global_summary_content.lots:
-            lots_info = []
-            for i, lot in enumerate(global_summary_content.lots):
-                lot_details = []
-                if lot.name:
-                    lot_details.append(f"Наименование: {lot.name}")
-                if lot.initial_max_price:
-                    lot_details.append(f"Начальная максимальная цена: {lot.initial_max_price}")
-                if lot.currency:
-                    lot_details.append(f"Валюта: {lot.currency}")
-                if lot.quantity:
-                    lot_details.append(f"Количество: {lot.quantity}")
-                if lot_details:
-                    lots_info.append(f"Лот {i+1}: - " + "\n  - ".join(lot_details))
-            if lots_info:
-                message_parts.append(f"🏷️ *Информация о лотах*:\n" + "\n".join(lots_info))
-        if global_summary_content.delivery_department:
-            message_parts.append(f"🚚 *Подразделение поставки*: {global_summary_content.delivery_department}")
-        if global_summary_content.initial_max_price_with_vat:
-            message_parts.append(f"💰 *Начальная максимальная цена (с НДС)*: {global_summary_content.initial_max_price_with_vat}")
-        if global_summary_content.contact_persons:
-            contact_persons_info = []
-            for person in global_summary_content.contact_persons:
-                person_details = []
-                if person.full_name:
-                    person_details.append(f"ФИО: {person.full_name}")
-                if person.phone_number:
-                    person_details.append(f"📞 Телефон: {person.phone_number}")
-                if person.email:
-                    person_details.append(f"📧 Email: {person.email}")
-                if person.position:
-                    person_details.append(f"💼 Должность: {person.position}")
-                if person_details:
-                    contact_persons_info.append("  - " + "\n    - ".join(person_details))
-            if contact_persons_info:
-                message_parts.append(f"👤 *Контактные лица*:\n" + "\n".join(contact_persons_info))
-        if global_summary_content.application_security:
-            message_parts.append(f"🔐 *Обеспечение заявки*: {global_summary_content.application_security}")
-        if global_summary_content.re_bidding_date:
-            message_parts.append(f"🔄 *Дата переторжки*: {global_summary_content.re_bidding_date}")
-        if global_summary_content.etp_platform:
-            message_parts.append(f"🌐 *ЭТП*: {global_summary_content.etp_platform}")
-        if global_summary_content.application_review_deadline:
-            message_parts.append(f"📅 *Срок рассмотрения заявок*: {global_summary_content.application_review_deadline}")
-        if global_summary_content.results_summary_date:
-            message_parts.append(f"📊 *Дата подведения итогов*: {global_summary_content.results_summary_date}")
-        if global_summary_content.contract_security:
-            message_parts.append(f"📜 *Обеспечение договора*: {global_summary_content.contract_security}")
-        if global_summary_content.participation_price:
-            message_parts.append(f"💲 *Цена участия*: {global_summary_content.participation_price}")
-        if global_summary_content.warranty_requirements:
-            message_parts.append(f"🛠️ *Гарантийные требования*: {global_summary_content.warranty_requirements}")
-        if global_summary_content.required_delivery_period:
-            message_parts.append(f"⏱️ *Срок поставки*: {global_summary_content.required_delivery_period}")
-        if global_summary_content.payment_terms:
-            message_parts.append(f"💳 *Условия оплаты*: {global_summary_content.payment_terms}")
-        if global_summary_content.delivery_documents_names:
-            message_parts.append(f"📄 *Документы для поставки*: {global_summary_content.delivery_documents_names}")
-        if global_summary_content.delivery_method:
-            message_parts.append(f"📦 *Метод доставки*: {global_summary_content.delivery_method}")
-        if global_summary_content.product_dimensions:
-            message_parts.append(f"📏 *Размеры товара*: {global_summary_content.product_dimensions}")
-        if global_summary_content.product_purpose:
-            message_parts.append(f"🎯 *Назначение товара*: {global_summary_content.product_purpose}")
-        if global_summary_content.contract_term:
-            message_parts.append(f"🗓️ *Срок действия договора*: {global_summary_content.contract_term}")
-        if global_summary_content.delivery_address:
-            message_parts.append(f"📍 *Адрес доставки*: {global_summary_content.delivery_address}")
+        with metrics.span("format"):
+            telegram_markdown_content = self._create_telegram_message(global_summary_content)
         
-        telegram_markdown_content = "\n\n".join(message_parts)
         return telegram_markdown_content
-        
-        
-        
\ No newline at end of file
@@ -1,12 +1,26 @@
 from mistralai import Mistral
 from mistralai.extra import response_format_from_pydantic_model
 from mistralai.models import OCRResponse
-from typing import Any, Dict, Optional
-import base64
+from typing import Any, AsyncIterator, Dict, Optional, Union
+import asyncio
+import hashlib
 from pydantic import BaseModel, Field, create_model
 import json
+import weakref
 from enum import Enum
-from config import MistralConfig
+from loguru import logger
+import pypdfium2
+from cache.disk_cache import DiskCache
+from config import CacheConfig, MistralConfig
+from background import background_tasks
+from llm.rate_limiter import TOKENS_PER_PAGE, mistral_rate_limiter
+from metrics import metrics
+from sources.document_source import DocumentSource
+
+class OCROutputMode(str, Enum):
+    TEXT = "text" # Только текст страницы, изображения удаляются
+    ANNOTATIONS = "annotations" # Текст + текстовые аннотации изображений
+    IMAGES = "images" # Текст + аннотации + изображения в base64
 
 class ImageType(str, Enum):
     GRAPH = "graph"
@@ -38,35 +52,86 @@ class OutModel(BaseModel):
 class MistralOCR:
     def __init__(self):
         self.config = MistralConfig()
-        self.mistral = Mistral(api_key=self.config.api_key)
+        # Соединения асинхронного клиента Mistral привязаны к event loop, поэтому держим по клиенту на loop
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Mistral] = weakref.WeakKeyDictionary()
+        self.limiter = mistral_rate_limiter(self.config)
 
-    def _encode_pdf(self, pdf_path):
-        """Encode the pdf to base64."""
-        try:
-            with open(pdf_path, "rb") as pdf_file:
-                return base64.b64encode(pdf_file.read()).decode('utf-8')
-        except FileNotFoundError:
-            print(f"Error: The file {pdf_path} was not found.")
+        cache_config = CacheConfig()
+        self.cache: Optional[DiskCache] = None
+        if cache_config.enabled:
+            self.cache = DiskCache(
+                path=cache_config.path,
+                namespace="ocr",
+                ttl_seconds=cache_config.ocr_ttl_seconds,
+                max_size_bytes=cache_config.ocr_max_size_mb * 1024 * 1024
+            )
+
+    @property
+    def mistral(self) -> Mistral:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = Mistral(api_key=self.config.api_key, server_url=self.config.server_url)
+        return client
+
+    def _cache_key(self, file_hash: str, pages: list[int], questions_to_ask: Optional[list[str]], annotate_document: bool) -> str:
+        """Ключ кэша: хэш документа + модель OCR + диапазон страниц (+ вопросы для аннотации документа)"""
+        pages_range = f"{pages[0]}-{pages[-1]}" if pages else "all"
+        key_parts = [file_hash, self.config.ocr_model, self.config.ocr_output_mode, pages_range]
+        if not annotate_document:
+            # Окна без аннотации документа не годятся для ocr_async
+            key_parts.append("pages")
+        elif questions_to_ask:
+            key_parts.append(hashlib.sha256(json.dumps(questions_to_ask, ensure_ascii=False).encode("utf-8")).hexdigest()[:16])
+        return ":".join(key_parts)
+
+    def _load_cached(self, key: str, questions_to_ask: Optional[list[str]]) -> Optional[OutModel]:
+        if self.cache is None:
             return None
-        except Exception as e:  # Added general exception handling
-            print(f"Error: {e}")
+        cached = self.cache.get(key)
+        if cached is None:
             return None
+        out_model = OutModel.model_validate_json(cached)
+        if out_model.document is not None and not questions_to_ask:
+            out_model.document = Document(**out_model.document)
+        logger.info(f"✅ Страницы OCR взяты из кэша: {key}")
+        return out_model
+
+    @staticmethod
+    def _count_pages(source: DocumentSource) -> int:
+        """Количество страниц PDF (читается только структура документа)"""
+        pdf = pypdfium2.PdfDocument(source.path if source.data is None else source.data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def _page_windows(self, page_count: int) -> list[list[int]]:
+        window_size = max(1, self.config.ocr_window_pages)
+        return [list(range(start, min(start + window_size, page_count))) for start in range(0, page_count, window_size)]
 
     def _replace_images_in_markdown_annotated(self, markdown_str: str, images_dict: dict) -> str:
         """
-        Replace image placeholders in markdown with base64-encoded images and their annotation.
+        Replace image placeholders in markdown according to the OCR output mode.
 
         Args:
             markdown_str: Markdown text containing image placeholders
-            images_dict: Dictionary mapping image IDs to base64 strings
+            images_dict: Dictionary mapping image IDs to base64 strings and annotations
 
         Returns:
-            Markdown text with images replaced by base64 data and their annotation
+            Markdown text with images replaced by base64 data and/or their annotation, or removed in text mode
         """
+        output_mode = OCROutputMode(self.config.ocr_output_mode)
         for img_name, data in images_dict.items():
-            markdown_str = markdown_str.replace(
-                f"![{img_name}]({img_name})", f"![{img_name}]({data['image']})\n\n**{data['annotation']}**"
-            )
+            placeholder = f"![{img_name}]({img_name})"
+            annotation = data['annotation']
+            if output_mode == OCROutputMode.IMAGES:
+                replacement = f"![{img_name}]({data['image']})\n\n**{annotation}**"
+            elif output_mode == OCROutputMode.ANNOTATIONS and annotation:
+                replacement = f"**{annotation}**"
+            else:
+                replacement = ""
+            markdown_str = markdown_str.replace(placeholder, replacement)
         return markdown_str
 
     def _get_combined_markdown_annotated(self, ocr_response: OCRResponse) -> list[OutPageModel]:
@@ -91,40 +156,40 @@ class MistralOCR:
 
         return markdowns
 
-    def ocr(self, file_path: str, questions_to_ask: Optional[list[str]] = None) -> OutModel:
-        """
-        Обрабатывает PDF и возвращает текст, опционально отвечая на заданные вопросы.
-        """
-        base64_pdf = self._encode_pdf(file_path)
-        if base64_pdf is None:
-            return OutModel(document=None, pages=[])
-
-        include_images = True
-
-        document_annotation_model: type[BaseModel]
-        returned_document_data: Any = None
-
+    def _document_annotation_model(self, questions_to_ask: Optional[list[str]]) -> type[BaseModel]:
         if questions_to_ask:
             fields = {}
             for i, question_text in enumerate(questions_to_ask):
                 field_name = f"question_{i+1}_answer"
                 fields[field_name] = (Optional[str], Field(None, description=f"Answer the following question: {question_text}"))
             
-            document_annotation_model = create_model("DynamicQuestionAnswers", **fields)
-        else:
-            document_annotation_model = Document
+            return create_model("DynamicQuestionAnswers", **fields)
+        return Document
+
+    async def _ocr_window(self, document_url: str, pages: list[int], questions_to_ask: Optional[list[str]],
+                          annotate_document: bool) -> OutModel:
+        """OCR одного окна страниц загруженного документа; аннотация документа запрашивается только при annotate_document"""
+        output_mode = OCROutputMode(self.config.ocr_output_mode)
+        returned_document_data: Any = None
+
+        # Аннотации изображений (bbox) и base64 запрашиваем только если они попадут в результат
+        extra_params: dict[str, Any] = {}
+        if output_mode != OCROutputMode.TEXT:
+            extra_params["bbox_annotation_format"] = response_format_from_pydantic_model(Image)
+        if annotate_document:
+            extra_params["document_annotation_format"] = response_format_from_pydantic_model(self._document_annotation_model(questions_to_ask))
 
-        ocr_response = self.mistral.ocr.process(
-            model="mistral-ocr-latest",
-            pages=list(range(min(8, 1000))),
+        ocr_response = await self.limiter.call(lambda: self.mistral.ocr.process_async(
+            model=self.config.ocr_model,
+            pages=pages,
             document={
                 "type": "document_url",
-                "document_url": f"data:application/pdf;base64,{base64_pdf}"
+                "document_url": document_url
             },
-            bbox_annotation_format=response_format_from_pydantic_model(Image),
-            document_annotation_format=response_format_from_pydantic_model(document_annotation_model),
-            include_image_base64=include_images
-        )
+            include_image_base64=output_mode == OCROutputMode.IMAGES,
+            **extra_params
+        ), name="ocr", tokens=len(pages) * TOKENS_PER_PAGE)
+        metrics.inc("ocr_pages_total", len(ocr_response.pages))
         
         if ocr_response.document_annotation:
             json_doc = json.loads(ocr_response.document_annotation)
@@ -133,6 +198,105 @@ class MistralOCR:
             else:
                 returned_document_data = Document(**json_doc)
 
-        pages = self._get_combined_markdown_annotated(ocr_response)
+        return OutModel(document=returned_document_data, pages=self._get_combined_markdown_annotated(ocr_response))
+
+    async def _iter_windows(self, file_path: Union[str, DocumentSource], questions_to_ask: Optional[list[str]] = None,
+                            annotate_document: bool = False) -> AsyncIterator[OutModel]:
+        """
+        OCR документа окнами страниц: окна обрабатываются параллельно (не более ocr_concurrency),
+        результаты отдаются по порядку по мере готовности.
+        Аннотация документа (annotate_document) платная - запрашивается, только если результат ее читает.
+        """
+        source = DocumentSource.coerce(file_path)
+        file_hash = await asyncio.to_thread(source.sha256)
+        page_count = await asyncio.to_thread(self._count_pages, source)
+        windows = self._page_windows(page_count)
+        logger.info(f"OCR {source.name}: {page_count} pages in {len(windows)} windows")
+
+        semaphore = asyncio.Semaphore(max(1, self.config.ocr_concurrency))
+        upload_lock = asyncio.Lock()
+        uploaded: dict[str, str] = {}
+
+        async def upload() -> Any:
+            # Файл открывается заново на каждую попытку: повтор должен отправить его с начала
+            with source.open() as file:
+                return await self.mistral.files.upload_async(
+                    file={"file_name": source.file_name, "content": file},
+                    purpose="ocr"
+                )
+
+        async def get_document_url() -> str:
+            # Файл загружается один раз и только если хотя бы одного окна нет в кэше
+            async with upload_lock:
+                if "url" not in uploaded:
+                    with metrics.span("ocr_upload"):
+                        response = await self.limiter.call(upload, name="upload")
+                    uploaded["file_id"] = response.id
+                    with metrics.span("ocr_signed_url"):
+                        signed_url = await self.limiter.call(lambda: self.mistral.files.get_signed_url_async(file_id=response.id), name="signed_url")
+                    uploaded["url"] = signed_url.url
+                return uploaded["url"]
+
+        async def process_window(pages: list[int]) -> OutModel:
+            cache_key = self._cache_key(file_hash, pages, questions_to_ask, annotate_document)
+            cached = await asyncio.to_thread(self._load_cached, cache_key, questions_to_ask)
+            if cached is not None:
+                metrics.inc("ocr_cache_hits_total")
+                return cached
+            async with semaphore:
+                document_url = await get_document_url()
+                with metrics.span("ocr_window"):
+                    out_model = await self._ocr_window(document_url, pages, questions_to_ask, annotate_document)
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, cache_key, out_model.model_dump_json())
+            return out_model
+
+        tasks = [asyncio.create_task(process_window(pages)) for pages in windows]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if "file_id" in uploaded:
+                # Удаление не задерживает выдачу результата
+                file_id = uploaded["file_id"]
+                background_tasks.spawn(self.limiter.call(lambda: self.mistral.files.delete_async(file_id=file_id), name="delete"), f"delete file {file_id}")
+
+    async def iter_pages_async(self, file_path: Union[str, DocumentSource]) -> AsyncIterator[OutPageModel]:
+        """Постраничная выдача результатов OCR по мере готовности окон"""
+        async for window in self._iter_windows(file_path):
+            for page in window.pages:
+                yield page
+
+    async def ocr_async(self, file_path: Union[str, DocumentSource], questions_to_ask: Optional[list[str]] = None) -> OutModel:
+        """
+        Обрабатывает PDF и возвращает текст, опционально отвечая на заданные вопросы.
+        """
+        returned_document_data: Any = None
+        pages: list[OutPageModel] = []
+        async for window in self._iter_windows(file_path, questions_to_ask, annotate_document=True):
+            pages.extend(window.pages)
+            if window.document is None:
+                continue
+            if returned_document_data is None:
+                returned_document_data = window.document
+            elif questions_to_ask:
+                # Ответы на вопросы дополняем из следующих окон документа
+                for key, value in window.document.items():
+                    if returned_document_data.get(key) is None:
+                        returned_document_data[key] = value
+
+        return OutModel(document=returned_document_data, pages=pages)
+
+    def ocr(self, file_path: Union[str, DocumentSource], questions_to_ask: Optional[list[str]] = None) -> OutModel:
+        """Синхронная обертка над ocr_async для вызова вне event loop"""
+        async def run() -> OutModel:
+            try:
+                return await self.ocr_async(file_path, questions_to_ask)
+            finally:
+                # Удаление загруженного файла не должно прерываться закрытием event loop
+                await background_tasks.drain()
 
-        return OutModel(document=returned_document_data, pages=pages)
\ No newline at end of file
+        return asyncio.run(run())
@@ -0,0 +1,91 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+from pydantic import BaseModel, Field
+from queries import TenderData
+
+# Поля, которые показываются пользователю, как только их нашел хотя бы один чанк
+KEY_FIELDS: dict[str, str] = {
+    "procurement_name": "📦 Наименование закупки",
+    "notice_number": "📄 Номер извещения",
+    "customer_info_company_name": "🏢 Заказчик",
+    "publication_and_submission_deadline": "🗓️ Срок подачи заявок",
+    "application_review_deadline": "📅 Срок рассмотрения заявок",
+    "initial_max_price_with_vat": "💰 Начальная максимальная цена (с НДС)",
+}
+
+class AnalyzeProgress(BaseModel):
+    files_done: int = 0
+    files_total: int = 0
+    chunks_done: int = 0
+    chunks_total: int = 0
+    # Key: имя ключевого поля TenderData, Value: первое найденное значение
+    fields: dict[str, str] = Field(default_factory=dict)
+
+    def render(self) -> str:
+        """Текст статусного сообщения (без разметки)"""
+        lines = ["⏳ Анализирую документы..."]
+        if self.files_total:
+            lines.append(f"Файлов обработано: {self.files_done}/{self.files_total}")
+        if self.chunks_total:
+            lines.append(f"Фрагментов обработано: {self.chunks_done}/{self.chunks_total}")
+        for field_name, title in KEY_FIELDS.items():
+            if self.fields.get(field_name):
+                lines.append(f"{title}: {self.fields[field_name]}")
+        return "\n".join(lines)
+
+class ProgressTracker:
+    """Сбор прогресса анализа одного задания: счетчики файлов/чанков и ключевые поля, найденные на данный момент"""
+
+    def __init__(self, on_update: Optional[Callable[[AnalyzeProgress], None]] = None, min_interval: float = 0.0):
+        """
+        Args:
+            on_update: Вызывается при изменении прогресса (в потоке event loop)
+            min_interval: Минимальный интервал между вызовами on_update, секунд (0 - без ограничения)
+        """
+        self.progress = AnalyzeProgress()
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self._last_update = 0.0
+
+    def _notify(self, force: bool = False) -> None:
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_update < self.min_interval:
+            return
+        self._last_update = now
+        self.on_update(self.progress)
+
+    def add_files(self, count: int) -> None:
+        self.progress.files_total += count
+        self._notify()
+
+    def add_chunks(self, count: int) -> None:
+        self.progress.chunks_total += count
+        self._notify()
+
+    def file_done(self, result: Any = None) -> None:
+        self.progress.files_done += 1
+        self._collect(result)
+        self._notify(force=True)
+
+    def chunk_done(self, result: Any = None) -> None:
+        self.progress.chunks_done += 1
+        new_fields = self._collect(result)
+        self._notify(force=new_fields)
+
+    def _collect(self, result: Any) -> bool:
+        """Сохранение впервые найденных ключевых полей. Возвращает True, если появились новые поля"""
+        if not isinstance(result, TenderData):
+            return False
+        new_fields = False
+        for field_name in KEY_FIELDS:
+            value = getattr(result, field_name)
+            if value and not self.progress.fields.get(field_name):
+                self.progress.fields[field_name] = value
+                new_fields = True
+        return new_fields
+
+# Прогресс текущего задания; устанавливается ботом или исполнителем, None - прогресс не отслеживается
+current_progress: ContextVar[Optional[ProgressTracker]] = ContextVar("current_progress", default=None)
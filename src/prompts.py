@@ -47,4 +47,17 @@ class Prompts:
         """
 
     
-    
\ No newline at end of file
+    
+    @staticmethod
+    def get_prompt_for_conflict_resolution(field_description: str, candidates: list[str]) -> str:
+        candidates_text = "\n".join(f"{i + 1}. {candidate}" for i, candidate in enumerate(candidates))
+        return f"""
+        Вы полезный помощник, который проверяет информацию, извлеченную из тендерной документации.
+        Для поля «{field_description}» из разных частей документов были извлечены разные значения.
+        Выберите наиболее полное и правильное значение или объедините их, если они дополняют друг друга.
+
+        Варианты:
+        {candidates_text}
+
+        Вы ДОЛЖНЫ ВСЕГДА отвечать ТОЛЬКО в формате JSON с полем "value".
+        """
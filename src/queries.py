@@ -1,5 +1,6 @@
+from functools import lru_cache
 from pydantic import BaseModel
-from pydantic import Field
+from pydantic import Field, create_model
 from typing import Optional, List
 
 
@@ -51,4 +52,67 @@ class TenderData(BaseModel):
     product_dimensions: Optional[str] = Field(description="Габаритные размеры товара", default="")
     product_purpose: Optional[str] = Field(description="Назначение товара", default="")
     contract_term: Optional[str] = Field(description="Срок действия договора", default="")
-    delivery_address: Optional[str] = Field(description="Адрес доставки", default="")
\ No newline at end of file
+    delivery_address: Optional[str] = Field(description="Адрес доставки", default="")
+
+# Группы полей TenderData: используются для маршрутизации чанков к LLM
+FIELD_GROUPS: dict[str, list[str]] = {
+    "parties": [
+        "procurement_name", "customer_info_company_name", "notice_number",
+        "etp_platform", "delivery_department", "contact_persons",
+    ],
+    "prices": [
+        "lots", "initial_max_price_with_vat", "application_security",
+        "contract_security", "participation_price", "payment_terms",
+    ],
+    "dates": [
+        "publication_and_submission_deadline", "re_bidding_date", "application_review_deadline",
+        "results_summary_date", "contract_term",
+    ],
+    "delivery": [
+        "warranty_requirements", "required_delivery_period", "delivery_documents_names",
+        "delivery_method", "product_dimensions", "product_purpose", "delivery_address",
+    ],
+}
+
+@lru_cache(maxsize=None)
+def get_group_model(group_name: str) -> type[BaseModel]:
+    """
+    Модель-подмножество TenderData для одной группы полей.
+
+    Поля (типы, описания, значения по умолчанию) берутся из TenderData без изменений,
+    поэтому ответ по группе напрямую валидируется обратно в TenderData.
+    """
+    fields = {
+        field_name: (TenderData.model_fields[field_name].annotation, TenderData.model_fields[field_name])
+        for field_name in FIELD_GROUPS[group_name]
+    }
+    return create_model(f"TenderData{group_name.capitalize()}", **fields)
+
+
+# Ключевые слова и фразы, по которым в тексте ищутся ответы на поля TenderData
+FIELD_KEYWORDS: dict[str, list[str]] = {
+    "procurement_name": ["наименование закупки", "предмет закупки", "предмет договора", "поставка", "оказание услуг", "выполнение работ"],
+    "customer_info_company_name": ["заказчик", "покупатель", "организатор закупки", "наименование организации", "ИНН", "КПП", "ОГРН"],
+    "notice_number": ["извещение", "номер извещения", "номер закупки", "реестровый номер", "№ закупки"],
+    "publication_and_submission_deadline": ["дата размещения", "дата публикации", "срок подачи заявок", "окончание подачи", "время московское", "МСК"],
+    "lots": ["лот", "номер лота", "количество", "единица измерения", "спецификация", "НМЦ", "начальная максимальная цена"],
+    "delivery_department": ["грузополучатель", "подразделение", "филиал", "структурное подразделение", "получатель"],
+    "initial_max_price_with_vat": ["НМЦ", "НМЦД", "начальная максимальная цена", "цена договора", "с учетом НДС", "в том числе НДС"],
+    "contact_persons": ["контактное лицо", "ответственное лицо", "телефон", "e-mail", "электронная почта", "ФИО"],
+    "application_security": ["обеспечение заявки", "обеспечение заявок", "размер обеспечения заявки", "банковская гарантия", "независимая гарантия"],
+    "re_bidding_date": ["переторжка", "дата переторжки", "проведение переторжки"],
+    "etp_platform": ["электронная торговая площадка", "ЭТП", "электронная площадка", "сайт", "адрес электронной площадки"],
+    "application_review_deadline": ["рассмотрение заявок", "дата рассмотрения", "окончание рассмотрения", "оценка заявок"],
+    "results_summary_date": ["подведение итогов", "дата подведения итогов", "итоговый протокол"],
+    "contract_security": ["обеспечение исполнения договора", "обеспечение договора", "обеспечение исполнения контракта", "гарантийные обязательства"],
+    "participation_price": ["плата за участие", "цена участия", "тариф оператора", "взимается плата"],
+    "warranty_requirements": ["гарантия", "гарантийный срок", "гарантийные обязательства", "срок гарантии"],
+    "required_delivery_period": ["срок поставки", "сроки поставки", "период поставки", "календарных дней", "рабочих дней"],
+    "payment_terms": ["условия оплаты", "порядок оплаты", "оплата", "аванс", "отсрочка платежа", "расчеты"],
+    "delivery_documents_names": ["товарная накладная", "УПД", "счет-фактура", "сертификат соответствия", "паспорт изделия", "документы при поставке"],
+    "delivery_method": ["доставка", "способ доставки", "транспорт", "силами поставщика", "самовывоз", "разгрузка"],
+    "product_dimensions": ["габаритные размеры", "габариты", "размеры", "длина", "ширина", "высота", "мм"],
+    "product_purpose": ["назначение", "предназначен", "область применения", "для нужд"],
+    "contract_term": ["срок действия договора", "договор действует", "вступает в силу", "до полного исполнения"],
+    "delivery_address": ["адрес доставки", "место поставки", "место доставки", "адрес поставки", "место оказания услуг"],
+}
@@ -0,0 +1,87 @@
+import math
+import re
+from collections import Counter
+from typing import Optional
+from queries import FIELD_GROUPS, FIELD_KEYWORDS
+
+# Грубый стемминг для русского текста: слова обрезаются до общей основы
+STEM_LENGTH = 6
+TOKEN_PATTERN = re.compile(r"[a-zа-я0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    """Токенизация текста для лексического поиска"""
+    tokens = TOKEN_PATTERN.findall(text.lower().replace("ё", "е"))
+    return [token[:STEM_LENGTH] for token in tokens if len(token) > 1 or token.isdigit()]
+
+class BM25Index:
+    """Инвертированный индекс BM25 в памяти над чанками одного документа"""
+
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            chunks: Чанки документа
+            k1: Насыщение частоты термина
+            b: Нормализация по длине чанка
+        """
+        self.k1 = k1
+        self.b = b
+        self.chunk_count = len(chunks)
+        self.term_frequencies: list[Counter] = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = (sum(self.lengths) / self.chunk_count) if self.chunk_count else 0.0
+        # Key: термин, Value: индексы чанков, в которых он встречается
+        self.postings: dict[str, list[int]] = {}
+        for i, frequencies in enumerate(self.term_frequencies):
+            for term in frequencies:
+                self.postings.setdefault(term, []).append(i)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, []))
+        return math.log(1 + (self.chunk_count - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> list[float]:
+        """Оценка BM25 каждого чанка для запроса"""
+        scores = [0.0] * self.chunk_count
+        if not self.average_length:
+            return scores
+        for term in set(tokenize(query)):
+            idf = self._idf(term)
+            for i in self.postings.get(term, []):
+                tf = self.term_frequencies[i][term]
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.average_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def field_scores(self, field_name: str) -> list[float]:
+        """Оценка чанков по ключевым словам поля TenderData"""
+        return self.score(" ".join(FIELD_KEYWORDS.get(field_name, [])))
+
+    def route(self, top_k: int, groups: Optional[dict[str, list[str]]] = None) -> dict[int, set[str]]:
+        """
+        Маршрутизация чанков по группам полей.
+
+        Для каждой группы выбираются top_k чанков с наибольшей суммарной (нормированной по полю) оценкой.
+        Первый чанк (шапка извещения) всегда отправляется во все группы.
+
+        Returns:
+            Key: индекс чанка, Value: группы полей, для которых чанк нужно отправить в LLM
+        """
+        groups = groups or FIELD_GROUPS
+        routes: dict[int, set[str]] = {}
+        if not self.chunk_count:
+            return routes
+        for group_name, field_names in groups.items():
+            group_scores = [0.0] * self.chunk_count
+            for field_name in field_names:
+                scores = self.field_scores(field_name)
+                best = max(scores)
+                if best <= 0:
+                    continue
+                for i, score in enumerate(scores):
+                    group_scores[i] += score / best
+            ranked = sorted(range(self.chunk_count), key=lambda i: group_scores[i], reverse=True)
+            for i in ranked[:top_k]:
+                if group_scores[i] > 0:
+                    routes.setdefault(i, set()).add(group_name)
+            routes.setdefault(0, set()).add(group_name)
+        return routes
@@ -0,0 +1,150 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Optional
+from loguru import logger
+from metrics import metrics
+
+class QueueFullError(Exception):
+    """Задание не может быть поставлено в очередь: превышен общий лимит или лимит пользователя"""
+
+class Job:
+    def __init__(self, user_id: int, job_factory: Callable[[], Awaitable[Any]]):
+        self.user_id = user_id
+        self.job_factory = job_factory
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class JobScheduler:
+    """Очередь заданий анализа: общий пул исполнителей, круговое обслуживание пользователей и ограничение очереди"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 100, max_per_user: int = 3):
+        """
+        Args:
+            workers: Сколько заданий выполняется одновременно
+            max_queue: Максимум ожидающих заданий всех пользователей
+            max_per_user: Максимум ожидающих заданий одного пользователя
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        # Key: user_id, Value: ожидающие задания пользователя; порядок ключей - очередь обслуживания пользователей
+        self._queues: OrderedDict[int, deque[Job]] = OrderedDict()
+        self._running = 0
+        self._has_jobs: Optional[asyncio.Event] = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def start(self) -> None:
+        """Запуск исполнителей в текущем event loop"""
+        if self._worker_tasks:
+            return
+        self._has_jobs = asyncio.Event()
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Job scheduler started: {self.workers} workers, max queue {self.max_queue}, max per user {self.max_per_user}")
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for queue in self._queues.values():
+            for job in queue:
+                job.future.cancel()
+        self._queues.clear()
+
+    def submit(self, user_id: int, job_factory: Callable[[], Awaitable[Any]]) -> tuple[int, asyncio.Future]:
+        """
+        Постановка задания в очередь.
+
+        Returns:
+            Позиция задания в очереди (1 - будет взято следующим) и future с результатом задания
+
+        Raises:
+            QueueFullError: Очередь заполнена или у пользователя слишком много ожидающих заданий
+        """
+        if self.queue_depth >= self.max_queue:
+            raise QueueFullError("Очередь заданий заполнена")
+        user_queue = self._queues.get(user_id)
+        if user_queue is not None and len(user_queue) >= self.max_per_user:
+            raise QueueFullError(f"У пользователя уже {len(user_queue)} заданий в очереди")
+
+        job = Job(user_id, job_factory)
+        if user_queue is None:
+            user_queue = self._queues[user_id] = deque()
+        user_queue.append(job)
+        self._report_depth()
+        if self._has_jobs is not None:
+            self._has_jobs.set()
+        position = self.position(job)
+        logger.info(f"Job queued for user {user_id}: position {position}, queue depth {self.queue_depth}")
+        return position, job.future
+
+    def position(self, job: Job) -> int:
+        """Позиция задания в порядке, в котором его возьмут исполнители (0 - задания нет в очереди)"""
+        pending = [queued for queued in self._dispatch_order() if not queued.future.cancelled()]
+        for position, queued in enumerate(pending, start=1):
+            if queued is job:
+                return position
+        return 0
+
+    def _dispatch_order(self) -> list[Job]:
+        """Ожидающие задания в порядке выдачи: та же ротация пользователей, что и в _next_job"""
+        queues = OrderedDict((user_id, deque(queue)) for user_id, queue in self._queues.items())
+        order = []
+        while queues:
+            user_id, user_queue = queues.popitem(last=False)
+            order.append(user_queue.popleft())
+            if user_queue:
+                queues[user_id] = user_queue
+        return order
+
+    def _report_depth(self) -> None:
+        metrics.set_gauge("scheduler_queue_depth", self.queue_depth)
+        metrics.set_gauge("scheduler_running_jobs", self._running)
+
+    def idle_workers(self) -> int:
+        return max(0, self.workers - self._running)
+
+    def _next_job(self) -> Optional[Job]:
+        if not self._queues:
+            return None
+        user_id, user_queue = next(iter(self._queues.items()))
+        job = user_queue.popleft()
+        # Пользователь уходит в конец круга; если заданий больше нет - удаляется из очереди
+        self._queues.pop(user_id)
+        if user_queue:
+            self._queues[user_id] = user_queue
+        self._report_depth()
+        return job
+
+    async def _worker(self, worker_index: int) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._has_jobs.clear()
+                await self._has_jobs.wait()
+                continue
+            if job.future.cancelled():
+                continue
+            self._running += 1
+            self._report_depth()
+            try:
+                result = await job.job_factory()
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка выполнения задания пользователя {job.user_id} (worker={worker_index}): {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._running -= 1
+                self._report_depth()
@@ -0,0 +1,134 @@
+import zipfile
+from typing import Any, Iterable
+from loguru import logger
+from sources.document_source import DocumentSource
+
+try:
+    import rarfile
+except ImportError: # RAR - необязательная зависимость (pip install .[rar] и unrar/bsdtar в системе)
+    rarfile = None
+
+ARCHIVE_EXTENSIONS = {".zip", ".rar"}
+
+class ArchiveBudget:
+    """Ограничения распаковки в память: глубина вложенности, суммарный объем и число файлов"""
+
+    def __init__(self, max_depth: int, max_total_bytes: int, max_members: int):
+        self.max_depth = max_depth
+        self.remaining_bytes = max_total_bytes
+        self.remaining_members = max_members
+
+    def take(self, size: int) -> bool:
+        """Резервирование объема под файл архива; False - бюджет исчерпан"""
+        if self.remaining_members <= 0 or size > self.remaining_bytes:
+            return False
+        self.remaining_members -= 1
+        self.remaining_bytes -= size
+        return True
+
+class ArchiveReader:
+    """
+    Разворачивание архивов (ZIP, RAR) в список документов.
+
+    Файлы архива читаются в память по одному, архив целиком на диск не распаковывается.
+    Вложенные архивы разворачиваются до max_depth уровней; файлы с неподдерживаемыми
+    расширениями пропускаются.
+    """
+
+    def __init__(self, supported_extensions: Iterable[str], max_depth: int = 2,
+                 max_total_bytes: int = 200 * 1024 * 1024, max_members: int = 500):
+        """
+        Args:
+            supported_extensions: Расширения документов, которые принимает анализатор
+            max_depth: Максимальная глубина вложенности архивов
+            max_total_bytes: Максимальный объем файлов, распакованных в память из одного архива верхнего уровня
+            max_members: Максимальное число файлов, извлекаемых из одного архива верхнего уровня
+        """
+        self.supported_extensions = set(supported_extensions)
+        self.max_depth = max_depth
+        self.max_total_bytes = max_total_bytes
+        self.max_members = max_members
+
+    @staticmethod
+    def is_archive(source: DocumentSource) -> bool:
+        return source.extension in ARCHIVE_EXTENSIONS
+
+    def expand(self, sources: list[DocumentSource]) -> tuple[list[DocumentSource], list[str]]:
+        """
+        Замена архивов их документами.
+
+        Returns:
+            Документы для анализа и имена архивов, из которых не удалось извлечь ни одного документа
+        """
+        documents: list[DocumentSource] = []
+        failed: list[str] = []
+        for source in sources:
+            if not self.is_archive(source):
+                documents.append(source)
+                continue
+            budget = ArchiveBudget(self.max_depth, self.max_total_bytes, self.max_members)
+            try:
+                members = self._expand_archive(source, budget, depth=1)
+            except Exception as e:
+                logger.error(f"❌ Не удалось прочитать архив {source.name}: {e}")
+                members = []
+            if members:
+                logger.info(f"Archive {source.name}: {len(members)} documents")
+                documents.extend(members)
+            else:
+                failed.append(source.name)
+        return documents, failed
+
+    def _open_archive(self, source: DocumentSource) -> Any:
+        if source.extension == ".zip":
+            return zipfile.ZipFile(source.open())
+        if rarfile is None:
+            raise ValueError("поддержка RAR не установлена (pip install rarfile)")
+        return rarfile.RarFile(source.open())
+
+    def _expand_archive(self, source: DocumentSource, budget: ArchiveBudget, depth: int) -> list[DocumentSource]:
+        documents: list[DocumentSource] = []
+        with self._open_archive(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                member = DocumentSource(name=f"{source.name}/{self._member_name(info)}")
+                nested = self.is_archive(member)
+                if not nested and member.extension not in self.supported_extensions:
+                    logger.debug(f"Skipping unsupported archive member: {member.name}")
+                    continue
+                if nested and depth >= budget.max_depth:
+                    logger.warning(f"Skipping nested archive deeper than {budget.max_depth}: {member.name}")
+                    continue
+                if not budget.take(info.file_size):
+                    logger.warning(f"Archive budget exhausted, skipping the rest of {source.name} from {member.name}")
+                    break
+                member.data = self._read_member(archive, info)
+                if nested:
+                    try:
+                        documents.extend(self._expand_archive(member, budget, depth + 1))
+                    except Exception as e:
+                        logger.error(f"❌ Не удалось прочитать вложенный архив {member.name}: {e}")
+                else:
+                    documents.append(member)
+        return documents
+
+    @staticmethod
+    def _read_member(archive: Any, info: Any) -> bytes:
+        # Заявленный размер проверен бюджетом; читаем не больше него, чтобы не доверять заголовку архива
+        with archive.open(info) as file:
+            data = file.read(info.file_size + 1)
+        if len(data) > info.file_size:
+            raise ValueError(f"размер {info.filename} больше указанного в архиве")
+        return data
+
+    @staticmethod
+    def _member_name(info: Any) -> str:
+        name = info.filename
+        # ZIP из Windows хранит имена в cp866 без флага UTF-8, а zipfile декодирует их как cp437
+        if isinstance(info, zipfile.ZipInfo) and not info.flag_bits & 0x800:
+            try:
+                name = name.encode("cp437").decode("cp866")
+            except UnicodeError:
+                pass
+        return name
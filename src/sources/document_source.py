@@ -0,0 +1,49 @@
+import hashlib
+import io
+import os
+from typing import Awaitable, BinaryIO, Optional, Union
+from pydantic import BaseModel, PrivateAttr
+from cache.disk_cache import file_sha256
+
+class DocumentSource(BaseModel):
+    """Документ для анализа: файл на диске или содержимое в памяти (например, файл из архива)"""
+    name: str # Путь файла или «<архив>/<путь в архиве>» - так документ называется в логах и ошибках
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    _sha256: Optional[str] = PrivateAttr(default=None)
+
+    @classmethod
+    def coerce(cls, source: Union[str, "DocumentSource"]) -> "DocumentSource":
+        """Путь к файлу или готовый DocumentSource"""
+        if isinstance(source, DocumentSource):
+            return source
+        return cls(name=source, path=source)
+
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(self.name)
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.name)[1].lower()
+
+    def open(self) -> BinaryIO:
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def sha256(self) -> str:
+        """SHA-256 содержимого; вычисляется один раз"""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest() if self.data is not None else file_sha256(self.path)
+        return self._sha256
+
+# Документ задания для анализатора: путь, готовый DocumentSource или ожидание документа (например, скачивание);
+# ожидание возвращает None, если документ получить не удалось
+DocumentInput = Union[str, DocumentSource, Awaitable[Optional[DocumentSource]]]
@@ -1,27 +1,76 @@
-from typing import List, Dict
+import os
+from typing import List, Dict, Optional, Tuple
 from semantic_text_splitter import TextSplitter
 from tokenizers import Tokenizer
+from loguru import logger
+from retrieval.bm25_index import BM25Index
 
 class SemanticSplitter():
     """Semantic text splitter implementation using semantic-text-splitter"""
     
-    def __init__(self, chunk_size: int = 2048, chunk_overlap: int = 256):
+    def __init__(self, chunk_size: int = 2048, chunk_overlap: int = 256,
+                 model_name: str = "ai-forever/sbert_large_nlu_ru", tokenizer_path: Optional[str] = None,
+                 tokenizer: Optional[Tokenizer] = None):
         """Initialize semantic splitter
         
         Args:
             chunk_size: Size of each text chunk
             chunk_overlap: Number of characters to overlap between chunks
+            model_name: HuggingFace Hub tokenizer used when no local tokenizer file is available
+            tokenizer_path: Path to a local tokenizer.json, loaded without network access
+            tokenizer: Already loaded tokenizer (model_name and tokenizer_path are then ignored)
         """ 
-        self.model_name = "ai-forever/sbert_large_nlu_ru" #"ai-forever/sbert_large_nlu_ru", "bert-base-uncased"
+        self.model_name = model_name #"ai-forever/sbert_large_nlu_ru", "bert-base-uncased"
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        tokenizer = Tokenizer.from_pretrained(self.model_name)
+        self.tokenizer = tokenizer or self._load_tokenizer(model_name, tokenizer_path)
         self.splitter = TextSplitter.from_huggingface_tokenizer(
-            tokenizer=tokenizer,
+            tokenizer=self.tokenizer,
             capacity=chunk_size,
             overlap=chunk_overlap
         )
 
+    @classmethod
+    def from_token_budget(cls, context_tokens: int, overhead: List[str], reserve_tokens: int = 1024,
+                          chunk_overlap: int = 0, model_name: str = "ai-forever/sbert_large_nlu_ru",
+                          tokenizer_path: Optional[str] = None) -> "SemanticSplitter":
+        """Create a splitter whose chunks fill the model context left after the prompt
+        
+        Args:
+            context_tokens: Model context size in tokens
+            overhead: Texts sent with every chunk (instructions, JSON schema), counted with the same tokenizer
+            reserve_tokens: Tokens kept free for the model response and tokenizer mismatch
+            chunk_overlap: Number of tokens to overlap between chunks (part of the chunk size)
+            model_name: HuggingFace Hub tokenizer used when no local tokenizer file is available
+            tokenizer_path: Path to a local tokenizer.json
+            
+        Returns:
+            Splitter with chunk_size = context_tokens - overhead - reserve_tokens
+        """
+        tokenizer = cls._load_tokenizer(model_name, tokenizer_path)
+        overhead_tokens = sum(len(tokenizer.encode(text, add_special_tokens=False).ids) for text in overhead)
+        chunk_size = context_tokens - overhead_tokens - reserve_tokens
+        if chunk_size <= chunk_overlap:
+            raise ValueError(
+                f"Context of {context_tokens} tokens leaves no room for chunks: "
+                f"prompt overhead {overhead_tokens}, reserve {reserve_tokens}, overlap {chunk_overlap}"
+            )
+        logger.info(f"Token budget: context {context_tokens}, overhead {overhead_tokens}, reserve {reserve_tokens} -> chunk size {chunk_size}")
+        return cls(chunk_size, chunk_overlap, model_name=model_name, tokenizer=tokenizer)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in text according to the splitter tokenizer"""
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    @staticmethod
+    def _load_tokenizer(model_name: str, tokenizer_path: Optional[str]) -> Tokenizer:
+        """Load tokenizer from a local file if present, otherwise download it from the Hub"""
+        if tokenizer_path and os.path.isfile(tokenizer_path):
+            return Tokenizer.from_file(tokenizer_path)
+        if tokenizer_path:
+            logger.warning(f"Tokenizer file {tokenizer_path} not found, downloading {model_name} from HuggingFace Hub")
+        return Tokenizer.from_pretrained(model_name)
+
     def _get_additional_info(self) -> Dict[str, any]:
         """Get additional information about the splitter
         
@@ -45,4 +94,16 @@ class SemanticSplitter():
         """
 
         chunks = self.splitter.chunks(text)
-        return chunks
\ No newline at end of file
+        return chunks
+
+    def split_text_indexed(self, text: str) -> Tuple[List[str], BM25Index]:
+        """Split text into chunks and build a lexical index over them
+        
+        Args:
+            text: Text to split
+            
+        Returns:
+            List of text chunks and BM25 index over these chunks
+        """
+        chunks = self.split_text(text)
+        return chunks, BM25Index(chunks)
@@ -2,32 +2,32 @@ import os
 import sys
 import time
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import Bot, Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from collections import defaultdict
 import asyncio
 from pydantic import BaseModel, Field
-import tempfile
 import pathlib
 import shutil
-from config import BotConfig, AnalyzerConfig
-from documents_analyzer import DocumentsAnalyzer
-from mistral_analyzer import MistralAnalyzer
-from local_LLM_analyzer import LocalLLMAnalyzer
+import uuid
+from typing import Optional
+from config import BotConfig, AnalyzerConfig, JobsConfig, MetricsConfig, SchedulerConfig
+from documents_analyzer import DocumentsAnalyzer, create_analyzer
+from jobs.job_queue import JobQueue, QueuedFile
+from scheduler import JobScheduler, QueueFullError
+from sources.document_source import DocumentSource
+from progress import AnalyzeProgress, ProgressTracker, current_progress
+from metrics import metrics, start_metrics_server
+from background import background_tasks
 from loguru import logger
 import telegramify_markdown
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Configure Loguru
-logger.add("logs/bot.log", rotation="500 MB", compression="zip", level="INFO")
-logger.add("logs/bot_debug.log", level="DEBUG")
-
 class DocumentInfo(BaseModel):
     file_id: str
     file_name: str
     chat_id: int
+    file_unique_id: Optional[str] = None # Одинаков у одного и того же файла, отправленного несколько раз
 
 class UserSession(BaseModel):
     # Key: media_group_id, Value: List of DocumentInfo
@@ -37,92 +37,300 @@ class UserSession(BaseModel):
     # We'll manage this outside of direct Pydantic validation if strict serialization is needed.
     media_group_timers: dict[str, any] = Field(default_factory=dict)
 
+class StatusMessage:
+    """Статусное сообщение задания, которое редактируется на месте не чаще, чем раз в min_interval секунд."""
+
+    MAX_MESSAGE_LENGTH = 4096
+
+    def __init__(self, bot: Bot, chat_id: int, min_interval: float):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.message_id: Optional[int] = None
+        self._text: Optional[str] = None
+        self._sent_text: Optional[str] = None
+        self._last_edit = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def send(self, text: str) -> None:
+        message = await self.bot.send_message(chat_id=self.chat_id, text=text)
+        self.message_id = message.message_id
+        self._text = self._sent_text = text
+        self._last_edit = time.monotonic()
+
+    def update(self, text: str) -> None:
+        """Запрос на обновление текста; несколько обновлений подряд схлопываются в одно редактирование."""
+        self._text = text
+        if self.message_id is not None and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._text != self._sent_text:
+            delay = self.min_interval - (time.monotonic() - self._last_edit)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text = self._text
+            try:
+                await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self.message_id, text=text)
+            except RetryAfter as e:
+                logger.warning(f"Telegram rate limit on status edit, retry after {e.retry_after}")
+                await asyncio.sleep(float(e.retry_after))
+                continue
+            except BadRequest as e:
+                # «message is not modified» и подобные - просто пропускаем это обновление
+                logger.debug(f"Status edit skipped: {e}")
+            self._sent_text = text
+            self._last_edit = time.monotonic()
+
+    async def finish(self, escaped_text: str) -> bool:
+        """Замена статуса итоговой сводкой (MarkdownV2). Возвращает False, если заменить не удалось."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        if self.message_id is None or len(escaped_text) > self.MAX_MESSAGE_LENGTH:
+            return False
+        try:
+            await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self.message_id, text=escaped_text, parse_mode="MarkdownV2")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not replace status message with summary: {e}")
+            return False
+
 class TelegramBot:
     def __init__(self):
         self.config = BotConfig()
         self.user_sessions: defaultdict[int, UserSession] = defaultdict(UserSession)
         self.analyzer_config = AnalyzerConfig()
-        if self.analyzer_config.type == "mistral":
-            self.analyzer:DocumentsAnalyzer = MistralAnalyzer()
-        elif self.analyzer_config.type == "ollama":
-            self.analyzer:DocumentsAnalyzer = LocalLLMAnalyzer()
+        self.jobs_config = JobsConfig()
+        self.analyzer: Optional[DocumentsAnalyzer] = None
+        self.job_queue: Optional[JobQueue] = None
+        self._delivery_task: Optional[asyncio.Task] = None
+        # Key: id задания в очереди, Value: статусное сообщение задания
+        self._status_messages: dict[int, StatusMessage] = {}
+        if self.jobs_config.mode == "queue":
+            # Анализ выполняют процессы worker.py, бот только ставит задания и доставляет результаты
+            self.job_queue = JobQueue(self.jobs_config.queue_path, max_attempts=self.jobs_config.max_attempts)
         else:
-            raise ValueError(f"Неизвестный тип анализатора: {self.analyzer_config.type}")
+            self.analyzer = create_analyzer(self.analyzer_config.type)
+
+        self.scheduler_config = SchedulerConfig()
+        self.scheduler = JobScheduler(
+            workers=self.scheduler_config.workers,
+            max_queue=self.scheduler_config.max_queue,
+            max_per_user=self.scheduler_config.max_per_user
+        )
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Отправляет приветственное сообщение при вызове команды /start."""
         await update.message.reply_text("Привет! Отправьте мне документы для суммаризации.")
 
-    async def summarize_files(self, file_info_list: list[DocumentInfo], context: ContextTypes.DEFAULT_TYPE) -> tuple[str, str]:
-        """Заглушка для суммаризации нескольких документов. Будет заменена на реальную суммаризацию."""
-        downloaded_file_paths = []
-        temp_dirs = [] # Keep track of temporary directories
-        result_summary = ""
+    async def summarize_files(self, file_info_list: list[DocumentInfo], context: ContextTypes.DEFAULT_TYPE,
+                              progress: Optional[ProgressTracker] = None) -> tuple[str, str]:
+        """
+        Скачивает документы и выполняет их анализ. Возвращает сводку и время анализа.
+
+        Файлы скачиваются в память параллельно, анализ каждого файла начинается сразу после его скачивания.
+        """
+        progress_token = current_progress.set(progress)
+        download_errors: list[str] = []
+        download_semaphore = asyncio.Semaphore(max(1, self.config.download_concurrency))
         start_time = time.time()
 
+        async def download(doc_info: DocumentInfo) -> Optional[DocumentSource]:
+            async with download_semaphore:
+                data = await self._download_bytes(doc_info, context)
+            if data is None:
+                download_errors.append(doc_info.file_name)
+                return None
+            return DocumentSource(name=doc_info.file_name, data=data)
+
         try:
-            for doc_info in file_info_list:
-                try:
-                    file_object = await context.bot.get_file(doc_info.file_id)
-                    # Create a temporary directory that won't be automatically deleted
-                    tmpdir = tempfile.mkdtemp()
-                    temp_dirs.append(tmpdir)
-                    temp_file_path = pathlib.Path(tmpdir) / doc_info.file_name
-                    await file_object.download_to_drive(custom_path=temp_file_path)
-                    logger.info(f"Downloaded file {doc_info.file_name} to {temp_file_path}")
-                    downloaded_file_paths.append(str(temp_file_path))
-                except Exception as e:
-                    logger.error(f"Error downloading file {doc_info.file_name} (ID: {doc_info.file_id}): {e}")
-                    # Если файл не скачался, добавляем его в список ошибок и продолжаем
-                    pass
-
-            if downloaded_file_paths:
-                analyze_result = self.analyzer.analyze(downloaded_file_paths)
-                if analyze_result.file_errors:
-                    if analyze_result.summary:
-                        error_files_str = ", ".join(analyze_result.file_errors)
-                        result_summary = f"Частичная суммаризация. Ошибки при обработке файлов: {error_files_str}.\n\n{analyze_result.summary}"
-                    else:
-                        error_files_str = ", ".join(analyze_result.file_errors)
-                        result_summary = f"Ошибки при обработке файлов: {error_files_str}."
-                else:
-                    result_summary = analyze_result.summary
-            else:
+            with metrics.span("analyze", analyzer=self.analyzer.analyzer_type):
+                analyze_result = await self.analyzer.analyze_async([download(doc_info) for doc_info in file_info_list])
+            if len(download_errors) == len(file_info_list):
                 result_summary = "Не удалось скачать ни один файл для суммаризации."
+            else:
+                result_summary = self._format_result(analyze_result.summary, download_errors + (analyze_result.file_errors or []),
+                                                     analyze_result.duplicate_files)
         finally:
-            # Clean up all created temporary directories
-            for tmpdir in temp_dirs:
-                try:
-                    shutil.rmtree(tmpdir)
-                    logger.info(f"Cleaned up temporary directory: {tmpdir}")
-                except OSError as e:
-                    logger.error(f"Error removing temporary directory {tmpdir}: {e}")
+            current_progress.reset(progress_token)
 
         end_time = time.time()
         duration = end_time - start_time
+        metrics.observe("job_duration_seconds", duration, {"mode": "inprocess"})
+        metrics.inc("job_files_total", len(file_info_list))
         duration_string = f"{duration:.2f} секунд"
 
         return result_summary, duration_string
 
+    async def _download_bytes(self, doc_info: DocumentInfo, context: ContextTypes.DEFAULT_TYPE) -> Optional[bytes]:
+        """Скачивает файл в память. Возвращает содержимое или None при ошибке."""
+        try:
+            with metrics.span("download"):
+                file_object = await context.bot.get_file(doc_info.file_id)
+                data = bytes(await file_object.download_as_bytearray())
+            logger.info(f"Downloaded file {doc_info.file_name} ({len(data)} bytes)")
+            return data
+        except Exception as e:
+            logger.error(f"Error downloading file {doc_info.file_name} (ID: {doc_info.file_id}): {e}")
+            return None
+
+    async def _download_file(self, doc_info: DocumentInfo, context: ContextTypes.DEFAULT_TYPE, directory: str) -> Optional[str]:
+        """Скачивает файл в указанную директорию. Возвращает путь или None при ошибке."""
+        try:
+            file_object = await context.bot.get_file(doc_info.file_id)
+            file_path = pathlib.Path(directory) / doc_info.file_name
+            await file_object.download_to_drive(custom_path=file_path)
+            logger.info(f"Downloaded file {doc_info.file_name} to {file_path}")
+            return str(file_path)
+        except Exception as e:
+            logger.error(f"Error downloading file {doc_info.file_name} (ID: {doc_info.file_id}): {e}")
+            # Если файл не скачался, добавляем его в список ошибок и продолжаем
+            return None
+
+    @staticmethod
+    def _format_result(summary: Optional[str], file_errors: Optional[list[str]], duplicate_files: Optional[list[str]] = None) -> str:
+        if summary and duplicate_files:
+            summary = f"Файлы-повторы учтены один раз: {', '.join(duplicate_files)}.\n\n{summary}"
+        if file_errors:
+            error_files_str = ", ".join(file_errors)
+            if summary:
+                return f"Частичная суммаризация. Ошибки при обработке файлов: {error_files_str}.\n\n{summary}"
+            return f"Ошибки при обработке файлов: {error_files_str}."
+        return summary
+
+    async def _send_summary(self, bot: Bot, chat_id: int, summary: Optional[str], duration_string: Optional[str],
+                            status: Optional[StatusMessage] = None) -> None:
+        if summary:
+            escaped_text = telegramify_markdown.markdownify(summary)
+            if status is None or not await status.finish(escaped_text):
+                await bot.send_message(chat_id=chat_id, text=escaped_text, parse_mode="MarkdownV2")
+            await bot.send_message(chat_id=chat_id, text=f"Время анализа: {duration_string}")
+        else:
+            failure_text = "Не удалось обработать документ. Пожалуйста, попробуйте еще раз."
+            if status is None or not await status.finish(telegramify_markdown.markdownify(failure_text)):
+                await bot.send_message(chat_id=chat_id, text=failure_text)
+
+    def _new_status(self, bot: Bot, chat_id: int) -> StatusMessage:
+        return StatusMessage(bot, chat_id, self.config.progress_edit_interval)
+
     async def process_media_group(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, media_group_id: str, chat_id: int) -> None:
         """Обрабатывает медиа-группу после получения всех документов для конкретного пользователя."""
         logger.info(f"Processing media group: {media_group_id} for user: {user_id}")
         user_session = self.user_sessions[user_id]
         files_to_summarize = user_session.media_group_documents.pop(media_group_id, [])
         
-        if files_to_summarize:
-            summary, duration_string = await self.summarize_files(files_to_summarize, context)
-            if summary:
-                escaped_text = telegramify_markdown.markdownify(summary)
-                await context.bot.send_message(chat_id=chat_id, text=escaped_text, parse_mode="MarkdownV2")
-                await context.bot.send_message(chat_id=chat_id, text=f"Время анализа: {duration_string}")
-            else:
-                await context.bot.send_message(chat_id=chat_id, text="Не удалось обработать документ. Пожалуйста, попробуйте еще раз.")
-        
         # Clear the timer for this media group for this user
         if media_group_id in user_session.media_group_timers:
             user_session.media_group_timers.pop(media_group_id).cancel()
 
+        if files_to_summarize:
+            await self.process_documents(context, user_id, chat_id, self._unique_documents(files_to_summarize))
+
+    @staticmethod
+    def _unique_documents(file_info_list: list[DocumentInfo]) -> list[DocumentInfo]:
+        """Документы медиа-группы без повторов одного и того же файла Telegram"""
+        unique: dict[str, DocumentInfo] = {}
+        for doc_info in file_info_list:
+            key = doc_info.file_unique_id or doc_info.file_id
+            if key in unique:
+                logger.info(f"Skipping duplicate document in media group: {doc_info.file_name}")
+                continue
+            unique[key] = doc_info
+        return list(unique.values())
+
+    async def process_documents(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, chat_id: int, file_info_list: list[DocumentInfo]) -> None:
+        """Ставит документы в очередь на анализ и отправляет результат пользователю."""
+        if self.job_queue is not None:
+            await self.enqueue_documents(context, user_id, chat_id, file_info_list)
+            return
+
+        status = self._new_status(context.bot, chat_id)
+        progress = ProgressTracker(on_update=lambda analyze_progress: status.update(analyze_progress.render()))
+        try:
+            position, result_future = self.scheduler.submit(user_id, lambda: self.summarize_files(file_info_list, context, progress))
+        except QueueFullError as e:
+            logger.warning(f"Queue is full for user {user_id}: {e}")
+            await context.bot.send_message(chat_id=chat_id, text="Сейчас слишком много заданий в очереди. Пожалуйста, дождитесь результатов и попробуйте позже.")
+            return
+
+        file_names = ", ".join(doc_info.file_name for doc_info in file_info_list)
+        if position <= self.scheduler.idle_workers():
+            await status.send(f"Обрабатываю ваш документ: {file_names}...")
+        else:
+            await status.send(f"Документ {file_names} поставлен в очередь, позиция {position}.")
+
+        try:
+            summary, duration_string = await result_future
+        except Exception:
+            summary, duration_string = None, None
+
+        await self._send_summary(context.bot, chat_id, summary, duration_string, status)
+
+    async def enqueue_documents(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, chat_id: int, file_info_list: list[DocumentInfo]) -> None:
+        """Скачивает документы на общий том и ставит задание в долговременную очередь для worker.py."""
+        queue_full = (
+            await asyncio.to_thread(self.job_queue.count_queued) >= self.scheduler_config.max_queue
+            or await asyncio.to_thread(self.job_queue.count_queued, user_id) >= self.scheduler_config.max_per_user
+        )
+        if queue_full:
+            await context.bot.send_message(chat_id=chat_id, text="Сейчас слишком много заданий в очереди. Пожалуйста, дождитесь результатов и попробуйте позже.")
+            return
+
+        job_dir = os.path.join(self.jobs_config.files_dir, uuid.uuid4().hex)
+        download_semaphore = asyncio.Semaphore(max(1, self.config.download_concurrency))
+
+        async def download(i: int, doc_info: DocumentInfo) -> Optional[QueuedFile]:
+            # Отдельная поддиректория на файл: имена файлов в медиа-группе могут совпадать
+            file_dir = os.path.join(job_dir, str(i))
+            os.makedirs(file_dir, exist_ok=True)
+            async with download_semaphore:
+                file_path = await self._download_file(doc_info, context, file_dir)
+            if file_path:
+                return QueuedFile(file_name=doc_info.file_name, path=os.path.abspath(file_path))
+            return None
+
+        downloaded = await asyncio.gather(*(download(i, doc_info) for i, doc_info in enumerate(file_info_list)))
+        queued_files = [file for file in downloaded if file is not None]
+
+        if not queued_files:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            await context.bot.send_message(chat_id=chat_id, text="Не удалось скачать ни один файл для суммаризации.")
+            return
+
+        job_id = await asyncio.to_thread(self.job_queue.enqueue, user_id, chat_id, queued_files)
+        position = await asyncio.to_thread(self.job_queue.position, job_id)
+        file_names = ", ".join(file.file_name for file in queued_files)
+        status = self._new_status(context.bot, chat_id)
+        await status.send(f"Документ {file_names} поставлен в очередь, позиция {position}.")
+        self._status_messages[job_id] = status
+
+    async def _deliver_results(self, application: Application) -> None:
+        """Доставка пользователям результатов, которые записали в очередь процессы worker.py."""
+        while True:
+            try:
+                metrics.set_gauge("job_queue_depth", await asyncio.to_thread(self.job_queue.count_queued))
+                job_progress = await asyncio.to_thread(self.job_queue.fetch_progress, list(self._status_messages))
+                for job_id, progress_json in job_progress.items():
+                    self._status_messages[job_id].update(AnalyzeProgress.model_validate_json(progress_json).render())
+
+                for job in await asyncio.to_thread(self.job_queue.fetch_finished):
+                    status = self._status_messages.pop(job.id, None)
+                    if job.status == "done":
+                        summary = self._format_result(job.summary, job.file_errors, job.duplicate_files)
+                        await self._send_summary(application.bot, job.chat_id, summary, f"{job.duration or 0:.2f} секунд", status)
+                    else:
+                        logger.error(f"❌ Задание {job.id} завершилось ошибкой: {job.error}")
+                        await self._send_summary(application.bot, job.chat_id, None, None, status)
+                    await asyncio.to_thread(self.job_queue.mark_delivered, job.id)
+                    job_dirs = {os.path.dirname(os.path.dirname(file.path)) for file in job.files}
+                    for job_dir in job_dirs:
+                        shutil.rmtree(job_dir, ignore_errors=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка при доставке результатов из очереди: {e}")
+            await asyncio.sleep(self.jobs_config.poll_interval)
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обрабатывает входящие сообщения, проверяя наличие документов для суммаризации."""
         if not update.effective_user or not update.effective_user.id:
@@ -138,7 +346,8 @@ class TelegramBot:
             file_name = update.message.document.file_name
             chat_id = update.message.chat_id
 
-            doc_info = DocumentInfo(file_id=file_id, file_name=file_name, chat_id=chat_id)
+            doc_info = DocumentInfo(file_id=file_id, file_name=file_name, chat_id=chat_id,
+                                    file_unique_id=update.message.document.file_unique_id)
 
             if update.message.media_group_id:
                 media_group_id = update.message.media_group_id
@@ -161,17 +370,27 @@ class TelegramBot:
             else:
                 # Single document, process immediately
                 logger.info(f"Получен одиночный документ: {file_name} (ID: {file_id}), Пользователь: {user_id}")
-                await update.message.reply_text(f"Обрабатываю ваш документ: {file_name}...")
-                summary, duration_string = await self.summarize_files([doc_info], context)
-                if summary:
-                    escaped_text = telegramify_markdown.markdownify(summary)
-                    await context.bot.send_message(chat_id=chat_id, text=escaped_text, parse_mode="MarkdownV2")
-                    await context.bot.send_message(chat_id=chat_id, text=f"Время анализа: {duration_string}")
-                else:
-                    await update.message.reply_text("Не удалось обработать документ. Пожалуйста, попробуйте еще раз.")
+                await self.process_documents(context, user_id, chat_id, [doc_info])
         else:
             await update.message.reply_text("Я обрабатываю только документы. Пожалуйста, отправьте мне файл!")
 
+    async def _post_init(self, application: Application) -> None:
+        metrics_config = MetricsConfig()
+        if metrics_config.enabled:
+            start_metrics_server(metrics_config.host, metrics_config.port)
+        if self.job_queue is not None:
+            self._delivery_task = asyncio.create_task(self._deliver_results(application))
+        else:
+            self.scheduler.start()
+
+    async def _post_shutdown(self, application: Application) -> None:
+        if self._delivery_task is not None:
+            self._delivery_task.cancel()
+        await self.scheduler.stop()
+        await background_tasks.drain()
+        if self.analyzer is not None:
+            await asyncio.to_thread(self.analyzer.close)
+
     def run_bot(self) -> None:
         """Запускает бота."""
         try:
@@ -181,7 +400,15 @@ class TelegramBot:
             logger.error("Убедитесь, что переменная окружения BOT_TOKEN установлена в файле .env")
             return
 
-        application = Application.builder().token(bot_config.bot_token).build()
+        # Обработчики выполняются конкурентно: анализ одного пакета не блокирует остальные обновления
+        application = (
+            Application.builder()
+            .token(bot_config.bot_token)
+            .concurrent_updates(True)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
 
         # Register handlers
         application.add_handler(CommandHandler("start", self.start))
@@ -193,6 +420,10 @@ class TelegramBot:
 
 def main():
     """Главная точка входа для запуска бота."""
+    # Настройка окружения и логов - только при запуске: процессы пула docling (spawn) заново импортируют этот модуль
+    load_dotenv()
+    logger.add("logs/bot.log", rotation="500 MB", compression="zip", level="INFO")
+    logger.add("logs/bot_debug.log", level="DEBUG")
     TelegramBot().run_bot()
 
 if __name__ == "__main__":
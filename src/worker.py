@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from dotenv import load_dotenv
+from loguru import logger
+from config import AnalyzerConfig, JobsConfig, MetricsConfig
+from documents_analyzer import DocumentsAnalyzer, create_analyzer
+from jobs.job_queue import JobCheckpoint, JobQueue, QueuedJob, current_checkpoint
+from progress import ProgressTracker, current_progress
+from metrics import metrics, start_metrics_server
+
+async def _heartbeat(queue: JobQueue, job: QueuedJob, worker_id: str, config: JobsConfig) -> None:
+    """Продление аренды задания, пока оно выполняется"""
+    while True:
+        await asyncio.sleep(config.lease_seconds / 3)
+        await asyncio.to_thread(queue.heartbeat, job.id, worker_id, config.lease_seconds)
+
+async def _process_job(analyzer: DocumentsAnalyzer, queue: JobQueue, job: QueuedJob, worker_id: str, config: JobsConfig) -> None:
+    logger.info(f"Worker {worker_id}: job {job.id} started (attempt {job.attempts})")
+    start_time = time.time()
+    current_checkpoint.set(JobCheckpoint(queue, job.id))
+    loop = asyncio.get_running_loop()
+    # Прогресс пишется в очередь, бот показывает его пользователю
+    current_progress.set(ProgressTracker(
+        on_update=lambda progress: loop.run_in_executor(None, queue.set_progress, job.id, progress.model_dump_json()),
+        min_interval=config.poll_interval
+    ))
+    heartbeat = asyncio.create_task(_heartbeat(queue, job, worker_id, config))
+    try:
+        with metrics.span("analyze", analyzer=analyzer.analyzer_type):
+            analyze_result = await analyzer.analyze_async([file.path for file in job.files])
+        # Ошибки отдаем по именам файлов, как их видел пользователь
+        file_names = {file.path: file.file_name for file in job.files}
+        file_errors = [file_names.get(path, os.path.basename(path)) for path in analyze_result.file_errors or []]
+        duplicate_files = [file_names.get(path, os.path.basename(path)) for path in analyze_result.duplicate_files or []]
+        if not await asyncio.to_thread(queue.complete, job.id, worker_id, analyze_result.summary, file_errors,
+                                       time.time() - start_time, duplicate_files):
+            logger.warning(f"Worker {worker_id}: job {job.id} is no longer leased by this worker, result discarded")
+            return
+        metrics.observe("job_duration_seconds", time.time() - start_time, {"mode": "queue"})
+        metrics.inc("job_files_total", len(job.files))
+        logger.info(f"Worker {worker_id}: job {job.id} done in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.error(f"❌ Worker {worker_id}: ошибка при выполнении задания {job.id}: {e}")
+        metrics.inc("job_failures_total")
+        if not await asyncio.to_thread(queue.fail, job.id, worker_id, str(e)):
+            logger.warning(f"Worker {worker_id}: job {job.id} is no longer leased by this worker, failure not recorded")
+    finally:
+        heartbeat.cancel()
+
+async def _worker_loop(worker_id: str) -> None:
+    config = JobsConfig()
+    queue = JobQueue(config.queue_path, max_attempts=config.max_attempts)
+    analyzer = create_analyzer(AnalyzerConfig().type)
+    logger.info(f"Worker {worker_id} started, queue: {config.queue_path}")
+    try:
+        while True:
+            job = await asyncio.to_thread(queue.claim, worker_id, config.lease_seconds)
+            if job is None:
+                await asyncio.sleep(config.poll_interval)
+                continue
+            # Отдельная задача - отдельный контекст для контрольных точек задания
+            await asyncio.create_task(_process_job(analyzer, queue, job, worker_id, config))
+    finally:
+        analyzer.close()
+
+def run_worker(worker_index: int) -> None:
+    """Точка входа процесса-исполнителя"""
+    logger.add("logs/worker.log", rotation="500 MB", compression="zip", level="INFO")
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{worker_index}"
+    metrics_config = MetricsConfig()
+    if metrics_config.enabled:
+        # Порт бота - metrics_config.port, у каждого процесса-исполнителя свой
+        start_metrics_server(metrics_config.host, metrics_config.port + 1 + worker_index)
+    try:
+        asyncio.run(_worker_loop(worker_id))
+    except KeyboardInterrupt:
+        logger.info(f"Worker {worker_id} stopped")
+
+def main():
+    """Запуск процессов-исполнителей заданий из очереди."""
+    # Окружение загружается только при запуске, не при импорте модуля процессами пулов
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="LLMTenderBot worker")
+    parser.add_argument("--processes", type=int, default=JobsConfig().worker_processes, help="Количество процессов-исполнителей")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(0)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, args=(i,), daemon=False) for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from queries import FIELD_GROUPS
+from retrieval.bm25_index import BM25Index, tokenize
+
+CHUNKS = [
+    "Извещение о проведении закупки",
+    "Начальная максимальная цена договора (НМЦ) с учетом НДС. Условия оплаты: аванс 30%.",
+    "Срок подачи заявок до 10.02.2025. Подведение итогов и рассмотрение заявок.",
+    "Срок поставки 30 календарных дней. Место поставки: склад грузополучателя.",
+    "Прочие сведения без ключевых слов",
+]
+
+def test_tokenize_normalizes_and_stems():
+    # Однобуквенные токены отбрасываются, кроме чисел
+    assert tokenize("Ёлочные ИГРУШКИ, 5 шт. и т.д.") == ["елочны", "игрушк", "5", "шт"]
+
+def test_score_ranks_chunks_with_query_terms():
+    index = BM25Index(CHUNKS)
+    scores = index.score("условия оплаты аванс")
+    assert max(range(len(CHUNKS)), key=scores.__getitem__) == 1
+    assert scores[4] == 0
+
+def test_unknown_field_and_empty_index_score_zero():
+    assert BM25Index(CHUNKS).field_scores("unknown_field") == [0.0] * len(CHUNKS)
+    assert BM25Index([]).score("оплата") == []
+    assert BM25Index([]).route(top_k=2) == {}
+
+def test_route_sends_chunks_to_matching_groups():
+    routes = BM25Index(CHUNKS).route(top_k=1)
+    # Шапка извещения уходит во все группы
+    assert routes[0] == set(FIELD_GROUPS)
+    assert "prices" in routes[1]
+    assert "dates" in routes[2]
+    assert "delivery" in routes[3]
+    assert 4 not in routes
+
+def test_route_respects_top_k():
+    index = BM25Index(CHUNKS)
+    for group_name in FIELD_GROUPS:
+        routed = [i for i, groups in index.route(top_k=1).items() if group_name in groups and i != 0]
+        assert len(routed) <= 1
+    assert index.route(top_k=1, groups={"prices": FIELD_GROUPS["prices"]}) == {0: {"prices"}, 1: {"prices"}}
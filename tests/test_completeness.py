@@ -0,0 +1,21 @@
+from merging.completeness import CompletenessTracker
+from queries import ContactPerson, LotInfo, TenderData
+
+def test_scalar_field_is_filled_after_enough_agreeing_votes():
+    tracker = CompletenessTracker(confidence_threshold=0.6, min_votes=2)
+    tracker.update(TenderData(notice_number="№ 123"))
+    assert "notice_number" in tracker.remaining_fields()
+    tracker.update(TenderData(notice_number="№ 123"))
+    assert tracker.is_filled("notice_number")
+
+def test_disagreeing_votes_keep_field_open():
+    tracker = CompletenessTracker(confidence_threshold=0.6, min_votes=1)
+    tracker.update(TenderData(notice_number="123"))
+    tracker.update(TenderData(notice_number="456"))
+    assert not tracker.is_filled("notice_number")
+
+def test_list_fields_are_never_filled():
+    tracker = CompletenessTracker(confidence_threshold=0.6, min_votes=1)
+    tracker.update(TenderData(lots=[LotInfo()], contact_persons=[ContactPerson()]))
+    assert {"lots", "contact_persons"} <= tracker.remaining_fields()
+    assert not tracker.is_complete()
@@ -0,0 +1,77 @@
+import pytest
+from cache import disk_cache
+from cache.disk_cache import DiskCache, normalized_text_sha256
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(disk_cache.time, "time", clock)
+    return clock
+
+def make_cache(tmp_path, namespace: str = "results", ttl_seconds: int = 60, max_size_bytes: int = 1000) -> DiskCache:
+    return DiskCache(str(tmp_path / "cache" / "cache.sqlite"), namespace, ttl_seconds, max_size_bytes)
+
+def test_get_and_set(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    cache.set("key", "other")
+    assert cache.get("key") == "other"
+
+def test_entry_expires_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.set("key", "value")
+    clock.now += 60
+    assert cache.get("key") == "value"
+    clock.now += 1
+    assert cache.get("key") is None
+
+def test_access_does_not_extend_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.set("key", "value")
+    clock.now += 50
+    assert cache.get("key") == "value"
+    clock.now += 20
+    assert cache.get("key") is None
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_size_bytes=10)
+    cache.set("a", "aaaa")
+    clock.now += 1
+    cache.set("b", "bbbb")
+    clock.now += 1
+    assert cache.get("a") == "aaaa"
+    clock.now += 1
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+
+def test_value_larger_than_limit_is_not_stored(tmp_path, clock):
+    cache = make_cache(tmp_path, max_size_bytes=10)
+    cache.set("small", "value")
+    cache.set("big", "x" * 11)
+    assert cache.get("big") is None
+    assert cache.get("small") == "value"
+
+def test_namespaces_are_isolated(tmp_path, clock):
+    results = make_cache(tmp_path, namespace="results", max_size_bytes=10)
+    ocr = make_cache(tmp_path, namespace="ocr", max_size_bytes=10)
+    results.set("key", "results")
+    ocr.set("key", "ocr")
+    # Вытеснение считает размер только своего пространства имен
+    ocr.set("other", "ocr")
+    assert results.get("key") == "results"
+    assert ocr.get("key") == "ocr"
+
+def test_normalized_text_sha256_ignores_whitespace():
+    assert normalized_text_sha256("Лот  1\n\tпоставка ") == normalized_text_sha256("Лот 1 поставка")
+    assert normalized_text_sha256("Лот 1") != normalized_text_sha256("Лот 2")
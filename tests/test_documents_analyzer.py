@@ -0,0 +1,79 @@
+import asyncio
+import io
+import zipfile
+import pytest
+from documents_analyzer import DocumentsAnalyzer
+from progress import ProgressTracker, current_progress
+from sources.document_source import DocumentSource
+
+class EchoAnalyzer(DocumentsAnalyzer):
+    """Анализатор без LLM: результат документа - его содержимое"""
+    analyzer_type = "echo"
+    model = "echo"
+    supported_extensions = {".txt"}
+
+    def __init__(self):
+        super().__init__()
+        self.result_cache = None
+        self.analyzed: list[str] = []
+
+    async def analyze_async(self, file_paths):
+        raise NotImplementedError
+
+    async def _analyze_file(self, source: DocumentSource) -> bytes:
+        self.analyzed.append(source.name)
+        await asyncio.sleep(0.01)
+        if source.data == b"error":
+            raise ValueError("broken document")
+        return source.data
+
+@pytest.fixture
+def analyzer(monkeypatch, tmp_path) -> EchoAnalyzer:
+    monkeypatch.setenv("CACHE_ENABLED", "false")
+    monkeypatch.chdir(tmp_path)
+    return EchoAnalyzer()
+
+def zip_bytes(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+async def download(name: str, data, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return DocumentSource(name=name, data=data) if data is not None else None
+
+def test_map_files_expands_archives_and_keeps_order(analyzer):
+    inputs = [
+        download("a.txt", b"a", delay=0.02),
+        download("pack.zip", zip_bytes({"1.txt": b"one", "skip.exe": b"x", "nested.zip": zip_bytes({"2.txt": b"two"})})),
+        download("missing.txt", None),
+        download("broken.zip", b"not a zip"),
+    ]
+    results, failed_archives, duplicates = asyncio.run(analyzer._map_files(inputs, analyzer._analyze_file))
+    assert [(source.name, result) for source, result in results] == [
+        ("a.txt", b"a"), ("pack.zip/1.txt", b"one"), ("pack.zip/nested.zip/2.txt", b"two")
+    ]
+    assert failed_archives == ["broken.zip"]
+    assert duplicates == []
+
+def test_map_files_returns_exceptions_in_place(analyzer):
+    results, _, _ = asyncio.run(analyzer._map_files([download("bad.txt", b"error"), download("ok.txt", b"ok")], analyzer._analyze_file))
+    assert isinstance(results[0][1], ValueError)
+    assert results[1][1] == b"ok"
+
+def test_map_files_analyzes_identical_documents_once(analyzer):
+    progress = ProgressTracker()
+
+    async def run():
+        current_progress.set(progress)
+        inputs = [download("a.txt", b"same"), download("copy.txt", b"same", delay=0.001), download("b.txt", b"other")]
+        return await analyzer._map_files(inputs, analyzer._analyze_file)
+
+    results, _, duplicates = asyncio.run(run())
+    # Повтор не дает второго голоса при объединении результатов
+    assert [source.name for source, _ in results] == ["a.txt", "b.txt"]
+    assert [source.name for source in duplicates] == ["copy.txt"]
+    assert sorted(analyzer.analyzed) == ["a.txt", "b.txt"]
+    assert (progress.progress.files_done, progress.progress.files_total) == (3, 3)
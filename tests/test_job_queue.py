@@ -0,0 +1,120 @@
+import time
+import pytest
+from jobs.job_queue import JobCheckpoint, JobQueue, QueuedFile
+
+@pytest.fixture
+def queue(tmp_path) -> JobQueue:
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+
+def enqueue(queue: JobQueue, user_id: int = 1) -> int:
+    return queue.enqueue(user_id, user_id * 10, [QueuedFile(file_name="a.docx", path="/tmp/a.docx")])
+
+def expire_lease(queue: JobQueue, job_id: int) -> None:
+    with queue._connect() as connection:
+        connection.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+def test_claim_returns_running_job(queue):
+    job_id = enqueue(queue)
+    job = queue.claim("w1", lease_seconds=60)
+    assert job.id == job_id
+    assert job.status == "running"
+    assert job.attempts == 1
+    assert job.files[0].file_name == "a.docx"
+    assert queue.claim("w2", lease_seconds=60) is None
+
+def test_position(queue):
+    first, second = enqueue(queue), enqueue(queue, user_id=2)
+    assert queue.position(first) == 1
+    assert queue.position(second) == 2
+    queue.claim("w1", lease_seconds=60)
+    assert queue.position(first) == 0
+    assert queue.position(second) == 1
+
+def test_position_matches_claim_order(queue):
+    a0 = enqueue(queue, 1)
+    queue.claim("w0", lease_seconds=60)
+    a1, a2, b1, c1 = enqueue(queue, 1), enqueue(queue, 1), enqueue(queue, 2), enqueue(queue, 3)
+    positions = {job_id: queue.position(job_id) for job_id in (a1, a2, b1, c1)}
+    # У пользователя 1 задание уже в работе - задания пользователей 2 и 3 идут раньше
+    assert positions == {b1: 1, c1: 2, a1: 3, a2: 4}
+    claimed = [queue.claim(f"w{i}", lease_seconds=60).id for i in range(1, 5)]
+    assert claimed == sorted(positions, key=positions.get)
+    assert queue.position(a0) == 0
+
+def test_count_queued_excludes_running_jobs(queue):
+    enqueue(queue, 1), enqueue(queue, 1), enqueue(queue, 2)
+    queue.claim("w1", lease_seconds=60)
+    assert queue.count_queued() == 2
+    assert queue.count_queued(1) == 1
+    assert queue.count_queued(2) == 1
+
+def test_claim_prefers_user_with_fewer_running_jobs(queue):
+    a1, a2, b1 = enqueue(queue, 1), enqueue(queue, 1), enqueue(queue, 2)
+    assert queue.claim("w1", lease_seconds=60).id == a1
+    assert queue.claim("w2", lease_seconds=60).id == b1
+    assert queue.claim("w3", lease_seconds=60).id == a2
+
+def test_complete_and_deliver(queue):
+    job_id = enqueue(queue)
+    queue.claim("w1", lease_seconds=60)
+    JobCheckpoint(queue, job_id).set("chunk", "{}")
+    assert queue.complete(job_id, "w1", "summary", ["b.pdf"], 1.5)
+    assert queue.get_checkpoint(job_id, "chunk") is None
+    [finished] = queue.fetch_finished()
+    assert (finished.status, finished.summary, finished.file_errors, finished.duration) == ("done", "summary", ["b.pdf"], 1.5)
+    queue.mark_delivered(job_id)
+    assert queue.fetch_finished() == []
+
+def test_fail_requeues_until_attempts_exhausted(queue):
+    job_id = enqueue(queue)
+    queue.claim("w1", lease_seconds=60)
+    assert queue.fail(job_id, "w1", "boom")
+    assert queue.position(job_id) == 1
+    queue.claim("w1", lease_seconds=60)
+    assert queue.fail(job_id, "w1", "boom")
+    [failed] = queue.fetch_finished()
+    assert (failed.status, failed.error) == ("failed", "boom")
+
+def test_expired_lease_is_reclaimed_and_old_worker_loses_ownership(queue):
+    job_id = enqueue(queue)
+    queue.claim("w1", lease_seconds=60)
+    expire_lease(queue, job_id)
+    job = queue.claim("w2", lease_seconds=60)
+    assert job.id == job_id and job.attempts == 2
+    # Первый исполнитель не может ни завершить, ни вернуть в очередь чужое задание
+    assert not queue.complete(job_id, "w1", "stale", [], 1.0)
+    assert not queue.fail(job_id, "w1", "stale")
+    queue.heartbeat(job_id, "w1", lease_seconds=600)
+    assert queue.complete(job_id, "w2", "fresh", [], 1.0)
+    assert queue.fetch_finished()[0].summary == "fresh"
+
+def test_fail_does_not_touch_finished_jobs(queue):
+    job_id = enqueue(queue)
+    queue.claim("w1", lease_seconds=60)
+    queue.complete(job_id, "w1", "summary", [], 1.0)
+    assert not queue.fail(job_id, "w1", "late")
+    queue.mark_delivered(job_id)
+    assert not queue.fail(job_id, "w1", "late")
+    assert queue.claim("w1", lease_seconds=60) is None
+
+def test_expired_lease_with_exhausted_attempts_fails(queue):
+    job_id = enqueue(queue)
+    for worker_id in ("w1", "w2"):
+        queue.claim(worker_id, lease_seconds=60)
+        expire_lease(queue, job_id)
+    assert queue.claim("w3", lease_seconds=60) is None
+    [failed] = queue.fetch_finished()
+    assert failed.id == job_id and failed.status == "failed"
+
+def test_progress_only_for_running_jobs(queue):
+    job_id = enqueue(queue)
+    queue.set_progress(job_id, '{"files_done": 0}')
+    assert queue.fetch_progress([job_id]) == {}
+    queue.claim("w1", lease_seconds=60)
+    assert queue.fetch_progress([job_id]) == {job_id: '{"files_done": 0}'}
+
+def test_complete_stores_duplicate_files(queue):
+    job_id = enqueue(queue)
+    queue.claim("w1", lease_seconds=60)
+    assert queue.complete(job_id, "w1", "summary", [], 1.0, ["copy.docx"])
+    assert queue.fetch_finished()[0].duplicate_files == ["copy.docx"]
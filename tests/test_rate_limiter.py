@@ -0,0 +1,125 @@
+import asyncio
+import time
+from email.utils import formatdate
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from llm.rate_limiter import AdaptiveRateLimiter, TokenBucket, _parse_retry_after
+
+class StatusError(Exception):
+    """Ошибка с кодом ответа, как у исключений SDK Mistral"""
+
+    def __init__(self, status_code: int, retry_after: str = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": retry_after} if retry_after is not None else {}
+        self.raw_response = httpx.Response(status_code, headers=headers)
+
+def failing(errors: list[Exception], result: str = "ok"):
+    """Запрос, который сначала выбрасывает ошибки из errors, затем возвращает result"""
+    calls = []
+
+    async def func() -> str:
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return func, calls
+
+def test_429_halves_limit_and_waits_retry_after():
+    limiter = AdaptiveRateLimiter("test", max_concurrency=8, max_retries=1, retry_base_delay=0)
+    func, calls = failing([StatusError(429, retry_after="0.2")])
+
+    assert asyncio.run(limiter.call(func)) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    # 8 / 2 после 429, затем +1/limit после успешного повтора
+    assert limiter.limit == pytest.approx(4 + 1 / 4)
+    assert limiter.in_flight == 0
+
+def test_limit_does_not_drop_below_min_concurrency():
+    limiter = AdaptiveRateLimiter("test", max_concurrency=4, min_concurrency=2, max_retries=3, retry_base_delay=0)
+    func, _ = failing([StatusError(429)] * 4)
+
+    with pytest.raises(StatusError):
+        asyncio.run(limiter.call(func))
+    assert limiter.limit == 2
+
+def test_additive_increase_is_capped_by_max_concurrency():
+    limiter = AdaptiveRateLimiter("test", max_concurrency=2)
+    limiter.limit = 1.0
+    func, _ = failing([])
+
+    async def run():
+        for _ in range(5):
+            await limiter.call(func)
+
+    asyncio.run(run())
+    assert limiter.limit == 2
+
+def test_client_error_is_not_retried():
+    limiter = AdaptiveRateLimiter("test", max_concurrency=8, max_retries=3, retry_base_delay=0)
+    func, calls = failing([StatusError(400)])
+
+    with pytest.raises(StatusError):
+        asyncio.run(limiter.call(func))
+    assert len(calls) == 1
+    assert limiter.limit == 8
+    assert limiter.in_flight == 0
+
+@pytest.mark.parametrize("error", [StatusError(503), httpx.ReadTimeout("timeout"), asyncio.TimeoutError()])
+def test_transient_errors_are_retried_until_exhausted(error):
+    limiter = AdaptiveRateLimiter("test", max_retries=2, retry_base_delay=0)
+    func, calls = failing([error] * 3)
+
+    with pytest.raises(type(error)):
+        asyncio.run(limiter.call(func))
+    assert len(calls) == 3
+
+def test_concurrency_is_bounded_by_limit():
+    limiter = AdaptiveRateLimiter("test", max_concurrency=2)
+    active = peak = 0
+
+    async def func():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def run():
+        await asyncio.gather(*(limiter.call(func) for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+def test_parse_retry_after():
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("") is None
+    assert _parse_retry_after("5") == 5
+    assert _parse_retry_after("-3") == 0
+    assert _parse_retry_after("not a date") is None
+    assert 25 < _parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, capacity=10)
+    assert bucket.delay(5) == 0
+    bucket.consume(15)
+    # Баланс ушел в минус: на 5 токенов нужно набрать 10, то есть около секунды
+    assert bucket.delay(5) == pytest.approx(1.0, abs=0.05)
+    # Запрос больше емкости ждет только до полной корзины
+    assert bucket.delay(100) == pytest.approx(1.5, abs=0.05)
+
+def test_requests_without_estimate_wait_for_negative_token_balance():
+    # 600 токенов в минуту - 10 в секунду
+    limiter = AdaptiveRateLimiter("test", tokens_per_minute=600)
+    func, calls = failing([])
+
+    async def run():
+        await limiter.call(func, tokens=100, usage=lambda result: 605)
+        await limiter.call(func)
+
+    asyncio.run(run())
+    # Фактический расход увел баланс до -5: второй запрос ждет около 0.5 с
+    assert calls[1] - calls[0] >= 0.4
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from scheduler import JobScheduler, QueueFullError
+
+def recorder(order: list[str], name: str):
+    async def run() -> str:
+        order.append(name)
+        await asyncio.sleep(0)
+        return name
+    return run
+
+def test_positions_match_round_robin_dispatch():
+    async def scenario():
+        scheduler = JobScheduler(workers=1)
+        order: list[str] = []
+        positions, futures = [], []
+        for user_id, name in [(1, "a1"), (2, "b1"), (3, "c1"), (1, "a2"), (1, "a3")]:
+            position, future = scheduler.submit(user_id, recorder(order, name))
+            positions.append(position)
+            futures.append(future)
+        scheduler.start()
+        results = await asyncio.gather(*futures)
+        await scheduler.stop()
+        return positions, order, results
+
+    positions, order, results = asyncio.run(scenario())
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+    assert positions == [1, 2, 3, 4, 5]
+    assert results == order
+
+def test_positions_follow_rotation_after_dispatch():
+    async def scenario():
+        scheduler = JobScheduler(workers=1)
+        order: list[str] = []
+        scheduler.submit(1, recorder(order, "a1"))
+        scheduler.submit(1, recorder(order, "a2"))
+        scheduler.submit(2, recorder(order, "b1"))
+        # a1 выдан исполнителю - пользователь 1 уходит в конец круга
+        job = scheduler._next_job()
+        await job.job_factory()
+        position, future = scheduler.submit(1, recorder(order, "a3"))
+        scheduler.start()
+        await future
+        await scheduler.stop()
+        return position, order
+
+    position, order = asyncio.run(scenario())
+    assert position == 3
+    assert order == ["a1", "b1", "a2", "a3"]
+
+def test_cancelled_jobs_do_not_count_in_position():
+    async def scenario():
+        scheduler = JobScheduler(workers=1)
+        order: list[str] = []
+        _, first = scheduler.submit(1, recorder(order, "a1"))
+        scheduler.submit(2, recorder(order, "b1"))
+        position_before, _ = scheduler.submit(3, recorder(order, "c1"))
+        first.cancel()
+        last = scheduler._queues[3][0]
+        return position_before, scheduler.position(last)
+
+    assert asyncio.run(scenario()) == (3, 2)
+
+def test_queue_limits():
+    async def scenario():
+        scheduler = JobScheduler(workers=1, max_queue=3, max_per_user=2)
+        order: list[str] = []
+        scheduler.submit(1, recorder(order, "a1"))
+        scheduler.submit(1, recorder(order, "a2"))
+        with pytest.raises(QueueFullError):
+            scheduler.submit(1, recorder(order, "a3"))
+        scheduler.submit(2, recorder(order, "b1"))
+        with pytest.raises(QueueFullError):
+            scheduler.submit(3, recorder(order, "c1"))
+        assert scheduler.queue_depth == 3
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+def test_job_error_is_set_on_future():
+    async def failing():
+        raise ValueError("boom")
+
+    async def scenario():
+        scheduler = JobScheduler(workers=2)
+        scheduler.start()
+        _, future = scheduler.submit(1, failing)
+        with pytest.raises(ValueError, match="boom"):
+            await future
+        assert scheduler.running == 0
+        await scheduler.stop()
+
+    asyncio.run(scenario())
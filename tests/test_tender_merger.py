@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from merging.tender_merger import TenderDataMerger, normalize_value
+from queries import ContactPerson, LotInfo, TenderData
+
+@pytest.fixture
+def merger() -> TenderDataMerger:
+    return TenderDataMerger()
+
+def test_normalize_value():
+    assert normalize_value("  Ёлка,  ООО «Ромашка». ") == "елка, ооо «ромашка"
+
+def test_vote_majority_wins(merger):
+    assert merger._vote(["ООО Ромашка", "ООО Ромашка", "ООО Лютик"]) == ("ООО Ромашка", [])
+
+def test_vote_ignores_empty_values(merger):
+    assert merger._vote(["", "  ", "Москва"]) == ("Москва", [])
+    assert merger._vote(["", None or ""]) == ("", [])
+
+def test_vote_tie_is_conflict(merger):
+    value, candidates = merger._vote(["ЭТП Сбербанк-АСТ", "ЭТП РТС-тендер"])
+    assert value == "ЭТП Сбербанк-АСТ"
+    assert candidates == ["ЭТП Сбербанк-АСТ", "ЭТП РТС-тендер"]
+
+def test_vote_folds_whole_word_containment(merger):
+    assert merger._vote(["ООО Ромашка", "ООО Ромашка, г. Москва"]) == ("ООО Ромашка, г. Москва", [])
+
+def test_vote_does_not_fold_partial_words(merger):
+    _, candidates = merger._vote(["ром", "ромашка"])
+    assert candidates == ["ром", "ромашка"]
+
+@pytest.mark.parametrize("values", [
+    ["5%", "0,5%"],
+    ["31-2024", "131-2024"],
+    ["1", "100 000"],
+    ["123", "1234"],
+])
+def test_vote_does_not_fold_numbers_and_ids(merger, values):
+    _, candidates = merger._vote(values)
+    assert sorted(candidates) == sorted(values)
+
+def test_vote_contained_number_is_conflict_even_without_tie(merger):
+    value, candidates = merger._vote(["1234", "1234", "123"])
+    assert value == "1234"
+    assert candidates == ["1234", "123"]
+
+def test_merge_dedupes_lots_and_contacts(merger):
+    items = [
+        TenderData(
+            notice_number="32412345678",
+            lots=[LotInfo(name="Поставка бумаги", quantity="100")],
+            contact_persons=[ContactPerson(full_name="Иванов И.И.", phone_number="+7 (495) 123-45-67")]
+        ),
+        TenderData(
+            notice_number="32412345678",
+            lots=[LotInfo(name="поставка бумаги.", currency="RUB")],
+            contact_persons=[ContactPerson(full_name="Иванов Иван", phone_number="8 495 123 45 67", email=None)]
+        ),
+    ]
+    result = merger.merge(items)
+    assert result.conflicts == {}
+    assert result.data.notice_number == "32412345678"
+    assert len(result.data.lots) == 1
+    assert result.data.lots[0].quantity == "100"
+    assert result.data.lots[0].currency == "RUB"
+    assert len(result.data.contact_persons) == 1
+
+def test_merge_async_resolves_conflicts_with_resolver(merger):
+    items = [TenderData(initial_max_price_with_vat="100 000"), TenderData(initial_max_price_with_vat="1")]
+    calls = []
+
+    async def resolver(field_name, candidates):
+        calls.append((field_name, candidates))
+        return "100 000 руб."
+
+    data = asyncio.run(merger.merge_async(items, resolver))
+    assert calls == [("initial_max_price_with_vat", ["100 000", "1"])]
+    assert data.initial_max_price_with_vat == "100 000 руб."